@@ -0,0 +1,78 @@
+"""Render 1000 technician schedule emails and report throughput.
+
+Compares the precompiled Jinja templates against re-parsing the template
+source for every email. Run from the project directory:
+
+    python benchmarks/bench_email_templates.py [count]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.email_templates import (  # noqa: E402
+    TEMPLATE_DIR,
+    html_to_text,
+    load_templates,
+    render_batch,
+)
+
+
+def _contexts(count):
+    contexts = []
+    for i in range(count):
+        appointments = [
+            {
+                "start_time": f"{8 + j}:00",
+                "end_time": f"{9 + j}:00",
+                "service_type": "Drain Cleaning" if j % 2 else "Water Heater Repair",
+                "customer_name": f"Customer <{i}-{j}> & Sons",
+                "customer_phone": f"555-01{j:02d}",
+                "address": f"{100 + j} Main St, Springfield",
+            }
+            for j in range(i % 8)
+        ]
+        contexts.append({
+            "tech_name": f"Tech {i}",
+            "schedule_date": "2026-01-15",
+            "appointments": appointments,
+            "schedule_url": "http://localhost:3000/schedule",
+        })
+    return contexts
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    contexts = _contexts(count)
+
+    started = time.perf_counter()
+    load_templates()
+    compile_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    rendered = render_batch("daily_schedule", contexts)
+    precompiled = time.perf_counter() - started
+
+    from jinja2 import Environment, FileSystemLoader, select_autoescape
+    started = time.perf_counter()
+    for context in contexts:
+        env = Environment(
+            loader=FileSystemLoader(TEMPLATE_DIR), autoescape=select_autoescape(["html"]),
+            trim_blocks=True, lstrip_blocks=True,
+        )
+        html = env.get_template("daily_schedule.html").render(max_width=650, **context)
+        html_to_text(html)
+    uncached = time.perf_counter() - started
+
+    # User values must come out escaped
+    assert "Customer &lt;1-0&gt; &amp; Sons" in rendered[1].html
+    print(f"emails:           {count}")
+    print(f"compile once:     {compile_ms:.1f} ms")
+    print(f"precompiled:      {precompiled * 1000:.1f} ms ({count / precompiled:.0f} emails/s)")
+    print(f"parse per email:  {uncached * 1000:.1f} ms ({count / uncached:.0f} emails/s)")
+    print(f"speedup:          {uncached / precompiled:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
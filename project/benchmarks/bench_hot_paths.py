@@ -0,0 +1,327 @@
+"""Micro-benchmarks for the availability, distance and listing hot paths.
+
+Each case runs on fixed, seeded inputs at several scales and reports the
+best-of-N time per call. Results are compared with the stored baselines
+in benchmarks/baselines/hot_paths.json and the run exits non-zero when a
+case is slower than its baseline by more than the threshold.
+
+    python benchmarks/bench_hot_paths.py                    # compare
+    python benchmarks/bench_hot_paths.py --update-baseline  # record
+    python benchmarks/bench_hot_paths.py -k slot --threshold 0.5
+
+Baselines are machine-specific, so the file keeps one set per host
+fingerprint (interpreter, architecture, CPU model and count). A run on a
+host with no recorded set prints its timings and a warning and does not
+gate; record one with --update-baseline on that machine (or CI runner
+class). Cases faster than --min-gated-us are reported but never gate:
+at a few microseconds per call, timer and scheduler noise exceed any
+sensible threshold. No database is needed -- the DB-backed functions are
+measured through the pure helpers they delegate to.
+"""
+import gc
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from zoneinfo import ZoneInfo
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.api.appointments import SERVICE_DURATIONS, find_earliest_slot  # noqa: E402
+from src.api.appointment_management import _appointment_out  # noqa: E402
+from src.api.call_logs import _call_log_out  # noqa: E402
+from src.utils.db import _group_tech_rows  # noqa: E402
+from src.utils.distance import calculate_distance, locate_in_schedule  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "hot_paths.json")
+SCALES = (10, 100, 1000)
+EASTERN = ZoneInfo("America/New_York")
+DAY = date(2026, 3, 10)
+
+
+def _point(rng):
+    return 35.2271 + rng.uniform(-0.3, 0.3), -80.8431 + rng.uniform(-0.3, 0.3)
+
+
+def _day_schedule(rng, jobs, aware=False):
+    """Up to ``jobs`` sequential appointments on DAY, as the DB returns them."""
+    tz = EASTERN if aware else None
+    cursor = datetime(DAY.year, DAY.month, DAY.day, 8, 0, tzinfo=tz)
+    appointments = []
+    for _ in range(jobs):
+        start = cursor + timedelta(minutes=rng.choice([0, 30, 60]))
+        end = start + timedelta(minutes=rng.choice([60, 60, 90, 120]))
+        if end.hour >= 17:
+            break
+        lat, lng = _point(rng)
+        appointments.append({
+            "start_time": start, "end_time": end,
+            "latitude": Decimal(f"{lat:.6f}"), "longitude": Decimal(f"{lng:.6f}"),
+        })
+        cursor = end + timedelta(minutes=30)
+    return appointments
+
+
+def case_calculate_distance(n):
+    rng = random.Random(n)
+    pairs = [(*_point(rng), *_point(rng)) for _ in range(n)]
+
+    def run():
+        for lat1, lon1, lat2, lon2 in pairs:
+            calculate_distance(lat1, lon1, lat2, lon2)
+    return run
+
+
+def case_locate_in_schedule(n):
+    """n technicians, each located at one time on a 0-6 job day."""
+    rng = random.Random(n)
+    inputs = []
+    for _ in range(n):
+        home = _point(rng)
+        target = datetime(DAY.year, DAY.month, DAY.day, rng.randint(7, 18), rng.choice([0, 15, 30, 45]))
+        inputs.append((_day_schedule(rng, rng.randint(0, 6)), target, *home))
+
+    def run():
+        for appointments, target, home_lat, home_lon in inputs:
+            locate_in_schedule(appointments, target, home_lat, home_lon)
+    return run
+
+
+def case_slot_search(n):
+    """The per-tech loop of find_technician_availability over n technicians."""
+    rng = random.Random(n)
+    techs = []
+    for _ in range(n):
+        home = _point(rng)
+        techs.append((_day_schedule(rng, rng.randint(0, 6), aware=True), *home))
+    customer = _point(rng)
+    duration = SERVICE_DURATIONS["air_duct"]
+
+    def run():
+        candidates = []
+        for appointments, home_lat, home_lon in techs:
+            slot = find_earliest_slot(appointments, DAY, duration, home_lat, home_lon)
+            if not slot:
+                continue
+            distance = calculate_distance(slot[1], slot[2], *customer)
+            if distance <= 50:
+                candidates.append((slot[0], distance))
+        candidates.sort()
+    return run
+
+
+def case_group_tech_rows(n):
+    """Shape the technician x appointment join for n technicians."""
+    rng = random.Random(n)
+    rows = []
+    for tech_id in range(1, n + 1):
+        home = _point(rng)
+        tech = {
+            "id": tech_id, "name": f"Tech {tech_id}", "email": f"t{tech_id}@example.test",
+            "phone": "7045550100", "skills": ["chimney", "gutter"], "home_address": "1 Main St",
+            "home_latitude": home[0], "home_longitude": home[1], "max_radius_miles": 40,
+            "status": "active", "calendar_provider": None, "calendar_email": None,
+            "calendar_connected": False,
+        }
+        appointments = _day_schedule(rng, rng.randint(0, 6))
+        for i, appt in enumerate(appointments or [None]):
+            rows.append({
+                **tech,
+                "appt_id": tech_id * 10 + i if appt else None,
+                "appt_start_time": appt and appt["start_time"],
+                "appt_end_time": appt and appt["end_time"],
+                "appt_latitude": appt and appt["latitude"],
+                "appt_longitude": appt and appt["longitude"],
+            })
+
+    def run():
+        _group_tech_rows(rows)
+    return run
+
+
+def case_admin_list_appointments(n):
+    """Response shaping for a page of n appointments."""
+    rng = random.Random(n)
+    rows = []
+    for i in range(n):
+        start = datetime(DAY.year, DAY.month, DAY.day, 8) + timedelta(hours=i % 9)
+        lat, lng = _point(rng)
+        rows.append({
+            "id": i + 1, "calendar_event_id": f"evt{i}", "status": "scheduled",
+            "service_type": "chimney", "customer_name": f"Customer {i}",
+            "customer_phone": "7045550100", "customer_email": f"c{i}@example.test",
+            "technician_id": i % 50, "technician_name": f"Tech {i % 50}",
+            "start_time": start, "end_time": start + timedelta(hours=1), "duration_minutes": 60,
+            "address": "1 Main St, Charlotte, NC", "latitude": Decimal(f"{lat:.6f}"),
+            "longitude": Decimal(f"{lng:.6f}"), "quoted_price": Decimal("189.00"),
+            "discount_applied": None, "notes": None, "created_at": start - timedelta(days=3),
+        })
+
+    def run():
+        out = {}
+        for a in rows:
+            out[str(a["id"])] = _appointment_out(a)
+    return run
+
+
+def case_list_call_logs(n):
+    """Response shaping for a page of n call logs."""
+    rng = random.Random(n)
+    rows = []
+    for i in range(n):
+        rows.append({
+            "id": i + 1, "call_id": f"call_{i}", "agent_id": "agent_1", "direction": "inbound",
+            "from_number": "+17045550100", "to_number": "+17045550199", "call_status": "ended",
+            "disconnection_reason": "user_hangup", "duration_seconds": rng.randint(0, 900),
+            "recording_url": f"https://example.test/{i}.wav", "transcript": "Agent: Hello",
+            "call_analysis": {"call_successful": True},
+            "dynamic_variables": {"customer_name": f"Caller {i}"} if i % 3 else None,
+            "created_at": datetime(DAY.year, DAY.month, DAY.day, 9) + timedelta(minutes=i),
+        })
+
+    def run():
+        [_call_log_out(log) for log in rows]
+    return run
+
+
+CASES = {
+    "calculate_distance": case_calculate_distance,
+    "locate_in_schedule": case_locate_in_schedule,
+    "slot_search": case_slot_search,
+    "group_tech_rows": case_group_tech_rows,
+    "admin_list_appointments": case_admin_list_appointments,
+    "list_call_logs": case_list_call_logs,
+}
+
+
+def measure(fn, repeat, min_time):
+    """Best time per call in microseconds, timeit-style (GC off while timing)."""
+    gc.collect()
+    gc.disable()
+    try:
+        return _measure(fn, repeat, min_time)
+    finally:
+        gc.enable()
+
+
+def _measure(fn, repeat, min_time):
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time:
+            break
+        loops *= 2
+    best = elapsed / loops
+    for _ in range(repeat - 1):
+        started = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        best = min(best, (time.perf_counter() - started) / loops)
+    return best * 1e6
+
+
+def _cpu_model():
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or "unknown"
+
+
+def host_fingerprint():
+    """What a baseline is only valid for."""
+    return {
+        "python": f"{platform.python_implementation()} {platform.python_version()}",
+        "machine": platform.machine(),
+        "cpu": _cpu_model(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def _host_key(fingerprint):
+    return " | ".join(str(fingerprint[k]) for k in ("python", "machine", "cpu", "cpu_count"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("-k", dest="pattern", help="only run cases whose id contains this")
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--min-time", type=float, default=0.25, help="seconds per measurement")
+    parser.add_argument("--min-gated-us", type=float, default=100.0,
+                        help="cases faster than this (baseline us/call) are not gated")
+    parser.add_argument("--threshold", type=float,
+                        default=float(os.getenv("BENCH_REGRESSION_THRESHOLD", "0.25")),
+                        help="allowed slowdown vs baseline, as a fraction")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    fingerprint = host_fingerprint()
+    host_key = _host_key(fingerprint)
+    hosts = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            hosts = json.load(f).get("hosts", {})
+    baseline = hosts.get(host_key, {}).get("results", {})
+    if not baseline and not args.update_baseline:
+        print(f"warning: no baseline for this host ({host_key}); timings are not compared. "
+              f"Record one with --update-baseline.\n")
+
+    results = {}
+    regressions = []
+    print(f"{'case':34} {'us/call':>12} {'baseline':>12} {'change':>8}")
+    for name, factory in CASES.items():
+        for scale in SCALES:
+            case_id = f"{name}[{scale}]"
+            if args.pattern and args.pattern not in case_id:
+                continue
+            micros = measure(factory(scale), args.repeat, args.min_time)
+            results[case_id] = round(micros, 3)
+            old = baseline.get(case_id)
+            change = ""
+            if old:
+                ratio = micros / old - 1
+                change = f"{ratio:+.1%}"
+                if old < args.min_gated_us:
+                    change += " ~"
+                elif ratio > args.threshold:
+                    regressions.append((case_id, old, micros, ratio))
+                    change += " !"
+            print(f"{case_id:34} {micros:>12.1f} {old if old else '-':>12} {change:>8}")
+
+    if args.update_baseline:
+        hosts[host_key] = {
+            **fingerprint,
+            "recorded_at": datetime.now().isoformat(timespec="seconds"),
+            "results": dict(sorted({**baseline, **results}.items())),
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump({"hosts": dict(sorted(hosts.items()))}, f, indent=2)
+            f.write("\n")
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+
+    if baseline:
+        print(f"\n~ below {args.min_gated_us:.0f}us/call: reported only, not gated")
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) above {args.threshold:.0%}:")
+        for case_id, old, new, ratio in regressions:
+            print(f"  {case_id}: {old:.1f}us -> {new:.1f}us ({ratio:+.1%})")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
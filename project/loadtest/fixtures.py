@@ -0,0 +1,71 @@
+"""Load-test technicians, tagged by email domain so they can be removed."""
+import json
+import random
+
+from src.utils.db import get_db_connection
+from src.utils.skills import rebuild_technician_skills
+
+LOADTEST_DOMAIN = "loadtest.example.test"
+SERVICES = ["chimney", "dryer_vent", "gutter", "power_washing", "air_duct"]
+
+
+def cleanup():
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT id FROM technicians WHERE email LIKE %s", (f"%@{LOADTEST_DOMAIN}",))
+        tech_ids = [r[0] for r in cur.fetchall()]
+        if tech_ids:
+            cur.execute("DELETE FROM route_cache WHERE technician_id = ANY(%s)", (tech_ids,))
+            cur.execute("""
+                DELETE FROM jobs WHERE task = 'calendar.push_appointment'
+                  AND (payload->>'appointment_id')::bigint IN (
+                      SELECT id FROM appointments WHERE technician_id = ANY(%s))
+            """, (tech_ids,))
+            cur.execute("DELETE FROM appointments WHERE technician_id = ANY(%s)", (tech_ids,))
+            cur.execute("DELETE FROM technicians WHERE id = ANY(%s)", (tech_ids,))
+        conn.commit()
+        return len(tech_ids)
+    finally:
+        cur.close()
+        conn.close()
+
+
+def seed_technicians(count, seed=7):
+    """Create ``count`` active techs around Charlotte; a third get a Google
+    calendar and a third an Outlook calendar so bookings push events."""
+    rng = random.Random(seed)
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        for i in range(count):
+            skills = rng.sample(SERVICES, rng.randint(2, len(SERVICES)))
+            provider = ("google", "outlook", None)[i % 3]
+            credentials = (
+                {"access_token": "stub", "refresh_token": "stub", "scopes": []}
+                if provider else None
+            )
+            cur.execute("""
+                INSERT INTO technicians
+                (name, email, phone, skills, home_address, home_latitude, home_longitude,
+                 max_radius_miles, status, calendar_provider, calendar_email,
+                 calendar_credentials, calendar_connected)
+                VALUES (%s, %s, %s, %s::jsonb, %s, %s, %s, 50, 'active', %s, %s, %s::jsonb, %s)
+            """, (
+                f"Loadtest Tech {i + 1}",
+                f"tech{i + 1}@{LOADTEST_DOMAIN}",
+                f"555-02{i:02d}",
+                json.dumps(skills),
+                f"{100 + i} Home St, Charlotte, NC",
+                35.2271 + rng.uniform(-0.2, 0.2),
+                -80.8431 + rng.uniform(-0.2, 0.2),
+                provider,
+                f"tech{i + 1}@{LOADTEST_DOMAIN}" if provider else None,
+                json.dumps(credentials) if credentials else None,
+                bool(provider),
+            ))
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+    rebuild_technician_skills()
@@ -0,0 +1,300 @@
+"""Simulate concurrent Retell calls against the real FastAPI app.
+
+Each virtual caller runs the booking conversation the agent performs:
+get-current-datetime -> verify-zip -> verify-address ->
+find-technician-availability -> book-appointment. Requests go through the
+ASGI app in-process (same threadpool, middleware and DB code as
+production) against the Postgres in DATABASE_URL. Radar, Google, Graph
+and SMTP are replaced by stubs with simulated latency (loadtest/stubs.py).
+
+    DATABASE_URL=postgresql://localhost/uhs_loadtest \\
+        python loadtest/run.py --concurrency 20 --flows 400
+    python loadtest/run.py --compare loadtest/results/<earlier>.json
+
+Results (per-endpoint p50/p95/p99, throughput, error rates) are printed and
+written to loadtest/results/ as JSON. Use a throwaway database: the run
+creates tagged technicians and bookings and removes them afterwards.
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import subprocess
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+API_KEY = "loadtest-key"
+# Must be set before the app modules read them at import time
+os.environ["RETELL_TOOL_API_KEY"] = API_KEY
+os.environ.setdefault("MAIL_SENDER", "loadtest@example.test")
+os.environ.setdefault("MAIL_PASSWORD", "loadtest")
+os.environ.setdefault("TRACE_JSONL_PATH", "")
+
+from loadtest import fixtures, stubs  # noqa: E402
+
+ENDPOINTS = [
+    "get-current-datetime",
+    "verify-zip",
+    "verify-address",
+    "find-technician-availability",
+    "book-appointment",
+]
+ZIP_CODES = ["28202", "28105", "28078", "28025", "28054", "28117", "28277"]
+STREETS = ["Main St", "Oak Ave", "Providence Rd", "Park Rd", "Sharon Amity Rd", "Tryon St"]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.errors = defaultdict(int)
+        self.unsuccessful = defaultdict(int)
+        self.flows_completed = 0
+        self.bookings = 0
+
+    def record(self, endpoint, elapsed_ms, status, error=False, unsuccessful=False):
+        self.latencies[endpoint].append(elapsed_ms)
+        self.statuses[endpoint][str(status)] += 1
+        if error:
+            self.errors[endpoint] += 1
+        if unsuccessful:
+            self.unsuccessful[endpoint] += 1
+
+
+async def _post(client, recorder, endpoint, payload=None):
+    started = time.perf_counter()
+    try:
+        response = await client.post(
+            f"/api/appointments/{endpoint}", json=payload or {}, headers={"X-API-Key": API_KEY},
+        )
+    except Exception:
+        recorder.record(endpoint, (time.perf_counter() - started) * 1000, "exception", error=True)
+        return None
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    body = response.json() if response.status_code < 500 else None
+    unsuccessful = bool(body) and body.get("success") is False
+    recorder.record(endpoint, elapsed_ms, response.status_code,
+                    error=response.status_code >= 400, unsuccessful=unsuccessful)
+    return body if response.status_code < 400 else None
+
+
+async def conversation(client, recorder, rng, days):
+    await _post(client, recorder, "get-current-datetime")
+    await _post(client, recorder, "verify-zip", {"zip_code": rng.choice(ZIP_CODES)})
+    address = await _post(client, recorder, "verify-address", {
+        "messy_input": f"{rng.randint(100, 9999)} {rng.choice(STREETS)} {rng.choice(ZIP_CODES)}",
+    })
+    if not address or not address.get("verified"):
+        return
+    service = rng.choice(fixtures.SERVICES)
+    requested = date.today() + timedelta(days=rng.randint(1, days))
+    availability = await _post(client, recorder, "find-technician-availability", {
+        "service_type": service,
+        "confirmed_latitude": address["latitude"],
+        "confirmed_longitude": address["longitude"],
+        "requested_date": requested.isoformat(),
+    })
+    if not availability or not availability.get("available"):
+        return
+    n = rng.randint(1000, 9999)
+    booking = await _post(client, recorder, "book-appointment", {
+        "customer_name": f"Load Caller {n}",
+        "customer_phone": f"555-9{n}",
+        "customer_email": f"caller{n}@{fixtures.LOADTEST_DOMAIN}",
+        "technician_id": availability["technician"]["id"],
+        "service_type": service,
+        "address": address["formatted_address"],
+        "latitude": address["latitude"],
+        "longitude": address["longitude"],
+        "start_time": availability["time_slot"],
+        "duration_minutes": 60,
+        "quoted_price": 199.0,
+    })
+    if booking and booking.get("success"):
+        recorder.bookings += 1
+
+
+async def caller_loop(client, recorder, rng, remaining, deadline, days):
+    while remaining[0] > 0 and (deadline is None or time.perf_counter() < deadline):
+        remaining[0] -= 1
+        await conversation(client, recorder, rng, days)
+        recorder.flows_completed += 1
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return round(sorted_values[index], 2)
+
+
+def summarize(recorder, wall_seconds):
+    endpoints = {}
+    total_requests = 0
+    total_errors = 0
+    for endpoint in ENDPOINTS:
+        values = sorted(recorder.latencies.get(endpoint, []))
+        count = len(values)
+        total_requests += count
+        total_errors += recorder.errors[endpoint]
+        endpoints[endpoint] = {
+            "requests": count,
+            "p50_ms": _percentile(values, 50),
+            "p95_ms": _percentile(values, 95),
+            "p99_ms": _percentile(values, 99),
+            "max_ms": round(values[-1], 2) if values else None,
+            "mean_ms": round(sum(values) / count, 2) if count else None,
+            "error_rate": round(recorder.errors[endpoint] / count, 4) if count else 0.0,
+            "unsuccessful_rate": round(recorder.unsuccessful[endpoint] / count, 4) if count else 0.0,
+            "statuses": dict(recorder.statuses[endpoint]),
+        }
+    return {
+        "wall_seconds": round(wall_seconds, 2),
+        "flows": recorder.flows_completed,
+        "bookings": recorder.bookings,
+        "requests": total_requests,
+        "throughput_rps": round(total_requests / wall_seconds, 2) if wall_seconds else None,
+        "flows_per_second": round(recorder.flows_completed / wall_seconds, 2) if wall_seconds else None,
+        "error_rate": round(total_errors / total_requests, 4) if total_requests else 0.0,
+        "endpoints": endpoints,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_DIR, text=True,
+            stderr=subprocess.DEVNULL,
+        ).strip()
+    except Exception:
+        return None
+
+
+def print_summary(summary):
+    print(f"\n{summary['flows']} conversations, {summary['requests']} requests, "
+          f"{summary['bookings']} bookings in {summary['wall_seconds']}s "
+          f"({summary['throughput_rps']} req/s, error rate {summary['error_rate']:.2%})")
+    print(f"{'endpoint':32} {'n':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'err':>7} {'unsucc':>7}")
+    for name, e in summary["endpoints"].items():
+        if not e["requests"]:
+            continue
+        print(f"{name:32} {e['requests']:>6} {e['p50_ms']:>9.1f} {e['p95_ms']:>9.1f} "
+              f"{e['p99_ms']:>9.1f} {e['error_rate']:>7.2%} {e['unsuccessful_rate']:>7.2%}")
+
+
+def print_comparison(current, baseline):
+    print(f"\nvs {baseline.get('meta', {}).get('git_commit') or 'baseline'}:")
+    before, after = baseline["summary"], current["summary"]
+
+    def delta(a, b):
+        if a in (None, 0) or b is None:
+            return "    n/a"
+        return f"{(b - a) / a:+7.1%}"
+
+    print(f"{'throughput_rps':32} {before['throughput_rps']:>9} -> {after['throughput_rps']:>9} "
+          f"{delta(before['throughput_rps'], after['throughput_rps'])}")
+    for name, e in after["endpoints"].items():
+        old = before["endpoints"].get(name)
+        if not old or not e["requests"]:
+            continue
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            print(f"{name + ' ' + key:32} {old[key]!s:>9} -> {e[key]!s:>9} {delta(old[key], e[key])}")
+
+
+async def run(args):
+    import main
+
+    latencies = dict(stubs.DEFAULT_LATENCIES)
+    for override in args.latency or []:
+        service, _, seconds = override.partition("=")
+        latencies[service] = float(seconds)
+    stubs.install_stubs(latencies)
+
+    import httpx
+
+    recorder = Recorder()
+    async with main.app.router.lifespan_context(main.app):
+        removed = fixtures.cleanup()
+        if removed:
+            print(f"Removed {removed} technicians left by an earlier run")
+        fixtures.seed_technicians(args.technicians, seed=args.seed)
+        try:
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://loadtest",
+                                         timeout=60) as client:
+                remaining = [args.flows]
+                started = time.perf_counter()
+                deadline = started + args.duration if args.duration else None
+                await asyncio.gather(*[
+                    caller_loop(client, recorder, random.Random(args.seed * 1000 + i),
+                                remaining, deadline, args.days)
+                    for i in range(args.concurrency)
+                ])
+                wall_seconds = time.perf_counter() - started
+        finally:
+            if not args.keep_data:
+                fixtures.cleanup()
+
+    return {
+        "meta": {
+            "git_commit": _git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "config": {
+                "concurrency": args.concurrency,
+                "flows": args.flows,
+                "duration": args.duration,
+                "technicians": args.technicians,
+                "days": args.days,
+                "seed": args.seed,
+                "stub_latencies": latencies,
+            },
+            "stub_calls": dict(stubs.calls),
+        },
+        "summary": summarize(recorder, wall_seconds),
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--concurrency", type=int, default=10, help="simultaneous callers")
+    parser.add_argument("--flows", type=int, default=200, help="total conversations to run")
+    parser.add_argument("--duration", type=float, default=None, help="stop after this many seconds")
+    parser.add_argument("--technicians", type=int, default=15)
+    parser.add_argument("--days", type=int, default=10, help="book up to this many days ahead")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--latency", action="append", metavar="SERVICE=SECONDS",
+                        help="override a stub latency, e.g. radar=0.2 (repeatable)")
+    parser.add_argument("--output", help="result file (default loadtest/results/<time>-<commit>.json)")
+    parser.add_argument("--compare", help="earlier result file to diff against")
+    parser.add_argument("--keep-data", action="store_true", help="leave seeded rows in place")
+    args = parser.parse_args()
+
+    if not os.getenv("DATABASE_URL"):
+        parser.error("DATABASE_URL must point at a disposable Postgres database")
+
+    result = asyncio.run(run(args))
+    print_summary(result["summary"])
+
+    output = args.output
+    if not output:
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        name = f"{stamp}-{result['meta']['git_commit'] or 'nogit'}.json"
+        output = os.path.join(PROJECT_DIR, "loadtest", "results", name)
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(result, json.load(f))
+
+
+if __name__ == "__main__":
+    main_cli()
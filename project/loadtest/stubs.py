@@ -0,0 +1,262 @@
+"""In-process stand-ins for Radar, Google Calendar, Microsoft Graph and SMTP.
+
+Each stub sleeps for a configurable, jittered latency so the app's thread
+and connection usage under load looks like production, without any
+network traffic. ``install_stubs`` patches the libraries in place and must
+run before the first request is served.
+"""
+import json
+import time
+import random
+import smtplib
+import threading
+import uuid
+from collections import Counter
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+# Mean latency in seconds per external service
+DEFAULT_LATENCIES = {
+    "radar": 0.08,
+    "google": 0.25,
+    "graph": 0.30,
+    "smtp": 0.05,
+}
+
+CHARLOTTE_CITIES = ["Charlotte", "Matthews", "Huntersville", "Concord", "Gastonia", "Mooresville"]
+
+calls = Counter()
+_calls_lock = threading.Lock()
+
+
+def _count(name):
+    with _calls_lock:
+        calls[name] += 1
+
+
+class _Latency:
+    def __init__(self, latencies):
+        self.latencies = latencies
+
+    def sleep(self, service):
+        mean = self.latencies.get(service, 0)
+        if mean > 0:
+            time.sleep(max(0.0, random.gauss(mean, mean * 0.25)))
+
+
+class FakeResponse:
+    def __init__(self, status_code, payload):
+        self.status_code = status_code
+        self._payload = payload
+        self.text = json.dumps(payload)
+        self.content = self.text.encode()
+        self.headers = {"Content-Type": "application/json"}
+
+    def json(self):
+        return self._payload
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} from stub", response=self)
+
+
+def _radar_geocode(query):
+    rng = random.Random(query)
+    lat = 35.2271 + rng.uniform(-0.25, 0.25)
+    lng = -80.8431 + rng.uniform(-0.3, 0.3)
+    city = rng.choice(CHARLOTTE_CITIES)
+    return {
+        "addresses": [{
+            "formattedAddress": f"{rng.randint(100, 9999)} Main St, {city}, NC 28202",
+            "latitude": lat,
+            "longitude": lng,
+            "city": city,
+            "state": "NC",
+            "countryCode": "US",
+            "confidence": "exact",
+        }]
+    }
+
+
+# Events on the fake provider calendars. Sync/delta calls return what was
+# added since the caller's cursor (the list length when it last synced).
+fake_calendar_events = {"google": [], "outlook": []}
+
+
+def add_fake_calendar_event(provider, summary, start, end):
+    """Put an event on every fake ``provider`` calendar; returns its id."""
+    event_id = uuid.uuid4().hex
+    if provider == "google":
+        fake_calendar_events["google"].append({
+            "id": event_id, "summary": summary, "status": "confirmed",
+            "start": {"dateTime": start.isoformat() + "Z"}, "end": {"dateTime": end.isoformat() + "Z"},
+        })
+    else:
+        fake_calendar_events["outlook"].append({
+            "id": event_id, "subject": summary, "bodyPreview": "", "location": {"displayName": ""},
+            "start": {"dateTime": start.isoformat() + ".0000000", "timeZone": "UTC"},
+            "end": {"dateTime": end.isoformat() + ".0000000", "timeZone": "UTC"},
+        })
+    return event_id
+
+
+def _graph_request(method, url, payload):
+    if url.endswith("/$batch"):
+        return FakeResponse(200, {"responses": [
+            {"id": sub["id"], "status": response.status_code, "headers": {}, "body": response.json()}
+            for sub in payload["requests"]
+            for response in [_graph_request(sub["method"], sub["url"], sub.get("body"))]
+        ]})
+    if "/subscriptions" in url:
+        if method == "POST":
+            return FakeResponse(201, {"id": uuid.uuid4().hex, "expirationDateTime": payload["expirationDateTime"]})
+        if method == "PATCH":
+            return FakeResponse(200, {"expirationDateTime": payload["expirationDateTime"]})
+        return FakeResponse(204, {})
+    if "/calendarView/delta" in url:
+        since = int(parse_qs(urlparse(url).query).get("since", ["0"])[0])
+        events = fake_calendar_events["outlook"]
+        return FakeResponse(200, {
+            "value": events[since:],
+            "@odata.deltaLink": f"https://graph.microsoft.com/v1.0/me/calendarView/delta?since={len(events)}",
+        })
+    if method == "POST" and url.endswith("/events"):
+        return FakeResponse(201, {"id": uuid.uuid4().hex, "webLink": "https://outlook.example/evt"})
+    if method == "GET" and "/events" in url:
+        return FakeResponse(200, {"value": []})
+    if url.endswith("/me"):
+        return FakeResponse(200, {"mail": "tech@example.test"})
+    return FakeResponse(200, {})
+
+
+class _FakeGoogleRequest:
+    def __init__(self, latency, result):
+        self._latency = latency
+        self._result = result
+
+    def execute(self):
+        _count("google")
+        self._latency.sleep("google")
+        return self._result
+
+
+class _FakeGoogleEvents:
+    def __init__(self, latency):
+        self._latency = latency
+
+    def insert(self, calendarId, body, **kwargs):
+        return _FakeGoogleRequest(self._latency, {
+            "id": uuid.uuid4().hex, "htmlLink": "https://calendar.example/evt", "status": "confirmed",
+        })
+
+    def list(self, **kwargs):
+        events = fake_calendar_events["google"]
+        since = int(kwargs.get("syncToken") or 0)
+        return _FakeGoogleRequest(self._latency, {"items": events[since:], "nextSyncToken": str(len(events))})
+
+    def watch(self, calendarId, body):
+        expires_ms = (time.time() + int(body["params"]["ttl"])) * 1000
+        return _FakeGoogleRequest(self._latency, {
+            "id": body["id"], "resourceId": f"res-{body['id']}", "expiration": str(int(expires_ms)),
+        })
+
+
+class _FakeGoogleChannels:
+    def __init__(self, latency):
+        self._latency = latency
+
+    def stop(self, body):
+        return _FakeGoogleRequest(self._latency, {})
+
+
+class _FakeGoogleService:
+    def __init__(self, latency):
+        self._events = _FakeGoogleEvents(latency)
+        self._channels = _FakeGoogleChannels(latency)
+
+    def events(self):
+        return self._events
+
+    def channels(self):
+        return self._channels
+
+
+class FakeSMTP:
+    latency = None
+
+    def __init__(self, host=None, port=None, timeout=None):
+        _count("smtp_connect")
+
+    def starttls(self):
+        pass
+
+    def login(self, user, password):
+        pass
+
+    def noop(self):
+        return (250, b"OK")
+
+    def send_message(self, msg):
+        _count("smtp")
+        FakeSMTP.latency.sleep("smtp")
+
+    def quit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def install_stubs(latencies=None):
+    latency = _Latency({**DEFAULT_LATENCIES, **(latencies or {})})
+
+    def fake_get(url, params=None, **kwargs):
+        if "api.radar.io" in url:
+            _count("radar")
+            latency.sleep("radar")
+            return FakeResponse(200, _radar_geocode((params or {}).get("query", "")))
+        return fake_request("GET", url, params=params, **kwargs)
+
+    def fake_request(method, url, json=None, **kwargs):
+        if "graph.microsoft.com" in url:
+            _count("graph")
+            latency.sleep("graph")
+            return _graph_request(method.upper(), url, json)
+        raise RuntimeError(f"Unstubbed outbound request in load test: {method} {url}")
+
+    def fake_session_request(self, method, url, params=None, **kwargs):
+        if "api.radar.io" in url:
+            return fake_get(url, params=params)
+        return fake_request(method, url, params=params, **kwargs)
+
+    requests.get = fake_get
+    requests.request = fake_request
+    requests.Session.request = fake_session_request
+
+    FakeSMTP.latency = latency
+    smtplib.SMTP = FakeSMTP
+
+    from src.services.google_calendar import GoogleCalendarService
+    from src.services.outlook_calendar import OutlookCalendarService
+
+    def google_init(self, credentials_dict):
+        self.credentials = None
+        self._credentials_dict = dict(credentials_dict)
+        self.service = _FakeGoogleService(latency)
+
+    def google_updated_credentials(self):
+        return self._credentials_dict
+
+    def outlook_init(self, credentials_dict):
+        self.access_token = credentials_dict.get("access_token")
+        self.refresh_token = credentials_dict.get("refresh_token")
+        self.token_expiry = None
+        self.scopes = credentials_dict.get("scopes", ["Calendars.ReadWrite"])
+        self.msal_account_id = None
+        self._msal_cache = None
+        self._account_client = None
+
+    GoogleCalendarService.__init__ = google_init
+    GoogleCalendarService.get_updated_credentials = google_updated_credentials
+    OutlookCalendarService.__init__ = outlook_init
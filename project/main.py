@@ -2,7 +2,6 @@
 import os
 import logging
 from contextlib import asynccontextmanager
-from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 
 from fastapi import FastAPI
@@ -10,6 +9,8 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from src.api import (
     admin as admin_router,
+    analytics,
+    metrics as metrics_router,
     appointment_management,
     appointments,
     auth as auth_router,
@@ -20,89 +21,65 @@ from src.api import (
     webhooks,
 )
 from src.utils.db import create_tables
-
-
-def send_daily_schedules():
-    """Send each technician their next-day schedule at 6 PM ET."""
-    from src.utils.db import get_all_technicians, get_appointments_paginated
-    from src.utils.mail_service import send_technician_daily_schedule
-
-    eastern = ZoneInfo("America/New_York")
-    now = datetime.now(eastern)
-    tomorrow = (now + timedelta(days=1)).date()
-    tomorrow_start = datetime.combine(tomorrow, datetime.min.time())
-    tomorrow_end = datetime.combine(tomorrow, datetime.max.time())
-    frontend_url = os.getenv("FRONTEND_URL", "http://localhost:3000")
-    schedule_url = f"{frontend_url}/schedule"
-
-    techs = get_all_technicians()
-    logging.info(
-        "Sending daily schedules to %d technicians for %s",
-        len(techs), tomorrow,
-    )
-
-    for tech in techs:
-        if not tech.get("email"):
-            continue
-        try:
-            result = get_appointments_paginated(
-                page=1,
-                page_size=50,
-                technician_id=tech["id"],
-                date_from=str(tomorrow_start),
-                date_to=str(tomorrow_end),
-                time_filter="upcoming",
-            )
-            appt_list = []
-            for appt in result["appointments"]:
-                start_str = str(appt["start_time"])
-                end_str = str(appt["end_time"])
-                appt_list.append({
-                    "start_time": start_str.split(" ")[1][:5] if " " in start_str else start_str,
-                    "end_time": end_str.split(" ")[1][:5] if " " in end_str else end_str,
-                    "service_type": appt["service_type"],
-                    "customer_name": appt["customer_name"],
-                    "customer_phone": appt.get("customer_phone", ""),
-                    "address": appt.get("address", ""),
-                })
-
-            send_technician_daily_schedule(
-                tech_email=tech["email"],
-                tech_name=tech["name"],
-                schedule_date=str(tomorrow),
-                appointments=appt_list,
-                schedule_url=schedule_url,
-            )
-            logging.info(
-                "Schedule sent to %s (%s): %d appointments",
-                tech["name"], tech["email"], len(appt_list),
-            )
-        except Exception as exc:
-            logging.error("Failed to send schedule to %s: %s", tech["name"], exc)
+from src.utils.analytics import compact_analytics
+from src.utils.daily_schedule import send_daily_schedules
+from src.utils.calendar_sync import renew_calendar_channels
+from src.utils.reminders import dispatch_reminders
+from src.utils.scheduler import start_scheduler, stop_scheduler, prune_job_runs
+from src.utils.mail_outbox import start_outbox_worker, stop_outbox_worker, prune_sent_messages
+from src.utils.job_queue import JOB_WORKERS_ENABLED, start_job_workers, stop_job_workers, prune_jobs
+from src.utils.smtp_pool import close_smtp_pool
+from src.utils.mail_service import shutdown_email_batch
+from src.utils.email_templates import load_templates
+from src.utils.password_hashing import shutdown_password_hashing
+from src.services.radar_client import close_radar_client
+from src.services.graph_client import close_graph_client
+from src.services.calendar_dispatch import shutdown_calendar_dispatch
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Application lifespan: create tables, start scheduler."""
+    """Application lifespan: create tables, start scheduler, mail and job workers."""
     create_tables()
+    load_templates()
+    start_outbox_worker()
+    if JOB_WORKERS_ENABLED:
+        start_job_workers()
 
-    from apscheduler.schedulers.background import BackgroundScheduler
     from apscheduler.triggers.cron import CronTrigger
-
-    scheduler = BackgroundScheduler()
-    scheduler.add_job(
-        send_daily_schedules,
-        CronTrigger(hour=18, minute=0, timezone=ZoneInfo("America/New_York")),
-        id="daily_schedule_email",
-        name="Send technician daily schedules at 6 PM ET",
-        replace_existing=True,
-    )
-    scheduler.start()
-    logging.info("Scheduler started: daily schedule emails at 6 PM ET")
+    from apscheduler.triggers.interval import IntervalTrigger
+
+    # Every worker joins the election; only the advisory-lock holder runs jobs
+    start_scheduler([
+        (send_daily_schedules, CronTrigger(hour=18, minute=0, timezone=ZoneInfo("America/New_York")),
+         "daily_schedule_email", "Send technician daily schedules at 6 PM ET"),
+        (compact_analytics, CronTrigger(hour=3, minute=15, timezone=ZoneInfo("America/New_York")),
+         "analytics_compaction", "Roll hourly analytics buckets into daily buckets"),
+        (renew_calendar_channels, IntervalTrigger(minutes=30),
+         "calendar_channel_renewal", "Renew calendar push channels before they expire"),
+        (dispatch_reminders, IntervalTrigger(minutes=1),
+         "appointment_reminders", "Send due customer appointment reminders"),
+        (prune_job_runs, CronTrigger(hour=3, minute=45, timezone=ZoneInfo("America/New_York")),
+         "scheduler_history_prune", "Drop old scheduled job run history"),
+        (prune_jobs, CronTrigger(hour=3, minute=50, timezone=ZoneInfo("America/New_York")),
+         "job_queue_prune", "Drop finished background jobs past retention"),
+        (prune_sent_messages, CronTrigger(hour=3, minute=55, timezone=ZoneInfo("America/New_York")),
+         "mail_outbox_prune", "Drop sent outbox messages past retention"),
+    ])
+    logging.info("Scheduler election started: daily schedule emails at 6 PM ET, analytics compaction at 3:15 AM ET, "
+                 "calendar channel renewal every 30 min, appointment reminders every minute")
 
     yield
 
-    scheduler.shutdown()
+    stop_scheduler()
+    stop_job_workers()
+    stop_outbox_worker()
+    shutdown_email_batch()
+    close_smtp_pool()
+    close_radar_client()
+    shutdown_calendar_dispatch()
+    close_graph_client()
+    shutdown_password_hashing()
 
 
 app = FastAPI(title="United Home Services API", lifespan=lifespan)
@@ -123,6 +100,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(metrics_router.MetricsMiddleware)
 
 app.include_router(auth_router.router, prefix="/api/auth", tags=["auth"])
 app.include_router(admin_router.router, prefix="/api/admin", tags=["admin"])
@@ -137,6 +115,8 @@ app.include_router(technicians.router, prefix="/api/technicians", tags=["technic
 app.include_router(webhooks.router, prefix="/api/webhooks", tags=["webhooks"])
 app.include_router(retell_webhooks.router, prefix="/api/webhooks", tags=["retell-webhooks"])
 app.include_router(call_logs.router, prefix="/api/call-logs", tags=["call-logs"])
+app.include_router(analytics.router, prefix="/api/analytics", tags=["analytics"])
+app.include_router(metrics_router.router, tags=["metrics"])
 
 
 @app.get("/")
@@ -0,0 +1,233 @@
+"""Push appointments that have no calendar event to the connected calendars.
+
+Finds non-cancelled appointments whose ``admin_calendar_event_id`` (admin
+calendar) or ``tech_calendar_event_id`` (the tech's own calendar) is empty
+and creates the events in provider batches -- 50 per Google batch HTTP
+request, 20 per Graph ``$batch`` -- recording the provider event ids on
+the rows. Customers are not invited to backfilled events.
+
+Appointments booked before the event id columns existed were already pushed
+by the booking flow but have no recorded id, so by default only bookings
+made after the columns were added (the ``calendar_event_ids`` marker in
+``schema_bootstraps``) are considered. On a database where the columns
+predate that marker, pass --booked-since with the date the event id change
+was deployed. --include-legacy scans every booking and WILL create a second
+copy of each event that was pushed before ids were recorded.
+
+    python scripts/backfill_calendar_events.py --target admin --since 2026-01-01
+    python scripts/backfill_calendar_events.py --ops-per-second 2 --limit 1000
+    python scripts/backfill_calendar_events.py --booked-since 2026-09-01
+
+Progress (the last appointment id handled per calendar) is saved to
+--state-file after every batch, so an interrupted run resumes where it
+stopped. Rows that failed stay empty and are skipped on resume; run with
+--restart to scan from the beginning and retry them.
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from psycopg2.extras import RealDictCursor  # noqa: E402
+
+from src.utils.calendar_events import event_fields  # noqa: E402
+from src.utils.db import (  # noqa: E402
+    create_tables, get_db_connection, get_admin_calendar_credentials,
+    get_appointments_missing_calendar_event, get_bootstrap_time, save_admin_calendar_credentials,
+    save_calendar_credentials, set_calendar_event_ids,
+)
+
+DEFAULT_STATE_FILE = ".calendar_backfill_state.json"
+# Largest batch each provider accepts in one round trip
+PROVIDER_BATCH_LIMITS = {"google": 50, "outlook": 20}
+
+
+class RateLimiter:
+    """Spaces calls so no more than ``rate`` operations run per second."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.next_at = time.monotonic()
+
+    def wait(self, operations):
+        now = time.monotonic()
+        if self.next_at > now:
+            time.sleep(self.next_at - now)
+        self.next_at = max(now, self.next_at) + operations * self.interval
+
+
+def load_state(path):
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {}
+
+
+def save_state(path, state):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, path)
+
+
+def calendar_service(provider, credentials):
+    if provider == "google":
+        from src.services.google_calendar import GoogleCalendarService
+        return GoogleCalendarService(credentials)
+    if provider == "outlook":
+        from src.services.outlook_calendar import OutlookCalendarService
+        return OutlookCalendarService(credentials)
+    return None
+
+
+def backfill_calendar(key, target, provider, cal, save_credentials, args, state, limiter, totals,
+                      technician_id=None):
+    """Push one calendar's missing events; returns False when the run limit is reached."""
+    batch_size = min(args.batch_size, PROVIDER_BATCH_LIMITS[provider])
+    progress = state.setdefault(key, {"last_id": 0, "created": 0, "failed": 0})
+    while True:
+        limit = batch_size
+        if args.limit:
+            limit = min(limit, args.limit - totals["created"] - totals["failed"])
+            if limit <= 0:
+                return False
+        rows = get_appointments_missing_calendar_event(
+            target, after_id=progress["last_id"], limit=limit,
+            technician_id=technician_id, since=args.since, booked_since=args.booked_since,
+        )
+        if not rows:
+            return True
+        if args.dry_run:
+            totals["pending"] += len(rows)
+            progress = {**progress, "last_id": rows[-1]["id"]}
+            continue
+
+        limiter.wait(len(rows))
+        events = [
+            event_fields(target, row, row.get("technician_name"), invite_customer=False)
+            for row in rows
+        ]
+        results = cal.create_events(events)
+        event_ids = [(row["id"], result["id"]) for row, result in zip(rows, results) if result]
+        set_calendar_event_ids(target, event_ids)
+        # Also refreshes the access token before it expires on long runs
+        save_credentials(cal.get_updated_credentials())
+
+        failed = len(rows) - len(event_ids)
+        progress["last_id"] = rows[-1]["id"]
+        progress["created"] += len(event_ids)
+        progress["failed"] += failed
+        totals["created"] += len(event_ids)
+        totals["failed"] += failed
+        save_state(args.state_file, state)
+        logging.info(f"[BACKFILL] {key}: +{len(event_ids)} events, {failed} failed, "
+                     f"through appointment {progress['last_id']}")
+        if not event_ids:
+            logging.error(f"[BACKFILL] {key}: whole batch failed; stopping this calendar")
+            return True
+
+
+def connected_technicians():
+    conn = get_db_connection()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        cur.execute("""
+            SELECT id, name, calendar_provider, calendar_email, calendar_credentials
+            FROM technicians
+            WHERE calendar_connected = TRUE AND calendar_credentials IS NOT NULL
+            ORDER BY id
+        """)
+        return [dict(r) for r in cur.fetchall()]
+    finally:
+        cur.close()
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--target", choices=["admin", "tech", "all"], default="all")
+    parser.add_argument("--since", type=lambda v: datetime.strptime(v, "%Y-%m-%d"),
+                        help="only appointments starting on or after this date (YYYY-MM-DD)")
+    parser.add_argument("--booked-since", type=lambda v: datetime.strptime(v, "%Y-%m-%d"),
+                        help="only appointments created on or after this date (default: when "
+                             "event ids started being recorded)")
+    parser.add_argument("--include-legacy", action="store_true",
+                        help="also push bookings made before event ids were recorded; "
+                             "duplicates every event the booking flow already pushed")
+    parser.add_argument("--batch-size", type=int, default=50,
+                        help="events per round trip (capped at the provider's batch limit)")
+    parser.add_argument("--ops-per-second", type=float, default=5.0,
+                        help="event creations per second across all calendars (0 = unlimited)")
+    parser.add_argument("--limit", type=int, default=0, help="stop after this many events")
+    parser.add_argument("--state-file", default=DEFAULT_STATE_FILE)
+    parser.add_argument("--restart", action="store_true", help="ignore saved progress")
+    parser.add_argument("--dry-run", action="store_true", help="count pending events only")
+    args = parser.parse_args()
+
+    if not os.getenv("DATABASE_URL"):
+        parser.error("DATABASE_URL is not set")
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    create_tables()
+    if args.include_legacy:
+        args.booked_since = None
+        logging.warning("[BACKFILL] --include-legacy: events pushed before ids were recorded "
+                        "will be created again")
+    elif args.booked_since is None:
+        args.booked_since = get_bootstrap_time("calendar_event_ids")
+        if args.booked_since is None:
+            parser.error("event ids predate the calendar_event_ids marker; pass --booked-since "
+                         "with the date they started being recorded (or --include-legacy)")
+        logging.info(f"[BACKFILL] Only appointments booked since {args.booked_since:%Y-%m-%d %H:%M}")
+    state = {} if args.restart else load_state(args.state_file)
+    limiter = RateLimiter(args.ops_per_second)
+    totals = {"created": 0, "failed": 0, "pending": 0}
+    started = time.perf_counter()
+    keep_going = True
+
+    if args.target in ("admin", "all"):
+        admin = get_admin_calendar_credentials()
+        if admin and admin.get("connected") and admin.get("provider") in PROVIDER_BATCH_LIMITS:
+            provider = admin["provider"]
+            keep_going = backfill_calendar(
+                "admin", "admin", provider, calendar_service(provider, admin["credentials"]),
+                lambda creds: save_admin_calendar_credentials(provider, admin.get("email", ""), creds),
+                args, state, limiter, totals,
+            )
+        else:
+            logging.info("[BACKFILL] No admin calendar connected; skipping admin events")
+
+    if args.target in ("tech", "all") and keep_going:
+        for tech in connected_technicians():
+            provider = tech["calendar_provider"]
+            if provider not in PROVIDER_BATCH_LIMITS:
+                continue
+            try:
+                cal = calendar_service(provider, tech["calendar_credentials"])
+            except Exception as e:
+                logging.error(f"[BACKFILL] tech {tech['id']}: could not open calendar: {e}")
+                continue
+            keep_going = backfill_calendar(
+                f"tech:{tech['id']}", "tech", provider, cal,
+                lambda creds, tech=tech: save_calendar_credentials(
+                    tech["id"], tech["calendar_provider"], tech["calendar_email"], creds),
+                args, state, limiter, totals, technician_id=tech["id"],
+            )
+            if not keep_going:
+                break
+
+    elapsed = time.perf_counter() - started
+    if args.dry_run:
+        print(f"{totals['pending']} events pending")
+    else:
+        print(f"{totals['created']} events created, {totals['failed']} failed in {elapsed:.1f}s")
+    return 1 if totals["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+"""Send provider-shaped calendar push notifications to the receiver endpoints.
+
+Stands in for Google and Microsoft Graph when testing push-driven calendar
+sync. Against a running server it reads the open channels from
+``calendar_channels`` and posts one notification per channel, exactly as
+the provider would (Google ``X-Goog-*`` headers, Graph JSON with
+``clientState``):
+
+    python scripts/fake_calendar_notifier.py --base-url http://localhost:8000
+    python scripts/fake_calendar_notifier.py --tech-id 12 --validate
+
+With --offline it runs the whole flow in-process with no network and no
+provider accounts: the app starts with the load-test stubs, one Google
+and one Outlook tech are seeded, channels are opened, an event is added
+to each fake calendar, the notifications are delivered and the script
+checks that each tech's cached events picked up the change.
+"""
+import os
+import sys
+import uuid
+import asyncio
+import argparse
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from psycopg2.extras import RealDictCursor  # noqa: E402
+
+from src.utils.db import get_db_connection  # noqa: E402
+
+
+def load_channels(tech_id=None):
+    conn = get_db_connection()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        query = "SELECT * FROM calendar_channels WHERE expires_at > %s"
+        params = [datetime.utcnow()]
+        if tech_id is not None:
+            query += " AND technician_id = %s"
+            params.append(tech_id)
+        cur.execute(query + " ORDER BY technician_id", params)
+        return [dict(r) for r in cur.fetchall()]
+    finally:
+        cur.close()
+        conn.close()
+
+
+async def notify(client, channel, validate=False):
+    """Deliver one notification for ``channel``; returns the HTTP status."""
+    if channel["provider"] == "google":
+        response = await client.post("/api/calendar/notifications/google", headers={
+            "X-Goog-Channel-ID": channel["id"],
+            "X-Goog-Channel-Token": channel["client_state"],
+            "X-Goog-Resource-ID": channel["resource_id"] or "",
+            "X-Goog-Resource-State": "exists",
+            "X-Goog-Message-Number": "2",
+        })
+        return response.status_code
+
+    if validate:
+        token = uuid.uuid4().hex
+        response = await client.post("/api/calendar/notifications/outlook",
+                                     params={"validationToken": token})
+        if response.status_code != 200 or response.text != token:
+            print(f"  validation handshake failed: {response.status_code} {response.text[:80]}")
+    response = await client.post("/api/calendar/notifications/outlook", json={"value": [{
+        "subscriptionId": channel["id"],
+        "clientState": channel["client_state"],
+        "changeType": "updated",
+        "resource": "me/events/fake",
+        "subscriptionExpirationDateTime": channel["expires_at"].isoformat() + "Z",
+    }]})
+    return response.status_code
+
+
+async def send_to_server(args):
+    import httpx
+
+    channels = load_channels(args.tech_id)
+    if not channels:
+        print("No open calendar channels")
+        return 1
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=30) as client:
+        for channel in channels:
+            status = await notify(client, channel, validate=args.validate)
+            print(f"tech {channel['technician_id']} {channel['provider']} channel {channel['id']}: {status}")
+    return 0
+
+
+async def run_offline():
+    import httpx
+    import main
+    from loadtest import fixtures, stubs
+    from src.utils import calendar_sync
+
+    stubs.install_stubs({name: 0 for name in stubs.DEFAULT_LATENCIES})
+    calendar_sync.CALENDAR_WEBHOOK_BASE_URL = "http://fake-notifier"
+    failures = 0
+    async with main.app.router.lifespan_context(main.app):
+        fixtures.cleanup()
+        # Seeding alternates Google, Outlook, no calendar
+        fixtures.seed_technicians(2, seed=1)
+        try:
+            techs = _connected_techs(fixtures.LOADTEST_DOMAIN)
+            now = datetime.utcnow()
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://fake-notifier") as client:
+                for tech_id, provider in techs:
+                    calendar_sync.open_channel(tech_id)
+                    before = calendar_sync.get_cached_events(tech_id, now, now + timedelta(days=7))
+                    start = now.replace(microsecond=0) + timedelta(days=1)
+                    event_id = stubs.add_fake_calendar_event(provider, "Dentist", start, start + timedelta(hours=1))
+
+                    for channel in load_channels(tech_id):
+                        status = await notify(client, channel, validate=True)
+                        print(f"tech {tech_id} ({provider}): notification -> {status}")
+                    await asyncio.sleep(0.2)
+
+                    syncs_before = stubs.calls[provider if provider == "google" else "graph"]
+                    after = calendar_sync.get_cached_events(tech_id, now, now + timedelta(days=7))
+                    served_from_cache = stubs.calls[provider if provider == "google" else "graph"] == syncs_before
+                    ok = event_id in {e["id"] for e in after} and served_from_cache
+                    failures += not ok
+                    print(f"tech {tech_id} ({provider}): {len(before)} -> {len(after)} cached events, "
+                          f"read served from cache: {served_from_cache} -> {'PASS' if ok else 'FAIL'}")
+        finally:
+            fixtures.cleanup()
+    return 1 if failures else 0
+
+
+def _connected_techs(domain):
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            SELECT id, calendar_provider FROM technicians
+            WHERE email LIKE %s AND calendar_connected = TRUE
+            ORDER BY id
+        """, (f"%@{domain}",))
+        return cur.fetchall()
+    finally:
+        cur.close()
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--tech-id", type=int, help="only this technician's channels")
+    parser.add_argument("--validate", action="store_true",
+                        help="send the Graph validation handshake before each Outlook notification")
+    parser.add_argument("--offline", action="store_true",
+                        help="run the full flow in-process against stubbed providers")
+    args = parser.parse_args()
+    if not os.getenv("DATABASE_URL"):
+        parser.error("DATABASE_URL is not set")
+    if args.offline:
+        return asyncio.run(run_offline())
+    return asyncio.run(send_to_server(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,458 @@
+"""Fill the database with realistic synthetic data for scale testing.
+
+Generates users, technicians (skills JSONB, Charlotte-metro coordinates),
+appointments (non-overlapping per tech and day), appointments_cache and
+call_logs (with transcripts) at a chosen scale factor. Rows are streamed
+with COPY and the output is fully determined by --seed and --anchor-date
+(the "today" every date is laid out around; defaults to the real today),
+so benchmark runs can be repeated against identical data.
+
+Scale 1 is 100 technicians, 50k appointments, 5k cached GHL appointments
+and 50k call logs; everything grows linearly, so --scale 20 gives 2,000
+technicians and 1M appointments and call logs.
+
+    DATABASE_URL=postgresql://localhost/uhs_scale \\
+        python scripts/generate_synthetic_data.py --scale 20 --truncate
+
+By default the rollup/analytics triggers on appointments and call_logs are
+disabled during the load and the rollups are rebuilt once at the end,
+which is much faster than maintaining them row by row.
+"""
+import io
+import os
+import sys
+import json
+import time
+import random
+import argparse
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.db import create_tables, get_db_connection  # noqa: E402
+from src.utils.skills import rebuild_technician_skills  # noqa: E402
+
+SYNTHETIC_DOMAIN = "synthetic.example.test"
+# bcrypt("synthetic-password") with a fixed salt, so output is deterministic
+PASSWORD_HASH = "$2b$04$c3ludGhldGljc2FsdHNhbOVaCQ3YLev3iHjYuVD48rXIV66YR.e8C"
+
+PER_SCALE = {
+    "technicians": 100,
+    "appointments": 50_000,
+    "appointments_cache": 5_000,
+    "call_logs": 50_000,
+}
+
+SERVICE_DURATIONS = {
+    "chimney": 60,
+    "dryer_vent": 60,
+    "gutter": 60,
+    "power_washing": 90,
+    "air_duct": 120,
+}
+# How techs actually write their skills: canonical keys plus free text
+SKILL_SPELLINGS = {
+    "chimney": ["chimney", "Chimney Cleaning", "chimney sweep"],
+    "dryer_vent": ["dryer_vent", "Dryer Vent Cleaning", "dryer vent"],
+    "gutter": ["gutter", "Gutter Cleaning", "gutters"],
+    "power_washing": ["power_washing", "Pressure Washing", "power wash"],
+    "air_duct": ["air_duct", "Air Duct Cleaning", "duct cleaning"],
+}
+PRICES = {"chimney": 189, "dryer_vent": 129, "gutter": 149, "power_washing": 249, "air_duct": 399}
+
+# (name, lat, lng, weight)
+METRO_CENTERS = [
+    ("Charlotte", 35.2271, -80.8431, 10),
+    ("Matthews", 35.1168, -80.7237, 2),
+    ("Huntersville", 35.4107, -80.8429, 2),
+    ("Concord", 35.4088, -80.5795, 2),
+    ("Gastonia", 35.2621, -81.1873, 2),
+    ("Mooresville", 35.5849, -80.8101, 1),
+    ("Monroe", 34.9854, -80.5495, 1),
+    ("Indian Trail", 35.0768, -80.6692, 1),
+]
+FIRST_NAMES = [
+    "James", "Mary", "Robert", "Patricia", "John", "Jennifer", "Michael", "Linda",
+    "David", "Elizabeth", "William", "Barbara", "Richard", "Susan", "Joseph", "Jessica",
+    "Thomas", "Sarah", "Carlos", "Maria", "Andre", "Keisha", "Tyler", "Ashley",
+]
+LAST_NAMES = [
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis",
+    "Rodriguez", "Martinez", "Hernandez", "Lopez", "Wilson", "Anderson", "Thomas",
+    "Taylor", "Moore", "Jackson", "Martin", "Lee", "Thompson", "White", "Harris",
+]
+STREETS = [
+    "Providence Rd", "Park Rd", "Sharon Amity Rd", "Tryon St", "Monroe Rd", "Albemarle Rd",
+    "Central Ave", "Queens Rd", "Selwyn Ave", "Fairview Rd", "Rea Rd", "Ballantyne Pkwy",
+]
+DISCONNECTION_REASONS = [
+    ("user_hangup", 45), ("agent_hangup", 35), ("call_transfer", 6), ("inactivity", 4),
+    ("dial_no_answer", 4), ("dial_busy", 2), ("dial_failed", 1), ("error_llm_websocket_open", 1),
+    ("max_duration_reached", 1), ("voicemail_reached", 1),
+]
+
+
+def _weighted(rng, pairs):
+    total = sum(w for _, w in pairs)
+    pick = rng.uniform(0, total)
+    for value, weight in pairs:
+        pick -= weight
+        if pick <= 0:
+            return value
+    return pairs[-1][0]
+
+
+def _copy_value(value):
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value)
+    text = str(value)
+    return (text.replace("\\", "\\\\").replace("\t", "\\t")
+            .replace("\n", "\\n").replace("\r", "\\r"))
+
+
+def copy_rows(cur, table, columns, rows, batch_size):
+    """Stream rows into ``table`` with COPY, ``batch_size`` rows per round trip."""
+    sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN"
+    buffer = io.StringIO()
+    pending = 0
+    total = 0
+    for row in rows:
+        buffer.write("\t".join(_copy_value(v) for v in row))
+        buffer.write("\n")
+        pending += 1
+        if pending >= batch_size:
+            buffer.seek(0)
+            cur.copy_expert(sql, buffer)
+            total += pending
+            buffer = io.StringIO()
+            pending = 0
+    if pending:
+        buffer.seek(0)
+        cur.copy_expert(sql, buffer)
+        total += pending
+    return total
+
+
+def _person(rng):
+    return rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+
+
+def _phone(rng):
+    return f"704{rng.randint(2000000, 9999999)}"
+
+
+def _point_near(rng, lat, lng, spread):
+    return round(lat + rng.gauss(0, spread), 6), round(lng + rng.gauss(0, spread), 6)
+
+
+def _address(rng, city):
+    return f"{rng.randint(100, 9999)} {rng.choice(STREETS)}, {city}, NC {rng.randint(28012, 28299)}"
+
+
+def generate_users(rng, tech_count):
+    for i in range(tech_count):
+        first, last = _person(rng)
+        yield (
+            f"synth_tech_{i + 1:05d}", f"tech{i + 1:05d}@{SYNTHETIC_DOMAIN}", PASSWORD_HASH,
+            first, last, _phone(rng), False, True,
+        )
+
+
+def generate_technicians(rng, user_ids):
+    centers = [(c[:3], c[3]) for c in METRO_CENTERS]
+    for i, user_id in enumerate(user_ids):
+        city, lat, lng = _weighted(rng, centers)
+        home_lat, home_lng = _point_near(rng, lat, lng, 0.05)
+        services = rng.sample(list(SERVICE_DURATIONS), rng.choice([1, 2, 2, 3, 3, 4, 5]))
+        skills = [rng.choice(SKILL_SPELLINGS[s]) for s in services]
+        provider = _weighted(rng, [("google", 3), ("outlook", 2), (None, 5)])
+        yield (
+            user_id, f"Synthetic Tech {i + 1}", f"tech{i + 1:05d}@{SYNTHETIC_DOMAIN}", _phone(rng),
+            skills, _address(rng, city), home_lat, home_lng, rng.choice([20, 30, 40, 50]),
+            provider, f"tech{i + 1:05d}@{SYNTHETIC_DOMAIN}" if provider else None,
+            {"access_token": "synthetic", "refresh_token": "synthetic"} if provider else None,
+            bool(provider), "inactive" if rng.random() < 0.05 else "active",
+        )
+
+
+def _business_days(start, end):
+    day = start
+    while day <= end:
+        if day.weekday() < 6:  # Mon-Sat
+            yield day
+        day += timedelta(days=1)
+
+
+def generate_appointments(rng, techs, target, days_back, days_ahead, today):
+    """Lay out non-overlapping jobs per tech and day until ``target`` rows."""
+    days = list(_business_days(today - timedelta(days=days_back), today + timedelta(days=days_ahead)))
+    per_tech_day = target / max(1, len(techs) * len(days))
+    produced = 0
+    for day in days:
+        for tech_id, services, home_lat, home_lng in techs:
+            if produced >= target:
+                return
+            jobs = min(6, int(per_tech_day) + (1 if rng.random() < per_tech_day % 1 else 0))
+            cursor = datetime(day.year, day.month, day.day, 8, 0)
+            for _ in range(jobs):
+                if produced >= target:
+                    return
+                service = rng.choice(services)
+                duration = SERVICE_DURATIONS[service]
+                start = cursor + timedelta(minutes=rng.choice([0, 0, 30, 60]))
+                end = start + timedelta(minutes=duration)
+                if end.hour >= 17 and (end.hour, end.minute) != (17, 0):
+                    break
+                cursor = end + timedelta(minutes=30)
+                lat, lng = _point_near(rng, home_lat, home_lng, 0.08)
+                first, last = _person(rng)
+                if day < today:
+                    status = _weighted(rng, [("completed", 82), ("cancelled", 10), ("no_show", 5), ("scheduled", 3)])
+                else:
+                    status = _weighted(rng, [("scheduled", 90), ("cancelled", 10)])
+                discount = _weighted(rng, [(None, 80), ("10% manager discount", 12), ("senior", 8)])
+                created = start - timedelta(days=rng.randint(1, 21), minutes=rng.randint(0, 600))
+                produced += 1
+                yield (
+                    f"synthetic-{produced:09d}", tech_id, f"{first} {last}", _phone(rng),
+                    f"{first.lower()}.{last.lower()}{produced}@{SYNTHETIC_DOMAIN}", service,
+                    _address(rng, "Charlotte"), lat, lng, start, end, duration,
+                    PRICES[service] * (0.9 if discount else 1.0), discount, status,
+                    None, day < today, created, created,
+                )
+
+
+def generate_appointments_cache(rng, tech_ids, count, today):
+    for i in range(count):
+        day = today + timedelta(days=rng.randint(-30, 30))
+        start = datetime(day.year, day.month, day.day, rng.randint(8, 15), rng.choice([0, 30]))
+        first, last = _person(rng)
+        lat, lng = _point_near(rng, 35.2271, -80.8431, 0.15)
+        yield (
+            f"ghl_synth_{i + 1:08d}", rng.choice(tech_ids), f"{first} {last}", _phone(rng),
+            rng.choice(list(SERVICE_DURATIONS)), _address(rng, "Charlotte"), lat, lng,
+            start, start + timedelta(hours=1),
+            _weighted(rng, [("scheduled", 60), ("confirmed", 30), ("cancelled", 10)]),
+        )
+
+
+def _transcript(rng, customer, service, booked):
+    label = service.replace("_", " ")
+    turns = [
+        ("agent", "Thank you for calling United Home Services, how can I help you today?"),
+        ("user", f"Hi, this is {customer}. I'd like to get my {label} cleaned."),
+        ("agent", "I can help with that. What's the zip code for the property?"),
+        ("user", f"It's {rng.randint(28012, 28299)}."),
+        ("agent", "Great, we service that area. What's the full street address?"),
+        ("user", f"{rng.randint(100, 9999)} {rng.choice(STREETS)}."),
+        ("agent", "Thanks. What day works best for you?"),
+        ("user", rng.choice(["Tomorrow if possible.", "Sometime next week.", "This Friday."])),
+    ]
+    if booked:
+        turns += [
+            ("agent", f"I have a technician available at {rng.choice(['9', '10', '11', '1', '2'])} o'clock. Shall I book it?"),
+            ("user", "Yes, please."),
+            ("agent", "You're all set. You'll receive a confirmation shortly."),
+        ]
+    else:
+        turns += [
+            ("agent", "I'm sorry, we're fully booked that day. Would another day work?"),
+            ("user", "Let me check my calendar and call back."),
+        ]
+    turns.append(("user", rng.choice(["Thanks, bye.", "Thank you!", "Okay, bye."])))
+    return turns
+
+
+def generate_call_logs(rng, count, days_back, today):
+    start_of_range = datetime(today.year, today.month, today.day) - timedelta(days=days_back)
+    span_seconds = (days_back + 1) * 86400
+    for i in range(count):
+        started = start_of_range + timedelta(seconds=rng.randint(0, span_seconds - 1))
+        direction = _weighted(rng, [("inbound", 85), ("outbound", 15)])
+        reason = _weighted(rng, DISCONNECTION_REASONS)
+        dialed = not reason.startswith("dial_")
+        duration = rng.randint(45, 600) if dialed else rng.randint(0, 30)
+        start_ms = int(started.timestamp() * 1000)
+        first, last = _person(rng)
+        service = rng.choice(list(SERVICE_DURATIONS))
+        booked = dialed and rng.random() < 0.55
+        turns = _transcript(rng, f"{first} {last}", service, booked) if dialed else []
+        yield (
+            f"call_synth_{i + 1:09d}", "agent_synthetic", "phone_call", direction,
+            _phone(rng), "+17045550100",
+            "error" if reason.startswith("error") else "ended", reason,
+            start_ms, start_ms + duration * 1000, duration,
+            f"https://recordings.{SYNTHETIC_DOMAIN}/{i + 1}.wav" if dialed else None,
+            "\n".join(f"{'Agent' if r == 'agent' else 'User'}: {t}" for r, t in turns) or None,
+            [{"role": r, "content": t} for r, t in turns] or None,
+            {
+                "call_summary": f"Caller asked about {service.replace('_', ' ')}; "
+                                f"{'appointment booked' if booked else 'no booking'}.",
+                "user_sentiment": _weighted(rng, [("Positive", 55), ("Neutral", 35), ("Negative", 10)]),
+                "call_successful": booked,
+            } if dialed else None,
+            {"source": "synthetic"},
+            {"customer_name": f"{first} {last}"},
+            started,
+        )
+
+
+TRIGGERED_TABLES = ("appointments", "call_logs")
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected YYYY-MM-DD, got '{value}'")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--days-back", type=int, default=365)
+    parser.add_argument("--days-ahead", type=int, default=30)
+    parser.add_argument("--anchor-date", type=_parse_date, default=date.today(),
+                        help="YYYY-MM-DD treated as today; pin it to reproduce a dataset")
+    parser.add_argument("--batch-size", type=int, default=20_000)
+    parser.add_argument("--truncate", action="store_true",
+                        help="empty the generated tables (and dependent rows) first")
+    parser.add_argument("--keep-triggers", action="store_true",
+                        help="maintain rollups row by row instead of rebuilding at the end")
+    args = parser.parse_args()
+
+    if not os.getenv("DATABASE_URL"):
+        parser.error("DATABASE_URL is not set")
+
+    counts = {k: max(1, int(v * args.scale)) for k, v in PER_SCALE.items()}
+    rng = random.Random(args.seed)
+    today = args.anchor_date
+    timings = {}
+
+    create_tables()
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        if args.truncate:
+            cur.execute("""
+                TRUNCATE appointments, appointments_cache, route_cache, call_logs, technicians
+                RESTART IDENTITY CASCADE
+            """)
+            cur.execute("DELETE FROM users WHERE is_admin = FALSE")
+        else:
+            cur.execute("SELECT 1 FROM users WHERE email LIKE %s LIMIT 1", (f"%@{SYNTHETIC_DOMAIN}",))
+            if cur.fetchone():
+                parser.error("synthetic rows already present; rerun with --truncate")
+
+        if not args.keep_triggers:
+            for table in TRIGGERED_TABLES:
+                cur.execute(f"ALTER TABLE {table} DISABLE TRIGGER USER")
+
+        started = time.perf_counter()
+        copy_rows(cur, "users", [
+            "username", "email", "password_hash", "first_name", "last_name", "phone",
+            "is_admin", "is_active",
+        ], generate_users(rng, counts["technicians"]), args.batch_size)
+        cur.execute("SELECT id FROM users WHERE email LIKE %s ORDER BY id", (f"%@{SYNTHETIC_DOMAIN}",))
+        user_ids = [r[0] for r in cur.fetchall()]
+        timings["users"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        copy_rows(cur, "technicians", [
+            "user_id", "name", "email", "phone", "skills", "home_address", "home_latitude",
+            "home_longitude", "max_radius_miles", "calendar_provider", "calendar_email",
+            "calendar_credentials", "calendar_connected", "status",
+        ], generate_technicians(rng, user_ids), args.batch_size)
+        cur.execute("""
+            SELECT id, skills, home_latitude, home_longitude FROM technicians
+            WHERE email LIKE %s ORDER BY id
+        """, (f"%@{SYNTHETIC_DOMAIN}",))
+        techs = []
+        for tech_id, skills, lat, lng in cur.fetchall():
+            services = [
+                key for key, spellings in SKILL_SPELLINGS.items()
+                if any(s in spellings for s in skills)
+            ]
+            techs.append((tech_id, services, float(lat), float(lng)))
+        timings["technicians"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        copy_rows(cur, "appointments", [
+            "calendar_event_id", "technician_id", "customer_name", "customer_phone",
+            "customer_email", "service_type", "address", "latitude", "longitude", "start_time",
+            "end_time", "duration_minutes", "quoted_price", "discount_applied", "status", "notes",
+            "reminder_sent", "created_at", "updated_at",
+        ], generate_appointments(rng, techs, counts["appointments"], args.days_back,
+                                 args.days_ahead, today), args.batch_size)
+        timings["appointments"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        copy_rows(cur, "appointments_cache", [
+            "ghl_appointment_id", "technician_id", "customer_name", "customer_phone",
+            "service_type", "address", "latitude", "longitude", "start_time", "end_time", "status",
+        ], generate_appointments_cache(rng, [t[0] for t in techs], counts["appointments_cache"], today),
+            args.batch_size)
+        timings["appointments_cache"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        copy_rows(cur, "call_logs", [
+            "call_id", "agent_id", "call_type", "direction", "from_number", "to_number",
+            "call_status", "disconnection_reason", "start_timestamp", "end_timestamp",
+            "duration_seconds", "recording_url", "transcript", "transcript_object",
+            "call_analysis", "metadata", "dynamic_variables", "created_at",
+        ], generate_call_logs(rng, counts["call_logs"], args.days_back, today), args.batch_size)
+        timings["call_logs"] = time.perf_counter() - started
+
+        if not args.keep_triggers:
+            for table in TRIGGERED_TABLES:
+                cur.execute(f"ALTER TABLE {table} ENABLE TRIGGER USER")
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+    started = time.perf_counter()
+    rebuild_technician_skills()
+    timings["technician_skills"] = time.perf_counter() - started
+
+    if not args.keep_triggers:
+        from src.utils.analytics import rebuild_analytics
+        from src.utils.stats import rebuild_stats_rollups
+        started = time.perf_counter()
+        rebuild_stats_rollups()
+        rebuild_analytics()
+        timings["rollups"] = time.perf_counter() - started
+
+    conn = get_db_connection()
+    conn.autocommit = True
+    cur = conn.cursor()
+    try:
+        started = time.perf_counter()
+        for table in ("users", "technicians", "appointments", "appointments_cache", "call_logs",
+                      "technician_skills"):
+            cur.execute(f"ANALYZE {table}")
+        timings["analyze"] = time.perf_counter() - started
+        cur.execute("SELECT COUNT(*) FROM appointments")
+        appointment_total = cur.fetchone()[0]
+    finally:
+        cur.close()
+        conn.close()
+
+    print(f"scale={args.scale} seed={args.seed}")
+    for name, count in counts.items():
+        print(f"  {name:24} {count:>10,}")
+    print(f"  {'appointments written':24} {appointment_total:>10,}")
+    for name, seconds in timings.items():
+        print(f"  {name + ' time':24} {seconds:>9.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Run background job workers outside the API process.
+
+The app already runs workers for every queue; start this next to it (or
+on another host) to add capacity, or run the API with
+``JOB_WORKERS_ENABLED=false`` and keep all job processing here:
+
+    python scripts/run_job_worker.py
+    python scripts/run_job_worker.py --queue calendar --queue geocode
+
+Per-queue thread counts come from ``JOB_QUEUE_CONCURRENCY``. Stops
+cleanly on SIGINT / SIGTERM after the running jobs finish.
+"""
+import os
+import sys
+import signal
+import logging
+import argparse
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.db import create_tables  # noqa: E402
+from src.utils.job_queue import start_job_workers, stop_job_workers  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--queue", action="append", dest="queues",
+                        help="queue to work (repeatable; default: every registered queue)")
+    args = parser.parse_args()
+    if not os.getenv("DATABASE_URL"):
+        parser.error("DATABASE_URL is not set")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    create_tables()
+    start_job_workers(args.queues)
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    stop.wait()
+    logging.info("[JOBS] Stopping workers")
+    stop_job_workers()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
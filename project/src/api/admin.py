@@ -12,11 +12,12 @@ from src.utils.db import (
     get_user_detail_with_calendar,
     update_user,
     get_appointments_paginated,
-    get_appointment_stats,
     deactivate_user,
     activate_user,
     delete_user
 )
+from src.utils.stats import get_appointment_stats
+from src.utils.unit_of_work import UnitOfWork
 from src.api.models import CreateUserRequest, UpdateUserRequest
 
 router = APIRouter()
@@ -84,22 +85,12 @@ async def list_users(
 
 
 @router.post("/users/create")
-async def create_user(
+def create_user(
     request: CreateUserRequest,
-    current_user: dict = Depends(require_admin)
+    current_user: dict = Depends(require_admin),
+    conn=UnitOfWork
 ):
     try:
-        home_latitude = None
-        home_longitude = None
-        home_address = request.address  # fallback to raw input
-        if request.address:
-            from src.utils.radar import geocode_address
-            geo_result = geocode_address(request.address)
-            if geo_result:
-                home_latitude = geo_result["latitude"]
-                home_longitude = geo_result["longitude"]
-                home_address = geo_result.get("formatted_address", request.address)
-
         temp_password = _generate_temp_password()
         user = create_user_by_admin(
             {
@@ -109,11 +100,11 @@ async def create_user(
                 "phone": request.phone,
                 "address": request.address,
                 "skills": request.skills,
-                "home_latitude": home_latitude,
-                "home_longitude": home_longitude,
-                "home_address": home_address,
+                # Geocoded by a background job once the tech row exists
+                "home_address": request.address,
             },
-            temp_password
+            temp_password,
+            conn=conn
         )
         if not user:
             raise HTTPException(status_code=400, detail="Failed to create user")
@@ -125,7 +116,9 @@ async def create_user(
                 user_email=request.email,
                 user_name=request.username,
                 temp_password=temp_password,
-                login_url=f"{frontend_url}/login"
+                login_url=f"{frontend_url}/login",
+                # Queued in the request's transaction: no email for a user that never commits
+                conn=conn
             )
         except Exception as mail_err:
             logging.error(f"Welcome email failed: {mail_err}")
@@ -207,13 +200,14 @@ async def get_user_detail(
 async def update_user_endpoint(
     user_id: int,
     request: UpdateUserRequest,
-    current_user: dict = Depends(require_admin)
+    current_user: dict = Depends(require_admin),
+    conn=UnitOfWork
 ):
     try:
         updates = request.model_dump(exclude_none=True)
         if not updates:
             raise HTTPException(status_code=400, detail="No fields to update")
-        user = update_user(user_id, updates)
+        user = update_user(user_id, updates, conn=conn)
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         return JSONResponse(
@@ -495,3 +489,269 @@ async def admin_calendar_disconnect(current_user: dict = Depends(require_admin))
     disconnect_admin_calendar()
     return JSONResponse(status_code=200, content={"success": True, "message": "Admin calendar disconnected"})
 
+
+
+# ---------------------------------------------------------------------------
+# Mail outbox
+# ---------------------------------------------------------------------------
+
+@router.get("/mail/outbox")
+async def list_mail_outbox(
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=100),
+    status: str = Query(None, pattern="^(pending|sending|sent|failed)$"),
+    current_user: dict = Depends(require_admin)
+):
+    from src.utils.mail_outbox import get_outbox_messages
+    try:
+        result = get_outbox_messages(page, page_size, status)
+        messages_out = []
+        for m in result["messages"]:
+            messages_out.append({
+                "id": m["id"],
+                "to_email": m["to_email"],
+                "subject": m["subject"],
+                "status": m["status"],
+                "attempts": m["attempts"],
+                "last_error": m.get("last_error"),
+                "next_attempt_at": str(m.get("next_attempt_at") or ""),
+                "created_at": str(m.get("created_at") or ""),
+                "sent_at": str(m["sent_at"]) if m.get("sent_at") else None
+            })
+        return JSONResponse(
+            status_code=200,
+            content={
+                "success": True,
+                "data": messages_out,
+                "pagination": {
+                    "total": result["total"],
+                    "page": result["page"],
+                    "page_size": result["page_size"],
+                    "total_pages": result["total_pages"]
+                }
+            }
+        )
+    except Exception as e:
+        logging.error(f"List mail outbox error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to fetch mail outbox")
+
+
+@router.post("/mail/outbox/{message_id}/retry")
+async def retry_mail_outbox_message(
+    message_id: int,
+    current_user: dict = Depends(require_admin)
+):
+    from src.utils.mail_outbox import retry_message
+    if not retry_message(message_id):
+        raise HTTPException(status_code=404, detail="No failed message with that id")
+    return JSONResponse(status_code=200, content={"success": True, "message": "Message re-queued"})
+
+
+# ---------------------------------------------------------------------------
+# Background jobs
+# ---------------------------------------------------------------------------
+
+@router.get("/jobs")
+async def list_jobs(
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=100),
+    queue: str = Query(None),
+    status: str = Query(None, pattern="^(pending|running|done|dead)$"),
+    current_user: dict = Depends(require_admin)
+):
+    from src.utils.job_queue import get_jobs
+    try:
+        result = get_jobs(page, page_size, queue, status)
+        jobs_out = []
+        for j in result["jobs"]:
+            jobs_out.append({
+                "id": j["id"],
+                "queue": j["queue"],
+                "task": j["task"],
+                "payload": j["payload"],
+                "priority": j["priority"],
+                "status": j["status"],
+                "attempts": j["attempts"],
+                "max_attempts": j["max_attempts"],
+                "run_at": str(j.get("run_at") or ""),
+                "locked_by": j.get("locked_by"),
+                "last_error": j.get("last_error"),
+                "created_at": str(j.get("created_at") or ""),
+                "finished_at": str(j["finished_at"]) if j.get("finished_at") else None
+            })
+        return JSONResponse(
+            status_code=200,
+            content={
+                "success": True,
+                "data": jobs_out,
+                "pagination": {
+                    "total": result["total"],
+                    "page": result["page"],
+                    "page_size": result["page_size"],
+                    "total_pages": result["total_pages"]
+                }
+            }
+        )
+    except Exception as e:
+        logging.error(f"List jobs error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to fetch jobs")
+
+
+@router.post("/jobs/{job_id}/retry")
+async def retry_dead_job(
+    job_id: int,
+    current_user: dict = Depends(require_admin)
+):
+    from src.utils.job_queue import retry_job
+    if not retry_job(job_id):
+        raise HTTPException(status_code=404, detail="No dead-lettered job with that id")
+    return JSONResponse(status_code=200, content={"success": True, "message": "Job re-queued"})
+
+
+@router.get("/password-hashing")
+async def password_hashing_status(current_user: dict = Depends(require_admin)):
+    from src.utils.password_hashing import password_hashing_stats
+    return JSONResponse(status_code=200, content={"success": True, "data": password_hashing_stats()})
+
+
+@router.get("/traces")
+async def list_tool_traces(
+    limit: int = Query(20, ge=1, le=200),
+    tool: str = Query(None),
+    over_budget_only: bool = Query(False),
+    current_user: dict = Depends(require_admin)
+):
+    """Slowest recent Retell tool calls with their per-phase breakdown."""
+    from src.utils.tracing import TOOL_TIMEOUTS, TRACE_SLOW_FRACTION, get_recent_traces
+    return JSONResponse(
+        status_code=200,
+        content={
+            "success": True,
+            "data": get_recent_traces(limit, tool, over_budget_only),
+            "tool_timeouts_seconds": TOOL_TIMEOUTS,
+            "slow_fraction": TRACE_SLOW_FRACTION,
+        }
+    )
+
+
+@router.get("/queries")
+async def list_query_stats(
+    sort: str = Query("total_ms"),
+    limit: int = Query(50, ge=1, le=500),
+    current_user: dict = Depends(require_admin)
+):
+    """Per-fingerprint SQL timings recorded by the query log."""
+    from src.utils.query_log import SLOW_QUERY_MS, get_query_stats
+    return JSONResponse(
+        status_code=200,
+        content={
+            "success": True,
+            "data": get_query_stats(sort, limit),
+            "slow_query_ms": SLOW_QUERY_MS,
+        }
+    )
+
+
+@router.get("/queries/{fingerprint}/explains")
+async def get_query_explain_samples(
+    fingerprint: str,
+    current_user: dict = Depends(require_admin)
+):
+    from src.utils.query_log import get_query_explains
+    result = get_query_explains(fingerprint)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Unknown query fingerprint")
+    return JSONResponse(status_code=200, content={"success": True, "data": result})
+
+
+@router.post("/queries/reset")
+async def reset_query_log(current_user: dict = Depends(require_admin)):
+    from src.utils.query_log import reset_query_stats
+    reset_query_stats()
+    return JSONResponse(status_code=200, content={"success": True, "message": "Query stats reset"})
+
+
+MAX_LOCATION_SAMPLES = 500
+
+
+def _parse_eastern(value, field):
+    """ISO datetime -> naive Eastern, the convention appointment times use."""
+    from datetime import datetime
+    from zoneinfo import ZoneInfo
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {field}; use ISO 8601")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(ZoneInfo("America/New_York")).replace(tzinfo=None)
+    return parsed
+
+
+@router.get("/technicians/locations")
+async def technician_locations(
+    at: str = Query(None),
+    start: str = Query(None),
+    end: str = Query(None),
+    step_minutes: int = Query(15, ge=1, le=1440),
+    current_user: dict = Depends(require_admin)
+):
+    """Estimated positions of all active technicians as GeoJSON.
+
+    With ``at`` (default: now) each tech is a Point. With ``start`` and
+    ``end`` each tech is a LineString sampled every ``step_minutes`` for
+    map playback; ``properties.times`` and ``properties.states`` line up
+    with the coordinates.
+    """
+    from datetime import datetime, timedelta
+    from zoneinfo import ZoneInfo
+    from src.utils.distance import estimate_tech_locations
+
+    if start or end:
+        if not (start and end):
+            raise HTTPException(status_code=400, detail="start and end must be given together")
+        range_start = _parse_eastern(start, "start")
+        range_end = _parse_eastern(end, "end")
+        if range_end < range_start:
+            raise HTTPException(status_code=400, detail="end is before start")
+        step = timedelta(minutes=step_minutes)
+        if (range_end - range_start) / step >= MAX_LOCATION_SAMPLES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"At most {MAX_LOCATION_SAMPLES} samples; increase step_minutes",
+            )
+        times = []
+        t = range_start
+        while t <= range_end:
+            times.append(t)
+            t += step
+    elif at:
+        times = [_parse_eastern(at, "at")]
+    else:
+        times = [datetime.now(ZoneInfo("America/New_York")).replace(tzinfo=None, microsecond=0)]
+
+    try:
+        techs = estimate_tech_locations(times)
+    except Exception as e:
+        logging.error(f"Technician locations error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to estimate technician locations")
+
+    features = []
+    for tech in techs:
+        coordinates = [[lon, lat] for lat, lon, _ in tech["positions"]]
+        states = [state for _, _, state in tech["positions"]]
+        properties = {"technician_id": tech["id"], "name": tech["name"]}
+        if len(times) == 1:
+            geometry = {"type": "Point", "coordinates": coordinates[0]}
+            properties["state"] = states[0]
+            properties["time"] = times[0].isoformat()
+        else:
+            geometry = {"type": "LineString", "coordinates": coordinates}
+            properties["states"] = states
+            properties["times"] = [t.isoformat() for t in times]
+        features.append({"type": "Feature", "geometry": geometry, "properties": properties})
+
+    return JSONResponse(
+        status_code=200,
+        media_type="application/geo+json",
+        content={"type": "FeatureCollection", "features": features},
+    )
@@ -0,0 +1,55 @@
+"""Analytics API -- time series served from pre-aggregated buckets."""
+import logging
+from datetime import datetime, timedelta
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import JSONResponse
+
+from src.utils.auth import require_admin
+from src.utils.analytics import METRICS, query_metric
+
+router = APIRouter()
+
+
+@router.get("/metrics")
+async def list_metrics(current_user: dict = Depends(require_admin)):
+    return JSONResponse(
+        status_code=200,
+        content={
+            "success": True,
+            "data": [{"metric": m, "dimension": d} for m, d in METRICS.items()]
+        }
+    )
+
+
+@router.get("/query")
+async def query_analytics(
+    metric: str = Query(...),
+    bucket: str = Query("day", pattern="^(hour|day)$"),
+    start: datetime = Query(None),
+    end: datetime = Query(None),
+    group_by: str = Query("none", pattern="^(none|dimension)$"),
+    current_user: dict = Depends(require_admin)
+):
+    """Query a metric over ``[start, end)``. Defaults to the last 30 days
+    (or last 48 hours for hourly buckets)."""
+    try:
+        end = end or datetime.now()
+        if not start:
+            start = end - (timedelta(hours=48) if bucket == "hour" else timedelta(days=30))
+        # Buckets are stored as naive local timestamps; convert aware input
+        # to local time before dropping the offset
+        if start.tzinfo:
+            start = start.astimezone().replace(tzinfo=None)
+        if end.tzinfo:
+            end = end.astimezone().replace(tzinfo=None)
+        result = query_metric(metric, bucket, start, end, group_by)
+        return JSONResponse(
+            status_code=200,
+            content={"success": True, "data": result}
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logging.error(f"Analytics query error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to query analytics")
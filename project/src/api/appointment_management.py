@@ -8,15 +8,47 @@ from src.utils.db import (
     get_appointments_paginated,
     get_appointment_by_id,
     update_appointment_status as db_update_status,
-    get_appointment_stats,
     create_appointment as db_create_appointment,
     get_technician_by_user_id
 )
+from src.utils.stats import get_appointment_stats
 from src.api.models import UpdateAppointmentStatus, CreateAppointmentRequest
 
 router = APIRouter()
 
 
+def _appointment_out(a):
+    return {
+        "id": a["id"],
+        "calendar_event_id": a.get("calendar_event_id"),
+        "status": a["status"],
+        "service_type": a["service_type"],
+        "customer": {
+            "name": a["customer_name"],
+            "phone": a.get("customer_phone"),
+            "email": a.get("customer_email")
+        },
+        "technician": {
+            "id": a["technician_id"],
+            "name": a.get("technician_name")
+        },
+        "schedule": {
+            "start_time": str(a["start_time"]),
+            "end_time": str(a["end_time"]),
+            "duration_minutes": a.get("duration_minutes")
+        },
+        "location": {
+            "address": a.get("address"),
+            "latitude": float(a["latitude"]) if a.get("latitude") else None,
+            "longitude": float(a["longitude"]) if a.get("longitude") else None
+        },
+        "pricing": {
+            "quoted_price": float(a["quoted_price"]) if a.get("quoted_price") else None,
+            "discount_applied": a.get("discount_applied")
+        },
+        "notes": a.get("notes"),
+        "created_at": str(a.get("created_at", ""))
+    }
 
 
 @router.get("/admin/list")
@@ -44,37 +76,7 @@ async def admin_list_appointments(
         )
         appointments_out = {}
         for a in result["appointments"]:
-            appointments_out[str(a["id"])] = {
-                "id": a["id"],
-                "calendar_event_id": a.get("calendar_event_id"),
-                "status": a["status"],
-                "service_type": a["service_type"],
-                "customer": {
-                    "name": a["customer_name"],
-                    "phone": a.get("customer_phone"),
-                    "email": a.get("customer_email")
-                },
-                "technician": {
-                    "id": a["technician_id"],
-                    "name": a.get("technician_name")
-                },
-                "schedule": {
-                    "start_time": str(a["start_time"]),
-                    "end_time": str(a["end_time"]),
-                    "duration_minutes": a.get("duration_minutes")
-                },
-                "location": {
-                    "address": a.get("address"),
-                    "latitude": float(a["latitude"]) if a.get("latitude") else None,
-                    "longitude": float(a["longitude"]) if a.get("longitude") else None
-                },
-                "pricing": {
-                    "quoted_price": float(a["quoted_price"]) if a.get("quoted_price") else None,
-                    "discount_applied": a.get("discount_applied")
-                },
-                "notes": a.get("notes"),
-                "created_at": str(a.get("created_at", ""))
-            }
+            appointments_out[str(a["id"])] = _appointment_out(a)
         return JSONResponse(
             status_code=200,
             content={
@@ -12,17 +12,19 @@ from src.utils.radar import geocode_address
 from src.utils.db import (
     get_techs_with_appointments_for_day,
     get_technician,
-    get_calendar_credentials,
     insert_appointment,
     delete_route_cache,
 )
 from src.utils.distance import calculate_distance, estimate_tech_location
 from src.utils.api_key_auth import verify_retell_api_key
+from src.utils.tracing import span, traced_tool
+from src.utils.unit_of_work import UnitOfWork
 
 router = APIRouter()
 
 
 @router.post("/get-current-datetime")
+@traced_tool("get_current_datetime")
 def get_current_datetime(_auth=Depends(verify_retell_api_key)):
     """Return the current date and time in Eastern Time for the agent."""
     eastern = ZoneInfo("America/New_York")
@@ -36,6 +38,7 @@ def get_current_datetime(_auth=Depends(verify_retell_api_key)):
 
 
 @router.post("/simulate-manager-check")
+@traced_tool("simulate_manager_check")
 def simulate_manager_check(_auth=Depends(verify_retell_api_key)):
     """Simulate a manager approval check with an 8-second delay.
 
@@ -57,11 +60,10 @@ class VerifyZipRequest(BaseModel):
 
 
 @router.post("/verify-zip")
+@traced_tool("verify_zip")
 def verify_zip(request: VerifyZipRequest, _auth=Depends(verify_retell_api_key)):
-    import os
-    import requests as http_requests
+    from src.services.radar_client import get_radar_client
 
-    api_key = os.getenv("RADAR_API_KEY", "")
     zip_input = request.zip_code.strip()
 
     CHARLOTTE_METRO_CITIES = {
@@ -97,13 +99,7 @@ def verify_zip(request: VerifyZipRequest, _auth=Depends(verify_retell_api_key)):
     LNG_MIN, LNG_MAX = -81.65, -80.10
 
     try:
-        resp = http_requests.get(
-            "https://api.radar.io/v1/geocode/forward",
-            headers={"Authorization": api_key},
-            params={"query": zip_input},
-            timeout=8,
-        )
-        data = resp.json()
+        data = get_radar_client().geocode_forward(zip_input, operation="verify_zip")
         addresses = data.get("addresses", [])
 
         if not addresses:
@@ -213,6 +209,7 @@ class BookAppointmentResponse(BaseModel):
 
 
 @router.post("/verify-address")
+@traced_tool("verify_address")
 def verify_address(request: VerifyAddressRequest, _auth=Depends(verify_retell_api_key)):
     try:
         result = geocode_address(request.messy_input)
@@ -273,7 +270,52 @@ BUSINESS_END_HOUR = 17    # 5:00 PM
 TRAVEL_BUFFER_MINUTES = 30
 
 
+def _as_eastern(value, eastern):
+    if hasattr(value, 'tzinfo') and value.tzinfo is None:
+        return value.replace(tzinfo=eastern)
+    return value
+
+
+def find_earliest_slot(appointments, req_date, service_duration, home_lat, home_lon):
+    """Earliest start on ``req_date`` that fits ``service_duration`` minutes.
+
+    Returns ``(slot_start, depart_lat, depart_lon)`` -- the departure point is
+    home or the job the tech is coming from -- or None if the day is full.
+    """
+    eastern = ZoneInfo("America/New_York")
+    appointments = sorted(appointments, key=lambda a: a["start_time"])
+    slot_start = datetime(req_date.year, req_date.month, req_date.day,
+                          BUSINESS_START_HOUR, 0, tzinfo=eastern)
+    business_end = datetime(req_date.year, req_date.month, req_date.day,
+                            BUSINESS_END_HOUR, 0, tzinfo=eastern)
+    slot_duration = timedelta(minutes=service_duration)
+    travel_buffer = timedelta(minutes=TRAVEL_BUFFER_MINUTES)
+
+    if not appointments:
+        # No appointments -- first slot of the day from home
+        if slot_start + slot_duration <= business_end:
+            return slot_start, home_lat, home_lon
+        return None
+
+    # Try to fit before the first appointment, departing from home
+    if slot_start + slot_duration + travel_buffer <= _as_eastern(appointments[0]["start_time"], eastern):
+        return slot_start, home_lat, home_lon
+
+    # Try gaps between existing appointments, departing from the previous job site
+    for i, appt in enumerate(appointments):
+        candidate_start = _as_eastern(appt["end_time"], eastern) + travel_buffer
+        if i + 1 < len(appointments):
+            next_start = _as_eastern(appointments[i + 1]["start_time"], eastern)
+            if candidate_start + slot_duration + travel_buffer <= next_start:
+                return candidate_start, float(appt["latitude"]), float(appt["longitude"])
+        elif candidate_start + slot_duration <= business_end:
+            # After last appointment
+            return candidate_start, float(appt["latitude"]), float(appt["longitude"])
+    return None
+
+
 @router.post("/find-technician-availability", response_model=FindTechnicianResponse)
+@traced_tool("check_technician_availability")
 def find_technician_availability(request: FindTechnicianRequest, _auth=Depends(verify_retell_api_key)):
     """Find the best available technician for a given date.
 
@@ -294,7 +336,6 @@ def find_technician_availability(request: FindTechnicianRequest, _auth=Depends(v
                 message="Invalid date format. Please use YYYY-MM-DD.",
             )
 
-        eastern = ZoneInfo("America/New_York")
         service_duration = SERVICE_DURATIONS.get(request.service_type, 60)
 
         logging.info(
@@ -304,7 +345,8 @@ def find_technician_availability(request: FindTechnicianRequest, _auth=Depends(v
         )
 
         # Single query: techs with the right skill + their appointments for the day
-        techs = get_techs_with_appointments_for_day(request.service_type, req_date)
+        with span("db.techs_for_day"):
+            techs = get_techs_with_appointments_for_day(request.service_type, req_date)
         logging.info(
             "[AVAILABILITY] Found %d techs for '%s': %s",
             len(techs), request.service_type,
@@ -319,105 +361,54 @@ def find_technician_availability(request: FindTechnicianRequest, _auth=Depends(v
             )
 
         candidates = []
+        with span("slot_search", technicians=len(techs)):
+            for tech in techs:
+                # Skip techs without home coordinates
+                if not tech.get("home_latitude") or not tech.get("home_longitude"):
+                    logging.warning(
+                        "Tech %s (id=%d) has no home coordinates, skipping",
+                        tech["name"], tech["id"],
+                    )
+                    continue
 
-        for tech in techs:
-            # Skip techs without home coordinates
-            if not tech.get("home_latitude") or not tech.get("home_longitude"):
-                logging.warning(
-                    "Tech %s (id=%d) has no home coordinates, skipping",
-                    tech["name"], tech["id"],
+                # Step 3: Find the earliest available slot
+                slot = find_earliest_slot(
+                    tech["appointments"], req_date, service_duration,
+                    float(tech["home_latitude"]), float(tech["home_longitude"]),
                 )
-                continue
-
-            # Appointments already loaded from the combined query
-            appointments = sorted(tech["appointments"], key=lambda a: a["start_time"])
-
-            # Step 3: Find the earliest available slot
-            slot_start = datetime(req_date.year, req_date.month, req_date.day,
-                                  BUSINESS_START_HOUR, 0, tzinfo=eastern)
-            business_end = datetime(req_date.year, req_date.month, req_date.day,
-                                    BUSINESS_END_HOUR, 0, tzinfo=eastern)
-            slot_duration = timedelta(minutes=service_duration)
-            travel_buffer = timedelta(minutes=TRAVEL_BUFFER_MINUTES)
-
-            found_slot = None
-            depart_from_lat = float(tech["home_latitude"])
-            depart_from_lon = float(tech["home_longitude"])
-
-            if not appointments:
-                # No appointments -- first slot of the day from home
-                if slot_start + slot_duration <= business_end:
-                    found_slot = slot_start
-                    # Distance from home
-            else:
-                # Try to fit before the first appointment
-                first_appt_start = appointments[0]["start_time"]
-                if hasattr(first_appt_start, 'tzinfo') and first_appt_start.tzinfo is None:
-                    first_appt_start = first_appt_start.replace(tzinfo=eastern)
-
-                if slot_start + slot_duration + travel_buffer <= first_appt_start:
-                    found_slot = slot_start
-                    # Distance from home (departing at start of day)
-                else:
-                    # Try gaps between existing appointments
-                    for i, appt in enumerate(appointments):
-                        appt_end = appt["end_time"]
-                        if hasattr(appt_end, 'tzinfo') and appt_end.tzinfo is None:
-                            appt_end = appt_end.replace(tzinfo=eastern)
-
-                        candidate_start = appt_end + travel_buffer
-
-                        # Check if this slot fits before the next appointment
-                        if i + 1 < len(appointments):
-                            next_start = appointments[i + 1]["start_time"]
-                            if hasattr(next_start, 'tzinfo') and next_start.tzinfo is None:
-                                next_start = next_start.replace(tzinfo=eastern)
-                            if candidate_start + slot_duration + travel_buffer <= next_start:
-                                found_slot = candidate_start
-                                # Departing from this appointment's job site
-                                depart_from_lat = float(appt["latitude"])
-                                depart_from_lon = float(appt["longitude"])
-                                break
-                        else:
-                            # After last appointment
-                            if candidate_start + slot_duration <= business_end:
-                                found_slot = candidate_start
-                                depart_from_lat = float(appt["latitude"])
-                                depart_from_lon = float(appt["longitude"])
-                                break
-
-            if not found_slot:
-                logging.info(
-                    "[AVAILABILITY] Tech %s (id=%d) is FULL on %s",
-                    tech["name"], tech["id"], req_date,
+                if not slot:
+                    logging.info(
+                        "[AVAILABILITY] Tech %s (id=%d) is FULL on %s",
+                        tech["name"], tech["id"], req_date,
+                    )
+                    continue
+                found_slot, depart_from_lat, depart_from_lon = slot
+
+                # Step 4: Calculate distance from departure point to customer
+                distance = calculate_distance(
+                    depart_from_lat, depart_from_lon,
+                    request.confirmed_latitude, request.confirmed_longitude,
                 )
-                continue
 
-            # Step 4: Calculate distance from departure point to customer
-            distance = calculate_distance(
-                depart_from_lat, depart_from_lon,
-                request.confirmed_latitude, request.confirmed_longitude,
-            )
+                max_radius = tech.get("max_radius_miles") or 50
 
-            max_radius = tech.get("max_radius_miles") or 50
+                if distance > max_radius:
+                    logging.warning(
+                        "[AVAILABILITY] Tech %s (id=%d): %.1f mi from job site, max=%dmi -- TOO FAR",
+                        tech["name"], tech["id"], distance, max_radius,
+                    )
+                    continue
 
-            if distance > max_radius:
-                logging.warning(
-                    "[AVAILABILITY] Tech %s (id=%d): %.1f mi from job site, max=%dmi -- TOO FAR",
-                    tech["name"], tech["id"], distance, max_radius,
+                logging.info(
+                    "[AVAILABILITY] Tech %s (id=%d): slot=%s, %.1f mi from departure point",
+                    tech["name"], tech["id"], found_slot.strftime("%I:%M %p"), distance,
                 )
-                continue
-
-            logging.info(
-                "[AVAILABILITY] Tech %s (id=%d): slot=%s, %.1f mi from departure point",
-                tech["name"], tech["id"], found_slot.strftime("%I:%M %p"), distance,
-            )
 
-            candidates.append({
-                "tech": tech,
-                "slot": found_slot,
-                "distance": distance,
-            })
+                candidates.append({
+                    "tech": tech,
+                    "slot": found_slot,
+                    "distance": distance,
+                })
 
         if not candidates:
             # Log all distances for debugging
@@ -460,11 +451,14 @@ def find_technician_availability(request: FindTechnicianRequest, _auth=Depends(v
         )
 
 @router.post("/book-appointment", response_model=BookAppointmentResponse)
-def book_appointment(request: BookAppointmentRequest, _auth=Depends(verify_retell_api_key)):
+@traced_tool("book_appointment")
+def book_appointment(request: BookAppointmentRequest, _auth=Depends(verify_retell_api_key),
+                     conn=UnitOfWork):
     logging.info(f"[BOOKING] Request: customer={request.customer_name}, phone={request.customer_phone}, tech_id={request.technician_id}, service={request.service_type}, time={request.start_time}, address={request.address}")
 
     try:
-        tech = get_technician(request.technician_id)
+        with span("db.get_technician"):
+            tech = get_technician(request.technician_id, conn=conn)
         logging.info(f"[BOOKING] Tech lookup: {'found ' + tech['name'] if tech else 'NOT FOUND'} (id={request.technician_id})")
 
         if not tech:
@@ -475,139 +469,33 @@ def book_appointment(request: BookAppointmentRequest, _auth=Depends(verify_retel
         appointment_id = str(uuid.uuid4())
         logging.info(f"[BOOKING] Generated appointment_id={appointment_id}")
 
-        insert_appointment(
-            calendar_event_id=appointment_id,
-            technician_id=request.technician_id,
-            customer_name=request.customer_name,
-            customer_phone=request.customer_phone,
-            customer_email=request.customer_email,
-            service_type=request.service_type,
-            address=request.address,
-            latitude=request.latitude,
-            longitude=request.longitude,
-            start_time=request.start_time,
-            end_time=end_time,
-            duration_minutes=request.duration_minutes,
-            status="scheduled",
-            quoted_price=request.quoted_price,
-            discount_applied=request.discount_applied,
-        )
-
-        delete_route_cache(request.technician_id, request.start_time.date())
+        with span("db.insert_appointment"):
+            row_id = insert_appointment(
+                calendar_event_id=appointment_id,
+                technician_id=request.technician_id,
+                customer_name=request.customer_name,
+                customer_phone=request.customer_phone,
+                customer_email=request.customer_email,
+                service_type=request.service_type,
+                address=request.address,
+                latitude=request.latitude,
+                longitude=request.longitude,
+                start_time=request.start_time,
+                end_time=end_time,
+                duration_minutes=request.duration_minutes,
+                status="scheduled",
+                quoted_price=request.quoted_price,
+                discount_applied=request.discount_applied,
+                conn=conn,
+            )
 
-        # Push event to technician's connected Google or Outlook calendar (non-fatal)
-        try:
-            creds = get_calendar_credentials(request.technician_id)
-            if creds and creds.get("calendar_connected"):
-                provider = creds.get("calendar_provider")
-                creds_dict = creds.get("calendar_credentials", {})
-                service_label = request.service_type.replace("_", " ").title()
-                event_summary = f"{service_label} - {request.customer_name}"
-                event_description = (
-                    f"Customer: {request.customer_name}\n"
-                    f"Phone: {request.customer_phone}\n"
-                    f"Email: {request.customer_email or 'N/A'}\n"
-                    f"Service: {service_label}\n"
-                    f"Price: ${request.quoted_price}\n"
-                    f"Discount: {request.discount_applied or 'none'}\n"
-                    f"Appointment ID: {appointment_id}"
-                )
-                attendees = [request.customer_email] if request.customer_email else []
-                if provider == "google":
-                    from src.services.google_calendar import GoogleCalendarService
-                    from src.utils.db import save_calendar_credentials
-                    cal = GoogleCalendarService(creds_dict)
-                    cal.create_event(
-                        summary=event_summary,
-                        start_datetime=request.start_time,
-                        end_datetime=end_time,
-                        description=event_description,
-                        location=request.address,
-                        attendees=attendees,
-                    )
-                    save_calendar_credentials(
-                        request.technician_id, "google",
-                        creds.get("calendar_email", ""),
-                        cal.get_updated_credentials(),
-                    )
-                    logging.info("[BOOKING] Google Calendar event created for tech %d", request.technician_id)
-                elif provider == "outlook":
-                    from src.services.outlook_calendar import OutlookCalendarService
-                    from src.utils.db import save_calendar_credentials
-                    cal = OutlookCalendarService(creds_dict)
-                    cal.create_event(
-                        summary=event_summary,
-                        start_datetime=request.start_time,
-                        end_datetime=end_time,
-                        description=event_description,
-                        location=request.address,
-                        attendees=attendees,
-                    )
-                    save_calendar_credentials(
-                        request.technician_id, "outlook",
-                        creds.get("calendar_email", ""),
-                        cal.get_updated_credentials(),
-                    )
-                    logging.info("[BOOKING] Outlook Calendar event created for tech %d", request.technician_id)
-        except Exception as cal_err:
-            logging.warning("[BOOKING] Calendar push failed (non-fatal): %s", cal_err)
+            delete_route_cache(request.technician_id, request.start_time.date(), conn=conn)
 
-        # Push to admin calendar (non-fatal) — shows ALL tech appointments on one calendar
-        try:
-            from src.utils.db import get_admin_calendar_credentials, save_admin_calendar_credentials
-            admin_creds = get_admin_calendar_credentials()
-            if admin_creds and admin_creds.get("connected"):
-                admin_provider = admin_creds.get("provider")
-                admin_creds_dict = admin_creds.get("credentials", {})
-                service_label = request.service_type.replace("_", " ").title()
-                admin_event_summary = f"[{tech['name']}] {service_label} - {request.customer_name}"
-                admin_event_description = (
-                    f"Technician: {tech['name']}\n"
-                    f"Customer: {request.customer_name}\n"
-                    f"Phone: {request.customer_phone}\n"
-                    f"Email: {request.customer_email or 'N/A'}\n"
-                    f"Service: {service_label}\n"
-                    f"Price: ${request.quoted_price}\n"
-                    f"Discount: {request.discount_applied or 'none'}\n"
-                    f"Appointment ID: {appointment_id}"
-                )
-                attendees = []
-                if admin_provider == "google":
-                    from src.services.google_calendar import GoogleCalendarService
-                    admin_cal = GoogleCalendarService(admin_creds_dict)
-                    admin_cal.create_event(
-                        summary=admin_event_summary,
-                        start_datetime=request.start_time,
-                        end_datetime=end_time,
-                        description=admin_event_description,
-                        location=request.address,
-                        attendees=attendees,
-                    )
-                    save_admin_calendar_credentials(
-                        "google",
-                        admin_creds.get("email", ""),
-                        admin_cal.get_updated_credentials(),
-                    )
-                    logging.info("[BOOKING] Admin Google Calendar event created")
-                elif admin_provider == "outlook":
-                    from src.services.outlook_calendar import OutlookCalendarService
-                    admin_cal = OutlookCalendarService(admin_creds_dict)
-                    admin_cal.create_event(
-                        summary=admin_event_summary,
-                        start_datetime=request.start_time,
-                        end_datetime=end_time,
-                        description=admin_event_description,
-                        location=request.address,
-                        attendees=attendees,
-                    )
-                    save_admin_calendar_credentials(
-                        "outlook",
-                        admin_creds.get("email", ""),
-                        admin_cal.get_updated_credentials(),
-                    )
-                    logging.info("[BOOKING] Admin Outlook Calendar event created")
-        except Exception as admin_cal_err:
-            logging.warning("[BOOKING] Admin calendar push failed (non-fatal): %s", admin_cal_err)
+        # Calendar pushes run on the job queue; the job commits with the booking
+        with span("calendar.enqueue"):
+            from src.utils.job_queue import enqueue
+            with conn.cursor() as cur:
+                enqueue("calendar.push_appointment", {"appointment_id": row_id}, priority=10, cur=cur)
 
         logging.info(f"[BOOKING] SUCCESS: {request.customer_name} booked with {tech['name']} for {request.service_type} at {request.start_time}")
 
@@ -623,6 +511,7 @@ def book_appointment(request: BookAppointmentRequest, _auth=Depends(verify_retel
         raise
     except Exception as e:
         logging.error(f"[BOOKING] ERROR: {e}")
+        conn.rollback()
         return BookAppointmentResponse(
             success=False,
             message=f"Failed to book appointment: {str(e)}"
@@ -635,6 +524,7 @@ class CancelByPhoneRequest(BaseModel):
 
 
 @router.post("/cancel-appointment")
+@traced_tool("cancel_appointment")
 def cancel_appointment_by_phone(request: CancelByPhoneRequest, _auth=Depends(verify_retell_api_key)):
     from src.utils.db import get_db_connection
     from psycopg2.extras import RealDictCursor
@@ -693,6 +583,7 @@ class BookRedoRequest(BaseModel):
 
 
 @router.post("/book-redo-appointment")
+@traced_tool("book_redo_appointment")
 def book_redo_appointment(request: BookRedoRequest, _auth=Depends(verify_retell_api_key)):
     from src.utils.db import get_db_connection
     from psycopg2.extras import RealDictCursor
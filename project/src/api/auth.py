@@ -13,6 +13,7 @@ from src.utils.jwt_utils import (
 )
 from src.utils.auth import get_current_user
 from src.utils.db import login_user, update_user_password
+from src.utils.password_hashing import PasswordHashingBusy
 from src.api.models import (
     UserRegister,
     UserLogin,
@@ -37,8 +38,10 @@ async def register(user: UserRegister):
     )
 
 
+# Sync handlers: FastAPI runs them on its threadpool, so the wait on the
+# password-hashing pool never blocks the event loop.
 @router.post("/login", response_model=LoginResponse)
-async def login(user: UserLogin):
+def login(user: UserLogin):
     try:
         db_user = login_user({
             "email": user.email.lower().strip(),
@@ -65,6 +68,8 @@ async def login(user: UserLogin):
         )
     except HTTPException:
         raise
+    except PasswordHashingBusy:
+        raise HTTPException(status_code=503, detail="Login is busy, please retry")
     except Exception as e:
         logging.error(f"Login error: {e}")
         traceback.print_exc()
@@ -94,7 +99,7 @@ async def forgot_password(request: ForgotPasswordRequest):
 
 
 @router.post("/reset-password")
-async def reset_password(request: ResetPasswordRequest):
+def reset_password(request: ResetPasswordRequest):
     try:
         email = verify_password_reset_token(request.token)
         if not email:
@@ -108,6 +113,8 @@ async def reset_password(request: ResetPasswordRequest):
         )
     except HTTPException:
         raise
+    except PasswordHashingBusy:
+        raise HTTPException(status_code=503, detail="Service busy, please retry")
     except Exception as e:
         logging.error(f"Reset password error: {e}")
         traceback.print_exc()
@@ -1,8 +1,8 @@
 import os
 import logging
 import traceback
-from fastapi import APIRouter, Depends, HTTPException, Query, Request
-from fastapi.responses import JSONResponse, RedirectResponse
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, RedirectResponse, Response
 from google_auth_oauthlib.flow import Flow
 from src.utils.auth import get_current_user
 from src.utils.db import (
@@ -11,11 +11,11 @@ from src.utils.db import (
     get_calendar_credentials,
     disconnect_calendar as db_disconnect
 )
-from src.services.google_calendar import GoogleCalendarService
-from src.services.outlook_calendar import OutlookCalendarService
+from src.services import msal_registry
+from src.services.graph_client import get_graph_client
+from src.utils import calendar_sync
 from src.utils.jwt_utils import create_oauth_state_token, verify_oauth_state_token
 from dotenv import load_dotenv
-import msal
 
 load_dotenv()
 
@@ -26,14 +26,19 @@ GOOGLE_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET")
 GOOGLE_REDIRECT_URI = os.getenv("GOOGLE_REDIRECT_URI")
 GOOGLE_SCOPES = ["https://www.googleapis.com/auth/calendar"]
 
-MICROSOFT_CLIENT_ID = os.getenv("MICROSOFT_CLIENT_ID")
-MICROSOFT_CLIENT_SECRET = os.getenv("MICROSOFT_CLIENT_SECRET")
-MICROSOFT_TENANT_ID = os.getenv("MICROSOFT_TENANT_ID", "common")
 MICROSOFT_REDIRECT_URI = os.getenv("MICROSOFT_REDIRECT_URI")
 MICROSOFT_SCOPES = ["Calendars.ReadWrite", "User.Read"]
 
 
 
+def _open_channel_quietly(tech_id):
+    """Push channels are an optimisation; connecting must not fail on them."""
+    try:
+        calendar_sync.open_channel(tech_id)
+    except Exception as e:
+        logging.warning(f"[CALSYNC] Could not open channel for tech {tech_id}: {e}")
+
+
 @router.get("/google/connect")
 async def google_connect(current_user: dict = Depends(get_current_user)):
     try:
@@ -76,7 +81,7 @@ async def google_connect(current_user: dict = Depends(get_current_user)):
 
 
 @router.get("/google/callback")
-async def google_callback(code: str = Query(...), state: str = Query(...)):
+async def google_callback(background_tasks: BackgroundTasks, code: str = Query(...), state: str = Query(...)):
     try:
         state_data = verify_oauth_state_token(state)
         if not state_data:
@@ -113,7 +118,9 @@ async def google_callback(code: str = Query(...), state: str = Query(...)):
             "token_expiry": credentials.expiry.isoformat() if credentials.expiry else None,
             "scopes": list(credentials.scopes) if credentials.scopes else GOOGLE_SCOPES
         }
+        calendar_sync.forget_technician_calendar(state_data["tech_id"])
         save_calendar_credentials(state_data["tech_id"], "google", calendar_email, creds_dict)
+        background_tasks.add_task(_open_channel_quietly, state_data["tech_id"])
 
         frontend_url = os.getenv("FRONTEND_URL", "http://localhost:3000")
         return RedirectResponse(url=f"{frontend_url}/settings?calendar=connected")
@@ -132,11 +139,7 @@ async def outlook_connect(current_user: dict = Depends(get_current_user)):
         tech = get_technician_by_user_id(current_user["id"])
         if not tech:
             raise HTTPException(status_code=404, detail="No technician profile found")
-        app = msal.ConfidentialClientApplication(
-            MICROSOFT_CLIENT_ID,
-            authority=f"https://login.microsoftonline.com/{MICROSOFT_TENANT_ID}",
-            client_credential=MICROSOFT_CLIENT_SECRET
-        )
+        app = msal_registry.get_auth_app()
         state_token = create_oauth_state_token({
             "user_id": current_user["id"],
             "tech_id": tech["id"],
@@ -160,18 +163,13 @@ async def outlook_connect(current_user: dict = Depends(get_current_user)):
 
 
 @router.get("/outlook/callback")
-async def outlook_callback(code: str = Query(...), state: str = Query(...)):
+async def outlook_callback(background_tasks: BackgroundTasks, code: str = Query(...), state: str = Query(...)):
     try:
         state_data = verify_oauth_state_token(state)
         if not state_data:
             raise HTTPException(status_code=400, detail="Invalid or expired OAuth state")
 
-        app = msal.ConfidentialClientApplication(
-            MICROSOFT_CLIENT_ID,
-            authority=f"https://login.microsoftonline.com/{MICROSOFT_TENANT_ID}",
-            client_credential=MICROSOFT_CLIENT_SECRET
-        )
-        result = app.acquire_token_by_authorization_code(
+        result, account_id, msal_cache = msal_registry.acquire_token_by_authorization_code(
             code,
             scopes=MICROSOFT_SCOPES,
             redirect_uri=MICROSOFT_REDIRECT_URI
@@ -181,9 +179,7 @@ async def outlook_callback(code: str = Query(...), state: str = Query(...)):
 
         calendar_email = ""
         try:
-            import requests as req
-            headers = {"Authorization": f"Bearer {result['access_token']}"}
-            me = req.get("https://graph.microsoft.com/v1.0/me", headers=headers).json()
+            me = get_graph_client().request("GET", "/me", result["access_token"], operation="me")
             calendar_email = me.get("mail", me.get("userPrincipalName", ""))
         except Exception:
             pass
@@ -197,7 +193,13 @@ async def outlook_callback(code: str = Query(...), state: str = Query(...)):
             ).isoformat(),
             "scopes": MICROSOFT_SCOPES
         }
+        if account_id:
+            creds_dict["msal_account_id"] = account_id
+            creds_dict["msal_cache"] = msal_cache
+        calendar_sync.forget_technician_calendar(state_data["tech_id"])
         save_calendar_credentials(state_data["tech_id"], "outlook", calendar_email, creds_dict)
+        # After the response: Graph validates the subscription against this server
+        background_tasks.add_task(_open_channel_quietly, state_data["tech_id"])
 
         frontend_url = os.getenv("FRONTEND_URL", "http://localhost:3000")
         return RedirectResponse(url=f"{frontend_url}/settings?calendar=connected")
@@ -216,6 +218,7 @@ async def disconnect_calendar(current_user: dict = Depends(get_current_user)):
         tech = get_technician_by_user_id(current_user["id"])
         if not tech:
             raise HTTPException(status_code=404, detail="No technician profile found")
+        calendar_sync.forget_technician_calendar(tech["id"])
         db_disconnect(tech["id"])
         return JSONResponse(
             status_code=200,
@@ -274,20 +277,10 @@ async def list_calendar_events(
         now = datetime.utcnow()
         end = now + timedelta(days=days)
 
-        provider = creds["calendar_provider"]
-        credentials_dict = creds["calendar_credentials"]
-
-        if provider == "google":
-            service = GoogleCalendarService(credentials_dict)
-        elif provider == "outlook":
-            service = OutlookCalendarService(credentials_dict)
-        else:
+        if creds["calendar_provider"] not in ("google", "outlook"):
             raise HTTPException(status_code=400, detail="Unknown calendar provider")
 
-        events = service.list_events(now, end)
-
-        updated_creds = service.get_updated_credentials()
-        save_calendar_credentials(tech["id"], provider, creds["calendar_email"], updated_creds)
+        events = calendar_sync.get_cached_events(tech["id"], now, end)
 
         return JSONResponse(
             status_code=200,
@@ -299,3 +292,48 @@ async def list_calendar_events(
         logging.error(f"List events error: {e}")
         traceback.print_exc()
         raise HTTPException(status_code=500, detail="Failed to fetch calendar events")
+
+
+@router.post("/notifications/google")
+async def google_notification(request: Request, background_tasks: BackgroundTasks):
+    """Receiver for Google ``events.watch`` channels."""
+    channel_id = request.headers.get("X-Goog-Channel-ID")
+    state = request.headers.get("X-Goog-Resource-State")
+    tech_id = calendar_sync.mark_dirty(
+        "google", channel_id,
+        request.headers.get("X-Goog-Channel-Token"),
+        request.headers.get("X-Goog-Resource-ID"),
+    )
+    if tech_id is None:
+        logging.warning(f"[CALSYNC] Rejected Google notification for channel {channel_id}")
+        return Response(status_code=404)
+    # "sync" only confirms a new channel; changes arrive as "exists"/"not_exists"
+    if state != "sync":
+        background_tasks.add_task(calendar_sync.sync_if_dirty, tech_id)
+    return Response(status_code=200)
+
+
+@router.post("/notifications/outlook")
+async def outlook_notification(request: Request, background_tasks: BackgroundTasks,
+                               validationToken: str = Query(None)):
+    """Receiver for Microsoft Graph subscriptions."""
+    if validationToken is not None:
+        # Subscription handshake: echo the token as plain text
+        return PlainTextResponse(validationToken)
+    try:
+        payload = await request.json()
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid notification body")
+    tech_ids = set()
+    for notification in payload.get("value", []):
+        tech_id = calendar_sync.mark_dirty(
+            "outlook", notification.get("subscriptionId"), notification.get("clientState")
+        )
+        if tech_id is None:
+            logging.warning(f"[CALSYNC] Rejected Graph notification for subscription "
+                            f"{notification.get('subscriptionId')}")
+        else:
+            tech_ids.add(tech_id)
+    for tech_id in tech_ids:
+        background_tasks.add_task(calendar_sync.sync_if_dirty, tech_id)
+    return Response(status_code=202)
@@ -6,12 +6,41 @@ from src.utils.auth import require_admin
 from src.utils.db import (
     get_call_logs_paginated,
     get_call_log_by_call_id,
-    get_call_stats
 )
+from src.utils.stats import get_call_stats
 
 router = APIRouter()
 
 
+def _call_log_out(log):
+    duration = log.get("duration_seconds") or 0
+    mins = duration // 60
+    secs = duration % 60
+
+    customer_name = None
+    dv = log.get("dynamic_variables")
+    if dv and isinstance(dv, dict):
+        customer_name = dv.get("customer_name")
+
+    return {
+        "id": log["id"],
+        "call_id": log["call_id"],
+        "agent_id": log.get("agent_id"),
+        "direction": log.get("direction"),
+        "from_number": log.get("from_number"),
+        "to_number": log.get("to_number"),
+        "call_status": log.get("call_status"),
+        "disconnection_reason": log.get("disconnection_reason"),
+        "duration_seconds": duration,
+        "duration_display": f"{mins}m {secs}s",
+        "recording_url": log.get("recording_url"),
+        "has_transcript": bool(log.get("transcript")),
+        "has_analysis": bool(log.get("call_analysis")),
+        "customer_name": customer_name,
+        "created_at": str(log.get("created_at", ""))
+    }
+
+
 @router.get("/list")
 async def list_call_logs(
     page: int = Query(1, ge=1),
@@ -35,32 +64,7 @@ async def list_call_logs(
         )
         logs_out = []
         for log in result["logs"]:
-            duration = log.get("duration_seconds") or 0
-            mins = duration // 60
-            secs = duration % 60
-
-            customer_name = None
-            dv = log.get("dynamic_variables")
-            if dv and isinstance(dv, dict):
-                customer_name = dv.get("customer_name")
-
-            logs_out.append({
-                "id": log["id"],
-                "call_id": log["call_id"],
-                "agent_id": log.get("agent_id"),
-                "direction": log.get("direction"),
-                "from_number": log.get("from_number"),
-                "to_number": log.get("to_number"),
-                "call_status": log.get("call_status"),
-                "disconnection_reason": log.get("disconnection_reason"),
-                "duration_seconds": duration,
-                "duration_display": f"{mins}m {secs}s",
-                "recording_url": log.get("recording_url"),
-                "has_transcript": bool(log.get("transcript")),
-                "has_analysis": bool(log.get("call_analysis")),
-                "customer_name": customer_name,
-                "created_at": str(log.get("created_at", ""))
-            })
+            logs_out.append(_call_log_out(log))
         return JSONResponse(
             status_code=200,
             content={
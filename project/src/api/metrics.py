@@ -0,0 +1,74 @@
+"""Prometheus scrape endpoint and per-route request instrumentation."""
+import os
+import time
+import secrets
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+
+from src.utils import metrics
+
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+def scrape_metrics(request: Request):
+    if METRICS_TOKEN:
+        auth = request.headers.get("Authorization", "")
+        if not secrets.compare_digest(auth, f"Bearer {METRICS_TOKEN}"):
+            raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return PlainTextResponse(
+        metrics.render_metrics(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+def _route_template(scope):
+    """Rebuild the matched route's template from the request path by putting
+    the path parameters back, e.g. ``/api/admin/users/{user_id}``. Requests
+    that matched no route collapse into one series to bound cardinality."""
+    if "endpoint" not in scope:
+        return "unmatched"
+    segments = scope["path"].split("/")
+    for name, value in (scope.get("path_params") or {}).items():
+        value = str(value)
+        for i in range(len(segments) - 1, -1, -1):
+            if segments[i] == value:
+                segments[i] = "{" + name + "}"
+                break
+    return "/".join(segments)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording count and latency per route template
+    (e.g. ``/api/appointments/book-appointment``), not per raw URL."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            path = _route_template(scope)
+            method = scope["method"]
+            metrics.observe(
+                "http_request_duration_seconds", time.perf_counter() - started,
+                method=method, route=path,
+            )
+            metrics.inc("http_requests_total", method=method, route=path, status=str(status_code))
@@ -10,12 +10,19 @@ from fastapi import APIRouter, Request, HTTPException
 from fastapi.responses import JSONResponse
 
 from src.utils.db import upsert_call_log
+from src.utils.job_queue import enqueue, task
 from dotenv import load_dotenv
 
 load_dotenv()
 
 router = APIRouter()
 
+
+@task("webhook.retell_call_log", queue="webhooks")
+def store_call_log(call_data):
+    """Job: upsert a call log from a call_ended / call_analyzed event."""
+    upsert_call_log(call_data)
+
 RETELL_API_KEY = os.getenv("RETELL_API_KEY", "")
 
 retell_client = None
@@ -42,7 +49,7 @@ async def retell_webhook(request: Request):
     """Handle Retell webhook events.
 
     On call_started: returns dynamic variables including current_date.
-    On call_ended/call_analyzed: stores the call log in the database.
+    On call_ended/call_analyzed: queues the call log to be stored.
     """
     try:
         post_data = await request.json()
@@ -107,9 +114,9 @@ async def retell_webhook(request: Request):
         call_data["call_analysis"] = call.get("call_analysis")
 
     try:
-        upsert_call_log(call_data)
+        enqueue("webhook.retell_call_log", call_data)
     except Exception as e:
-        logging.error("Failed to store call log: %s", e)
+        logging.error("Failed to queue call log: %s", e)
         traceback.print_exc()
 
     return JSONResponse(status_code=200, content={"message": "ok"})
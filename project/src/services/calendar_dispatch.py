@@ -0,0 +1,223 @@
+"""Concurrent calendar fan-out for new bookings.
+
+Bookings queue a ``calendar.push_appointment`` job; the job worker calls
+``push_appointment``.
+
+Every configured calendar target (the tech's own calendar, the admin
+calendar, and anything added with ``register_target_resolver``) is pushed
+in parallel on a shared thread pool, so a booking waits for the slowest
+push rather than the sum of them. Each push has its own timeout
+(``CALENDAR_PUSH_TIMEOUT_SECONDS``, further capped by the Retell tool
+budget) and its outcome is reported separately.
+
+A push that times out keeps running in the background; when it finishes
+it still records the event id and the refreshed credentials.
+"""
+import os
+import time
+import logging
+import threading
+import contextvars
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from dotenv import load_dotenv
+
+from src.utils import metrics
+from src.utils.job_queue import PermanentJobError, task
+from src.utils.tracing import remaining_seconds, span
+
+load_dotenv()
+
+CALENDAR_DISPATCH_WORKERS = int(os.getenv("CALENDAR_DISPATCH_WORKERS", "8"))
+CALENDAR_PUSH_TIMEOUT_SECONDS = float(os.getenv("CALENDAR_PUSH_TIMEOUT_SECONDS", "8"))
+# Left over for the booking handler to respond after the pushes
+CALENDAR_DEADLINE_MARGIN_SECONDS = float(os.getenv("CALENDAR_DEADLINE_MARGIN_SECONDS", "1"))
+
+# name: label in logs/metrics; record_as: appointments event-id column
+# ("tech"/"admin") or None; save_credentials(creds) persists refreshed tokens
+CalendarTarget = namedtuple(
+    "CalendarTarget", ["name", "provider", "credentials", "event", "record_as", "save_credentials"]
+)
+PushResult = namedtuple("PushResult", ["target", "provider", "status", "event_id", "error", "duration_ms"])
+
+_resolvers = []
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def register_target_resolver(resolver):
+    """Add a ``resolver(appointment, tech) -> [CalendarTarget]`` to every booking."""
+    _resolvers.append(resolver)
+    return resolver
+
+
+def _calendar_service(provider, credentials):
+    if provider == "google":
+        from src.services.google_calendar import GoogleCalendarService
+        return GoogleCalendarService(credentials)
+    if provider == "outlook":
+        from src.services.outlook_calendar import OutlookCalendarService
+        return OutlookCalendarService(credentials)
+    raise ValueError(f"unknown calendar provider '{provider}'")
+
+
+@register_target_resolver
+def _tech_calendar(appointment, tech):
+    from src.utils.calendar_events import event_fields
+    from src.utils.db import get_calendar_credentials, save_calendar_credentials
+    creds = get_calendar_credentials(tech["id"])
+    if not creds or not creds.get("calendar_connected"):
+        return []
+    provider = creds.get("calendar_provider")
+    return [CalendarTarget(
+        "tech", provider, creds.get("calendar_credentials", {}),
+        event_fields("tech", appointment), "tech",
+        lambda updated: save_calendar_credentials(
+            tech["id"], provider, creds.get("calendar_email", ""), updated),
+    )]
+
+
+@register_target_resolver
+def _admin_calendar(appointment, tech):
+    from src.utils.calendar_events import event_fields
+    from src.utils.db import get_admin_calendar_credentials, save_admin_calendar_credentials
+    creds = get_admin_calendar_credentials()
+    if not creds or not creds.get("connected"):
+        return []
+    provider = creds.get("provider")
+    return [CalendarTarget(
+        "admin", provider, creds.get("credentials", {}),
+        event_fields("admin", appointment, tech["name"]), "admin",
+        lambda updated: save_admin_calendar_credentials(provider, creds.get("email", ""), updated),
+    )]
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=CALENDAR_DISPATCH_WORKERS, thread_name_prefix="calendar-push"
+                )
+    return _executor
+
+
+def _push(target, appointment_row_id):
+    started = time.perf_counter()
+    with span("calendar.push", target=target.name, provider=target.provider):
+        try:
+            cal = _calendar_service(target.provider, target.credentials)
+            event = cal.create_event(**target.event)
+            target.save_credentials(cal.get_updated_credentials())
+            if not event:
+                status, event_id, error = "failed", None, "provider returned no event"
+            else:
+                status, event_id, error = "created", event["id"], None
+                if target.record_as and appointment_row_id:
+                    from src.utils.db import set_calendar_event_ids
+                    set_calendar_event_ids(target.record_as, [(appointment_row_id, event_id)])
+        except Exception as e:
+            status, event_id, error = "failed", None, f"{type(e).__name__}: {e}"
+    duration_ms = round((time.perf_counter() - started) * 1000, 1)
+    metrics.inc("calendar_push_total", target=target.name, status=status)
+    if status == "created":
+        logging.info(f"[CALENDAR] {target.name} ({target.provider}) event created in {duration_ms}ms")
+    else:
+        logging.warning(f"[CALENDAR] {target.name} ({target.provider}) push failed: {error}")
+    return PushResult(target.name, target.provider, status, event_id, error, duration_ms)
+
+
+def resolve_targets(appointment, tech):
+    targets = []
+    for resolver in _resolvers:
+        try:
+            targets.extend(resolver(appointment, tech))
+        except Exception as e:
+            logging.warning(f"[CALENDAR] Target lookup {resolver.__name__} failed: {e}")
+    return targets
+
+
+def push_appointment(appointment, tech, appointment_row_id=None, timeout=None, skip_recorded=False,
+                     wait_all=False):
+    """Push ``appointment`` to every target in parallel; one ``PushResult`` per target.
+
+    ``appointment`` is the dict ``event_fields`` takes. Targets still
+    running after the timeout are reported as ``"timeout"``; with
+    ``wait_all`` there is no timeout and every push reports its final
+    outcome. With ``skip_recorded``, targets whose event id is already
+    stored on the appointment row are left alone.
+    """
+    targets = resolve_targets(appointment, tech)
+    if skip_recorded:
+        from src.utils.db import CALENDAR_EVENT_COLUMNS
+        targets = [t for t in targets
+                   if not (t.record_as and appointment.get(CALENDAR_EVENT_COLUMNS[t.record_as]))]
+    if not targets:
+        return []
+    timeout = CALENDAR_PUSH_TIMEOUT_SECONDS if timeout is None else timeout
+    remaining = remaining_seconds()
+    if remaining is not None:
+        timeout = max(0.0, min(timeout, remaining - CALENDAR_DEADLINE_MARGIN_SECONDS))
+
+    executor = _get_executor()
+    futures = [
+        # Each push gets a copy of the request context, so its spans and
+        # the Graph deadline attach to the current trace
+        executor.submit(contextvars.copy_context().run, _push, target, appointment_row_id)
+        for target in targets
+    ]
+    wait(futures, timeout=None if wait_all else timeout)
+    results = []
+    for target, future in zip(targets, futures):
+        if future.done():
+            results.append(future.result())
+        else:
+            # calendar_push_total counts the outcome once _push finishes
+            metrics.inc("calendar_push_timeouts_total", target=target.name)
+            logging.warning(f"[CALENDAR] {target.name} ({target.provider}) push still running after "
+                            f"{timeout:.1f}s; continuing in background")
+            results.append(PushResult(target.name, target.provider, "timeout", None,
+                                      f"no result within {timeout:.1f}s", None))
+    return results
+
+
+@task("calendar.push_appointment", queue="calendar")
+def push_appointment_job(payload):
+    """Job: push a booked appointment (``appointment_id`` row id) to its calendars.
+
+    Targets that already have an event id recorded are skipped, so a retry
+    only repeats the pushes that failed. Targets without ``record_as``
+    cannot be tracked and may be pushed again on a retry. The job waits
+    for every push to finish (provider request timeouts bound them): a
+    retry while a slow push is still running would create a second event.
+    """
+    from src.utils.db import get_appointment_by_id, get_technician
+    appointment = get_appointment_by_id(payload["appointment_id"])
+    if not appointment:
+        raise PermanentJobError(f"appointment {payload['appointment_id']} not found")
+    if appointment.get("status") == "cancelled":
+        return
+    tech = get_technician(appointment["technician_id"])
+    if not tech:
+        raise PermanentJobError(f"technician {appointment['technician_id']} not found")
+    results = push_appointment(appointment, tech, appointment_row_id=appointment["id"],
+                               skip_recorded=True, wait_all=True)
+    failed = [f"{r.target}: {r.error}" for r in results if r.status != "created"]
+    if failed:
+        raise RuntimeError("; ".join(failed))
+
+
+def shutdown_calendar_dispatch():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
+
+
+metrics.describe("calendar_push_total", "counter",
+                 "Calendar pushes for new bookings, by target and final status (created, failed)")
+metrics.describe("calendar_push_timeouts_total", "counter",
+                 "Calendar pushes still running when the caller stopped waiting, by target")
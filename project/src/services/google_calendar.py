@@ -8,10 +8,15 @@ from googleapiclient.errors import HttpError
 from google.auth.transport.requests import Request
 from dotenv import load_dotenv
 
+from src.utils import metrics
+from src.utils.calendar_events import SyncTokenExpired
+
 load_dotenv()
 
 GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
 GOOGLE_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET")
+# Calendar API limit for operations in one batch HTTP request
+BATCH_LIMIT = 50
 
 
 class GoogleCalendarService:
@@ -30,35 +35,24 @@ class GoogleCalendarService:
 
     def _refresh_if_needed(self):
         if self.credentials.expired and self.credentials.refresh_token:
-            self.credentials.refresh(Request())
+            with metrics.timed("external_call_duration_seconds", service="google", operation="token_refresh"):
+                self.credentials.refresh(Request())
 
     def list_events(self, time_min: datetime, time_max: datetime = None, max_results: int = 100):
         try:
             if not time_max:
                 time_max = time_min + timedelta(days=7)
-            events_result = self.service.events().list(
+            request = self.service.events().list(
                 calendarId="primary",
-                timeMin=time_min.isoformat() + "Z" if not time_min.tzinfo else time_min.isoformat(),
-                timeMax=time_max.isoformat() + "Z" if not time_max.tzinfo else time_max.isoformat(),
+                timeMin=_rfc3339(time_min),
+                timeMax=_rfc3339(time_max),
                 maxResults=max_results,
                 singleEvents=True,
                 orderBy="startTime"
-            ).execute()
-            events = events_result.get("items", [])
-            result = []
-            for event in events:
-                start = event["start"].get("dateTime", event["start"].get("date"))
-                end = event["end"].get("dateTime", event["end"].get("date"))
-                result.append({
-                    "id": event["id"],
-                    "summary": event.get("summary", ""),
-                    "start": start,
-                    "end": end,
-                    "description": event.get("description", ""),
-                    "location": event.get("location", ""),
-                    "status": event.get("status", "confirmed")
-                })
-            return result
+            )
+            with metrics.timed("external_call_duration_seconds", service="google", operation="list_events"):
+                events_result = request.execute()
+            return [_event_out(event) for event in events_result.get("items", [])]
         except HttpError as e:
             logging.error(f"Google Calendar list error: {e}")
             return []
@@ -71,29 +65,36 @@ class GoogleCalendarService:
             logging.error(f"Google Calendar availability check error: {e}")
             return True
 
+    def _insert_request(self, summary: str, start_datetime: datetime, end_datetime: datetime,
+                        description: str = '', location: str = '', attendees: List[str] = None):
+        event = {
+            "summary": summary,
+            "location": location,
+            "description": description,
+            "start": {
+                "dateTime": start_datetime.isoformat(),
+                "timeZone": "America/New_York"
+            },
+            "end": {
+                "dateTime": end_datetime.isoformat(),
+                "timeZone": "America/New_York"
+            }
+        }
+        if attendees:
+            event["attendees"] = [{"email": email} for email in attendees]
+        return self.service.events().insert(
+            calendarId="primary",
+            body=event,
+            sendUpdates="all" if attendees else "none"
+        )
+
     def create_event(self, summary: str, start_datetime: datetime, end_datetime: datetime,
                      description: str = '', location: str = '', attendees: List[str] = None):
         try:
-            event = {
-                "summary": summary,
-                "location": location,
-                "description": description,
-                "start": {
-                    "dateTime": start_datetime.isoformat(),
-                    "timeZone": "America/New_York"
-                },
-                "end": {
-                    "dateTime": end_datetime.isoformat(),
-                    "timeZone": "America/New_York"
-                }
-            }
-            if attendees:
-                event["attendees"] = [{"email": email} for email in attendees]
-            created = self.service.events().insert(
-                calendarId="primary",
-                body=event,
-                sendUpdates="all" if attendees else "none"
-            ).execute()
+            request = self._insert_request(summary, start_datetime, end_datetime,
+                                           description, location, attendees)
+            with metrics.timed("external_call_duration_seconds", service="google", operation="create_event"):
+                created = request.execute()
             return {
                 "id": created["id"],
                 "link": created.get("htmlLink", ""),
@@ -103,6 +104,85 @@ class GoogleCalendarService:
             logging.error(f"Google Calendar create error: {e}")
             return None
 
+    def create_events(self, events: List[Dict]):
+        """Create several events in batch HTTP requests of up to ``BATCH_LIMIT``.
+
+        ``events`` are ``create_event`` keyword dicts. Returns one result per
+        event, in order: the ``create_event`` dict, or None if it failed.
+        """
+        results = [None] * len(events)
+
+        def on_response(request_id, response, exception):
+            index = int(request_id)
+            if exception is not None:
+                logging.error(f"Google Calendar batch create error: {exception}")
+                return
+            results[index] = {
+                "id": response["id"],
+                "link": response.get("htmlLink", ""),
+                "status": response.get("status", "confirmed")
+            }
+
+        for start in range(0, len(events), BATCH_LIMIT):
+            batch = self.service.new_batch_http_request(callback=on_response)
+            for index in range(start, min(start + BATCH_LIMIT, len(events))):
+                batch.add(self._insert_request(**events[index]), request_id=str(index))
+            try:
+                with metrics.timed("external_call_duration_seconds", service="google", operation="create_events"):
+                    batch.execute()
+            except HttpError as e:
+                logging.error(f"Google Calendar batch error: {e}")
+        return results
+
+    def sync_events(self, sync_token: str = None, time_min: datetime = None, time_max: datetime = None):
+        """One sync pass over the primary calendar.
+
+        Without ``sync_token`` lists every event in the window; with it, only
+        what changed since. Returns ``(events, deleted_ids, next_sync_token)``
+        and raises ``SyncTokenExpired`` when Google answers 410 Gone.
+        """
+        params = {"calendarId": "primary", "singleEvents": True, "maxResults": 250}
+        if sync_token:
+            params["syncToken"] = sync_token
+        else:
+            params["timeMin"] = _rfc3339(time_min)
+            params["timeMax"] = _rfc3339(time_max)
+        events, deleted = [], []
+        while True:
+            try:
+                with metrics.timed("external_call_duration_seconds", service="google", operation="sync_events"):
+                    page = self.service.events().list(**params).execute()
+            except HttpError as e:
+                if e.resp.status == 410:
+                    raise SyncTokenExpired(str(e))
+                raise
+            for event in page.get("items", []):
+                if event.get("status") == "cancelled":
+                    deleted.append(event["id"])
+                else:
+                    events.append(_event_out(event))
+            if not page.get("nextPageToken"):
+                return events, deleted, page.get("nextSyncToken")
+            params["pageToken"] = page["nextPageToken"]
+
+    def watch(self, channel_id: str, address: str, token: str, ttl_seconds: int):
+        """Open a push channel on the primary calendar; returns ``(resource_id, expires_at)``."""
+        body = {
+            "id": channel_id,
+            "type": "web_hook",
+            "address": address,
+            "token": token,
+            "params": {"ttl": str(int(ttl_seconds))},
+        }
+        with metrics.timed("external_call_duration_seconds", service="google", operation="watch"):
+            channel = self.service.events().watch(calendarId="primary", body=body).execute()
+        expires_at = datetime.fromtimestamp(int(channel["expiration"]) / 1000, tz=timezone.utc)
+        return channel["resourceId"], expires_at.replace(tzinfo=None)
+
+    def stop_channel(self, channel_id: str, resource_id: str):
+        with metrics.timed("external_call_duration_seconds", service="google", operation="stop_channel"):
+            self.service.channels().stop(body={"id": channel_id, "resourceId": resource_id}).execute()
+
     def get_updated_credentials(self):
         self._refresh_if_needed()
         return {
@@ -111,3 +191,19 @@ class GoogleCalendarService:
             "token_expiry": self.credentials.expiry.isoformat() if self.credentials.expiry else None,
             "scopes": list(self.credentials.scopes) if self.credentials.scopes else []
         }
+
+
+def _rfc3339(value):
+    return value.isoformat() + "Z" if not value.tzinfo else value.isoformat()
+
+
+def _event_out(event):
+    return {
+        "id": event["id"],
+        "summary": event.get("summary", ""),
+        "start": event["start"].get("dateTime", event["start"].get("date")),
+        "end": event["end"].get("dateTime", event["end"].get("date")),
+        "description": event.get("description", ""),
+        "location": event.get("location", ""),
+        "status": event.get("status", "confirmed")
+    }
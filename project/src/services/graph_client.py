@@ -0,0 +1,209 @@
+"""Shared Microsoft Graph transport.
+
+One ``requests.Session`` with a keep-alive connection pool serves every
+Graph call (tokens are per request, so techs and admins share it). On top
+of it:
+
+- Timeouts: every request has a connect/read timeout, capped inside a
+  Retell tool call by the time left in the tool's budget.
+- Throttling: 429 and 503 responses are retried up to
+  ``GRAPH_MAX_RETRIES`` times, waiting for ``Retry-After`` when Graph sends
+  it and exponential backoff with jitter otherwise.
+- Paging: ``iter_pages`` follows ``@odata.nextLink`` lazily, so callers
+  that stop early never fetch the remaining pages.
+- Batching: ``batch`` sends up to 20 requests per ``$batch`` round trip
+  and retries throttled sub-requests the same way.
+"""
+import os
+import time
+import random
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+from src.services.http_pool import register_pool_metrics
+from src.utils import metrics
+from src.utils.tracing import remaining_seconds, span
+
+load_dotenv()
+
+GRAPH_BASE_URL = os.getenv("GRAPH_BASE_URL", "https://graph.microsoft.com/v1.0")
+GRAPH_TIMEOUT_SECONDS = float(os.getenv("GRAPH_TIMEOUT_SECONDS", "15"))
+GRAPH_CONNECT_TIMEOUT_SECONDS = float(os.getenv("GRAPH_CONNECT_TIMEOUT_SECONDS", "3"))
+GRAPH_MIN_TIMEOUT_SECONDS = float(os.getenv("GRAPH_MIN_TIMEOUT_SECONDS", "0.5"))
+GRAPH_POOL_SIZE = int(os.getenv("GRAPH_POOL_SIZE", "20"))
+GRAPH_MAX_RETRIES = int(os.getenv("GRAPH_MAX_RETRIES", "3"))
+GRAPH_BACKOFF_SECONDS = float(os.getenv("GRAPH_BACKOFF_SECONDS", "1"))
+GRAPH_MAX_RETRY_WAIT_SECONDS = float(os.getenv("GRAPH_MAX_RETRY_WAIT_SECONDS", "30"))
+
+# Graph rejects $batch payloads with more than 20 requests
+BATCH_LIMIT = 20
+RETRY_STATUSES = (429, 503)
+
+
+class GraphError(Exception):
+    """Graph answered with an error status (after any retries)."""
+
+    def __init__(self, status_code, message):
+        super().__init__(f"Graph {status_code}: {message}")
+        self.status_code = status_code
+
+
+def _retry_after(headers, attempt):
+    """Seconds to wait before retry ``attempt`` (0-based)."""
+    value = (headers or {}).get("Retry-After") or (headers or {}).get("retry-after")
+    try:
+        wait = float(value)
+    except (TypeError, ValueError):
+        wait = GRAPH_BACKOFF_SECONDS * (2 ** attempt) * random.uniform(0.5, 1.0)
+    return max(0.0, min(wait, GRAPH_MAX_RETRY_WAIT_SECONDS))
+
+
+def _budget_allows(wait):
+    remaining = remaining_seconds()
+    return remaining is None or remaining - wait >= GRAPH_MIN_TIMEOUT_SECONDS
+
+
+class GraphClient:
+
+    def __init__(self, base_url=GRAPH_BASE_URL, pool_size=GRAPH_POOL_SIZE):
+        self.base_url = base_url.rstrip("/")
+        self.session = requests.Session()
+        self.adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+
+    def _url(self, path):
+        return path if path.startswith("http") else f"{self.base_url}{path}"
+
+    def _timeout(self):
+        timeout = GRAPH_TIMEOUT_SECONDS
+        remaining = remaining_seconds()
+        if remaining is not None:
+            timeout = min(timeout, remaining)
+        timeout = max(timeout, GRAPH_MIN_TIMEOUT_SECONDS)
+        return (min(GRAPH_CONNECT_TIMEOUT_SECONDS, timeout), timeout)
+
+    def request(self, method, path, token, params=None, json=None, operation=None):
+        """Parsed JSON body of one Graph call (``{}`` for 204).
+
+        ``path`` is relative to the API root or an absolute URL such as an
+        ``@odata.nextLink``. Raises ``GraphError`` for error statuses once
+        retries are exhausted and ``requests`` exceptions for transport
+        failures.
+        """
+        operation = operation or method.lower()
+        headers = {"Authorization": f"Bearer {token}"}
+        if json is not None:
+            headers["Content-Type"] = "application/json"
+        url = self._url(path)
+        attempt = 0
+        while True:
+            with span("graph.request", operation=operation), \
+                    metrics.timed("external_call_duration_seconds", service="graph", operation=operation):
+                response = self.session.request(
+                    method, url, params=params, json=json, headers=headers, timeout=self._timeout(),
+                )
+            if response.status_code in RETRY_STATUSES and attempt < GRAPH_MAX_RETRIES:
+                wait = _retry_after(response.headers, attempt)
+                if _budget_allows(wait):
+                    metrics.inc("graph_retries_total", operation=operation, status=str(response.status_code))
+                    logging.warning(f"[GRAPH] {response.status_code} on {operation}; retrying in {wait:.1f}s")
+                    time.sleep(wait)
+                    attempt += 1
+                    continue
+            if response.status_code >= 400:
+                metrics.inc("external_call_errors_total", service="graph", operation=operation)
+                raise GraphError(response.status_code, response.text[:300])
+            if response.status_code == 204 or not response.content:
+                return {}
+            return response.json()
+
+    def iter_pages(self, path, token, params=None, operation=None):
+        """Yield the ``value`` items of a collection, following
+        ``@odata.nextLink`` one page at a time."""
+        url = path
+        while url:
+            page = self.request("GET", url, token, params=params, operation=operation)
+            yield from page.get("value", [])
+            url = page.get("@odata.nextLink")
+            # The next link already carries the query string
+            params = None
+
+    def batch(self, token, requests_, operation="batch"):
+        """Run many Graph requests in ``$batch`` round trips.
+
+        ``requests_`` is a list of dicts with ``method``, ``url`` (relative
+        to the API root, e.g. ``/me/events``) and optional ``body``. Returns
+        one ``{"status", "headers", "body"}`` dict per request, in input
+        order. Sub-requests throttled with 429/503 are retried in a later
+        round trip; other failures are returned as-is for the caller.
+        """
+        results = [None] * len(requests_)
+        pending = list(range(len(requests_)))
+        attempt = 0
+        while pending:
+            retry = []
+            wait = 0.0
+            for start in range(0, len(pending), BATCH_LIMIT):
+                chunk = pending[start:start + BATCH_LIMIT]
+                payload = {"requests": []}
+                for index in chunk:
+                    item = requests_[index]
+                    sub = {"id": str(index), "method": item["method"].upper(), "url": item["url"]}
+                    if item.get("body") is not None:
+                        sub["body"] = item["body"]
+                        sub["headers"] = {"Content-Type": "application/json"}
+                    payload["requests"].append(sub)
+                metrics.inc("graph_batch_requests_total", operation=operation, value=len(chunk))
+                response = self.request("POST", "/$batch", token, json=payload, operation=operation)
+                for sub in response.get("responses", []):
+                    index = int(sub["id"])
+                    status = int(sub.get("status", 0))
+                    results[index] = {
+                        "status": status,
+                        "headers": sub.get("headers") or {},
+                        "body": sub.get("body"),
+                    }
+                    if status in RETRY_STATUSES and attempt < GRAPH_MAX_RETRIES:
+                        retry.append(index)
+                        wait = max(wait, _retry_after(sub.get("headers"), attempt))
+            if not retry or not _budget_allows(wait):
+                break
+            metrics.inc("graph_retries_total", operation=operation, status="batch", value=len(retry))
+            logging.warning(f"[GRAPH] {len(retry)} throttled $batch sub-requests; retrying in {wait:.1f}s")
+            time.sleep(wait)
+            pending = retry
+            attempt += 1
+        return results
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_graph_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = GraphClient()
+    return _client
+
+
+def close_graph_client():
+    if _client is not None:
+        _client.close()
+
+
+metrics.describe("graph_retries_total", "counter",
+                 "Graph calls retried after throttling, by status (batch = $batch sub-requests)")
+metrics.describe("graph_batch_requests_total", "counter",
+                 "Graph requests sent inside $batch payloads")
+register_pool_metrics("graph", "Graph", lambda: _client)
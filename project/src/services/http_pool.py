@@ -0,0 +1,34 @@
+"""Connection-pool statistics for the pooled HTTP clients (Radar, Graph)."""
+from src.utils import metrics
+
+
+def pool_stats(adapter):
+    """New connections opened vs requests sent across an adapter's pools."""
+    opened = sent = 0
+    pools = adapter.poolmanager.pools
+    for key in pools.keys():
+        pool = pools.get(key)
+        if pool is None:
+            continue
+        opened += pool.num_connections
+        sent += pool.num_requests
+    return opened, sent
+
+
+def register_pool_metrics(prefix, service, get_client):
+    """Expose ``<prefix>_connections_opened_total`` and ``<prefix>_http_requests_total``.
+
+    ``get_client()`` returns the module's client, or None before the first
+    call; the client's ``adapter`` is the mounted ``HTTPAdapter``.
+    """
+    def stat(index):
+        def callback():
+            client = get_client()
+            return pool_stats(client.adapter)[index] if client is not None else 0
+        return callback
+
+    metrics.register_gauge(f"{prefix}_connections_opened_total",
+                           f"TCP/TLS connections opened to {service}", stat(0), "counter")
+    metrics.register_gauge(f"{prefix}_http_requests_total",
+                           f"HTTP requests sent to {service} (1 - opened/requests is the reuse rate)",
+                           stat(1), "counter")
@@ -0,0 +1,142 @@
+"""Process-wide MSAL applications for the Outlook integration.
+
+Building a ``ConfidentialClientApplication`` performs authority/instance
+discovery over HTTP, so instead of one per request this module keeps:
+
+- one shared ``http_cache`` and keep-alive ``http_client`` handed to every
+  application, so discovery happens once per process;
+- one application per Microsoft account, each with its own
+  ``SerializableTokenCache``. The serialized cache travels with the tech's
+  (or admin's) calendar credentials (``msal_cache``/``msal_account_id``),
+  so any process can pick it up and refresh silently.
+
+Entries are kept in an LRU bounded by ``MSAL_MAX_ACCOUNTS``.
+"""
+import os
+import logging
+import threading
+from collections import OrderedDict
+
+import msal
+import requests
+from dotenv import load_dotenv
+
+from src.utils import metrics
+
+load_dotenv()
+
+MICROSOFT_CLIENT_ID = os.getenv("MICROSOFT_CLIENT_ID")
+MICROSOFT_CLIENT_SECRET = os.getenv("MICROSOFT_CLIENT_SECRET")
+MICROSOFT_TENANT_ID = os.getenv("MICROSOFT_TENANT_ID", "common")
+MSAL_MAX_ACCOUNTS = int(os.getenv("MSAL_MAX_ACCOUNTS", "1000"))
+
+_http_cache = {}
+_http_client = requests.Session()
+_lock = threading.Lock()
+_auth_app = None
+_accounts = OrderedDict()  # account key -> AccountClient
+
+
+def _new_app(token_cache=None):
+    metrics.inc("msal_app_constructions_total")
+    return msal.ConfidentialClientApplication(
+        MICROSOFT_CLIENT_ID,
+        authority=f"https://login.microsoftonline.com/{MICROSOFT_TENANT_ID}",
+        client_credential=MICROSOFT_CLIENT_SECRET,
+        token_cache=token_cache,
+        http_client=_http_client,
+        http_cache=_http_cache,
+    )
+
+
+def get_auth_app():
+    """Shared application for building authorization URLs."""
+    global _auth_app
+    if _auth_app is None:
+        with _lock:
+            if _auth_app is None:
+                _auth_app = _new_app()
+    return _auth_app
+
+
+class AccountClient:
+    """An MSAL application bound to one account's token cache."""
+
+    def __init__(self, serialized_cache=None):
+        self.cache = msal.SerializableTokenCache()
+        if serialized_cache:
+            self.cache.deserialize(serialized_cache)
+        self.seen_state = serialized_cache
+        self.app = _new_app(self.cache)
+        self.lock = threading.Lock()
+
+    def sync_from(self, serialized_cache):
+        """Adopt a cache persisted by another process if it changed."""
+        if serialized_cache and serialized_cache != self.seen_state:
+            with self.lock:
+                self.cache.deserialize(serialized_cache)
+                self.seen_state = serialized_cache
+
+    def account(self, account_id=None):
+        accounts = self.app.get_accounts()
+        if account_id:
+            for account in accounts:
+                if account.get("home_account_id") == account_id:
+                    return account
+            return None
+        return accounts[0] if accounts else None
+
+    def serialize(self):
+        with self.lock:
+            self.seen_state = self.cache.serialize()
+            return self.seen_state
+
+
+def get_account_client(account_id, serialized_cache=None):
+    """Cached ``AccountClient`` for ``account_id``, refreshed from
+    ``serialized_cache`` when the persisted copy is newer."""
+    with _lock:
+        client = _accounts.get(account_id)
+        if client is not None:
+            _accounts.move_to_end(account_id)
+    if client is not None:
+        metrics.inc("cache_requests_total", cache="msal", result="hit")
+        client.sync_from(serialized_cache)
+        return client
+    metrics.inc("cache_requests_total", cache="msal", result="miss")
+    client = AccountClient(serialized_cache)
+    register_account_client(account_id, client)
+    return client
+
+
+def register_account_client(account_id, client):
+    with _lock:
+        _accounts[account_id] = client
+        _accounts.move_to_end(account_id)
+        while len(_accounts) > MSAL_MAX_ACCOUNTS:
+            _accounts.popitem(last=False)
+
+
+def acquire_token_by_authorization_code(code, scopes, redirect_uri):
+    """Redeem an OAuth code into a fresh per-account cache.
+
+    Returns ``(result, account_id, serialized_cache)``; ``result`` is the
+    raw MSAL response (check for ``access_token``).
+    """
+    client = AccountClient()
+    result = client.app.acquire_token_by_authorization_code(code, scopes=scopes, redirect_uri=redirect_uri)
+    if "access_token" not in result:
+        return result, None, None
+    account = client.account()
+    account_id = account["home_account_id"] if account else None
+    if account_id:
+        register_account_client(account_id, client)
+    else:
+        logging.warning("[MSAL] Token response had no account; cache will not be reused")
+    return result, account_id, client.serialize()
+
+
+metrics.register_gauge("msal_cached_accounts", "MSAL account applications held in memory",
+                       lambda: len(_accounts))
+metrics.describe("msal_app_constructions_total", "counter",
+                 "MSAL ConfidentialClientApplication instances built")
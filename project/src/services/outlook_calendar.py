@@ -2,117 +2,124 @@ import os
 import logging
 from datetime import datetime, timedelta, timezone
 from typing import List, Dict, Optional
-import requests
-import msal
 from dotenv import load_dotenv
 
-load_dotenv()
+from src.services import graph_client, msal_registry
+from src.services.graph_client import GraphError
+from src.utils.calendar_events import SyncTokenExpired, parse_event_time
+from src.utils import metrics
 
-MICROSOFT_CLIENT_ID = os.getenv("MICROSOFT_CLIENT_ID")
-MICROSOFT_CLIENT_SECRET = os.getenv("MICROSOFT_CLIENT_SECRET")
-MICROSOFT_TENANT_ID = os.getenv("MICROSOFT_TENANT_ID", "common")
+load_dotenv()
 
 
 class OutlookCalendarService:
 
-    GRAPH_API_ENDPOINT = "https://graph.microsoft.com/v1.0"
-
     def __init__(self, credentials_dict: Dict):
         self.access_token = credentials_dict.get("access_token")
         self.refresh_token = credentials_dict.get("refresh_token")
         self.token_expiry = credentials_dict.get("token_expiry")
         self.scopes = credentials_dict.get("scopes", ["Calendars.ReadWrite"])
-        self._app = msal.ConfidentialClientApplication(
-            MICROSOFT_CLIENT_ID,
-            authority=f"https://login.microsoftonline.com/{MICROSOFT_TENANT_ID}",
-            client_credential=MICROSOFT_CLIENT_SECRET
-        )
+        self.msal_account_id = credentials_dict.get("msal_account_id")
+        self._msal_cache = credentials_dict.get("msal_cache")
+        # Resolved from the registry only when a refresh is actually needed
+        self._account_client = None
         self._refresh_if_needed()
 
+    def _msal_client(self):
+        if self._account_client is None:
+            if self.msal_account_id:
+                self._account_client = msal_registry.get_account_client(
+                    self.msal_account_id, self._msal_cache
+                )
+            else:
+                self._account_client = msal_registry.AccountClient()
+        return self._account_client
+
     def _refresh_if_needed(self):
         if not self.token_expiry:
             return
         try:
             expiry = datetime.fromisoformat(self.token_expiry.replace("Z", "+00:00"))
-            if datetime.now(timezone.utc) >= expiry - timedelta(minutes=5):
-                result = self._app.acquire_token_by_refresh_token(
-                    self.refresh_token,
-                    scopes=self.scopes
-                )
-                if "access_token" in result:
-                    self.access_token = result["access_token"]
-                    if "refresh_token" in result:
-                        self.refresh_token = result["refresh_token"]
-                    if "expires_in" in result:
-                        self.token_expiry = (
-                            datetime.now(timezone.utc) + timedelta(seconds=result["expires_in"])
-                        ).isoformat()
+            if datetime.now(timezone.utc) < expiry - timedelta(minutes=5):
+                return
+            client = self._msal_client()
+            account = client.account(self.msal_account_id) if self.msal_account_id else None
+            result = None
+            with metrics.timed("external_call_duration_seconds", service="graph", operation="token_refresh"):
+                if account:
+                    result = client.app.acquire_token_silent(self.scopes, account=account)
+                if not result and self.refresh_token:
+                    # Credentials saved before the MSAL cache was persisted
+                    result = client.app.acquire_token_by_refresh_token(
+                        self.refresh_token,
+                        scopes=self.scopes
+                    )
+            if result and "access_token" in result:
+                self.access_token = result["access_token"]
+                if "refresh_token" in result:
+                    self.refresh_token = result["refresh_token"]
+                if "expires_in" in result:
+                    self.token_expiry = (
+                        datetime.now(timezone.utc) + timedelta(seconds=result["expires_in"])
+                    ).isoformat()
+                if not self.msal_account_id:
+                    account = client.account()
+                    if account:
+                        self.msal_account_id = account["home_account_id"]
+                        msal_registry.register_account_client(self.msal_account_id, client)
+                self._msal_cache = client.serialize()
+            elif result:
+                logging.error(f"Outlook token refresh failed: {result.get('error')}: {result.get('error_description')}")
         except Exception as e:
             logging.error(f"Outlook token refresh error: {e}")
 
     def _make_request(self, method: str, endpoint: str, **kwargs):
-        headers = {
-            "Authorization": f"Bearer {self.access_token}",
-            "Content-Type": "application/json"
-        }
-        url = f"{self.GRAPH_API_ENDPOINT}{endpoint}"
         try:
-            response = requests.request(method, url, headers=headers, **kwargs)
-            if response.status_code in [200, 201]:
-                return response.json()
-            logging.error(f"Outlook API error {response.status_code}: {response.text}")
+            return graph_client.get_graph_client().request(
+                method, endpoint, self.access_token, operation=method, **kwargs
+            )
+        except GraphError as e:
+            logging.error(f"Outlook API error {e.status_code}: {e}")
             return None
         except Exception as e:
             logging.error(f"Outlook request error: {e}")
             return None
 
-    def list_events(self, time_min: datetime, time_max: datetime = None, max_results: int = 100):
+    def iter_events(self, time_min: datetime, time_max: datetime = None, page_size: int = 100):
+        """Events in the window, fetched one ``@odata.nextLink`` page at a time.
+
+        Raises ``GraphError``/``requests`` exceptions; stop iterating early
+        to skip the remaining pages.
+        """
         if not time_max:
             time_max = time_min + timedelta(days=7)
         params = {
             "$filter": f"start/dateTime ge '{time_min.isoformat()}' and end/dateTime le '{time_max.isoformat()}'",
-            "$top": max_results,
+            "$top": page_size,
             "$orderby": "start/dateTime"
         }
-        result = self._make_request("GET", "/me/calendar/events", params=params)
-        if not result:
+        for event in graph_client.get_graph_client().iter_pages(
+                "/me/calendar/events", self.access_token, params=params, operation="list_events"):
+            yield _event_out(event)
+
+    def list_events(self, time_min: datetime, time_max: datetime = None, max_results: int = 100):
+        """All events in the window; ``max_results`` is the page size."""
+        try:
+            return list(self.iter_events(time_min, time_max, page_size=max_results))
+        except Exception as e:
+            logging.error(f"Outlook list error: {e}")
             return []
-        events = []
-        for event in result.get("value", []):
-            events.append({
-                "id": event["id"],
-                "summary": event.get("subject", ""),
-                "start": event["start"]["dateTime"],
-                "end": event["end"]["dateTime"],
-                "description": event.get("bodyPreview", ""),
-                "location": event.get("location", {}).get("displayName", ""),
-                "status": "confirmed" if not event.get("isCancelled") else "cancelled"
-            })
-        return events
 
     def check_availability(self, start_datetime: datetime, end_datetime: datetime):
         try:
-            events = self.list_events(start_datetime, end_datetime)
-            return len(events) == 0
+            return next(self.iter_events(start_datetime, end_datetime, page_size=1), None) is None
         except Exception as e:
             logging.error(f"Outlook availability check error: {e}")
             return True
 
     def create_event(self, summary: str, start_datetime: datetime, end_datetime: datetime,
                      description: str = '', location: str = '', attendees: List[str] = None):
-        event = {
-            "subject": summary,
-            "body": {"contentType": "text", "content": description},
-            "start": {"dateTime": start_datetime.isoformat(), "timeZone": "Eastern Standard Time"},
-            "end": {"dateTime": end_datetime.isoformat(), "timeZone": "Eastern Standard Time"}
-        }
-        if location:
-            event["location"] = {"displayName": location}
-        if attendees:
-            event["attendees"] = [
-                {"emailAddress": {"address": email}, "type": "required"}
-                for email in attendees
-            ]
+        event = _event_body(summary, start_datetime, end_datetime, description, location, attendees)
         result = self._make_request("POST", "/me/calendar/events", json=event)
         if result:
             return {
@@ -122,11 +129,136 @@ class OutlookCalendarService:
             }
         return None
 
+    def create_events(self, events: List[Dict]):
+        """Create several events on this calendar in ``$batch`` round trips.
+
+        ``events`` are ``create_event`` keyword dicts. Returns one result per
+        event, in order: the ``create_event`` dict, or None if it failed.
+        """
+        requests_ = [
+            {"method": "POST", "url": "/me/calendar/events", "body": _event_body(**event)}
+            for event in events
+        ]
+        try:
+            responses = graph_client.get_graph_client().batch(
+                self.access_token, requests_, operation="create_events"
+            )
+        except Exception as e:
+            logging.error(f"Outlook batch create error: {e}")
+            return [None] * len(events)
+        results = []
+        for response in responses:
+            body = (response or {}).get("body") or {}
+            if response and response["status"] in (200, 201) and "id" in body:
+                results.append({"id": body["id"], "link": body.get("webLink", ""), "status": "confirmed"})
+            else:
+                logging.error(f"Outlook batch create failed: {response and response['status']}: {str(body)[:200]}")
+                results.append(None)
+        return results
+
+    def sync_events(self, delta_link: str = None, time_min: datetime = None, time_max: datetime = None):
+        """One ``calendarView/delta`` pass.
+
+        Without ``delta_link`` starts a new delta over the window; with it,
+        returns only what changed since. Returns ``(events, deleted_ids,
+        next_delta_link)`` and raises ``SyncTokenExpired`` when Graph no
+        longer knows the delta state.
+        """
+        client = graph_client.get_graph_client()
+        url, params = delta_link, None
+        if not url:
+            url = "/me/calendarView/delta"
+            params = {"startDateTime": time_min.isoformat(), "endDateTime": time_max.isoformat()}
+        events, deleted = [], []
+        while True:
+            try:
+                page = client.request("GET", url, self.access_token, params=params, operation="sync_events")
+            except GraphError as e:
+                if e.status_code == 410 or "syncStateNotFound" in str(e):
+                    raise SyncTokenExpired(str(e))
+                raise
+            for event in page.get("value", []):
+                if "@removed" in event or event.get("isCancelled"):
+                    deleted.append(event["id"])
+                elif event.get("start"):
+                    events.append(_event_out(event))
+            if page.get("@odata.deltaLink"):
+                return events, deleted, page["@odata.deltaLink"]
+            url, params = page.get("@odata.nextLink"), None
+            if not url:
+                return events, deleted, delta_link
+
+    def create_subscription(self, notification_url: str, client_state: str, expires_at: datetime):
+        """Subscribe to changes on the user's events; returns ``(subscription_id, expires_at)``.
+
+        Graph validates ``notification_url`` synchronously before answering.
+        """
+        result = graph_client.get_graph_client().request("POST", "/subscriptions", self.access_token, json={
+            "changeType": "created,updated,deleted",
+            "notificationUrl": notification_url,
+            "resource": "/me/events",
+            "expirationDateTime": _graph_time(expires_at),
+            "clientState": client_state,
+        }, operation="create_subscription")
+        return result["id"], parse_event_time(result["expirationDateTime"])
+
+    def renew_subscription(self, subscription_id: str, expires_at: datetime):
+        result = graph_client.get_graph_client().request(
+            "PATCH", f"/subscriptions/{subscription_id}", self.access_token,
+            json={"expirationDateTime": _graph_time(expires_at)}, operation="renew_subscription",
+        )
+        return parse_event_time(result.get("expirationDateTime")) or expires_at
+
+    def delete_subscription(self, subscription_id: str):
+        graph_client.get_graph_client().request(
+            "DELETE", f"/subscriptions/{subscription_id}", self.access_token, operation="delete_subscription",
+        )
+
     def get_updated_credentials(self):
         self._refresh_if_needed()
-        return {
+        credentials = {
             "access_token": self.access_token,
             "refresh_token": self.refresh_token,
             "token_expiry": self.token_expiry,
             "scopes": self.scopes
         }
+        if self.msal_account_id:
+            credentials["msal_account_id"] = self.msal_account_id
+            credentials["msal_cache"] = self._msal_cache
+        return credentials
+
+
+def _event_body(summary, start_datetime, end_datetime, description='', location='', attendees=None):
+    event = {
+        "subject": summary,
+        "body": {"contentType": "text", "content": description},
+        "start": {"dateTime": start_datetime.isoformat(), "timeZone": "Eastern Standard Time"},
+        "end": {"dateTime": end_datetime.isoformat(), "timeZone": "Eastern Standard Time"}
+    }
+    if location:
+        event["location"] = {"displayName": location}
+    if attendees:
+        event["attendees"] = [
+            {"emailAddress": {"address": email}, "type": "required"}
+            for email in attendees
+        ]
+    return event
+
+
+def _graph_time(value):
+    """ISO 8601 UTC for a naive-UTC or aware datetime."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.isoformat(timespec="seconds") + "Z"
+
+
+def _event_out(event):
+    return {
+        "id": event["id"],
+        "summary": event.get("subject", ""),
+        "start": event["start"]["dateTime"],
+        "end": event["end"]["dateTime"],
+        "description": event.get("bodyPreview", ""),
+        "location": (event.get("location") or {}).get("displayName", ""),
+        "status": "confirmed" if not event.get("isCancelled") else "cancelled"
+    }
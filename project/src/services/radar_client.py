@@ -0,0 +1,219 @@
+"""Shared Radar API client.
+
+One ``requests.Session`` with a keep-alive connection pool serves every
+geocode, so calls after the first skip the TCP/TLS handshake. On top of it:
+
+- Deadlines: inside a Retell tool call the request timeout is capped by
+  the time left in the tool's budget (``tracing.remaining_seconds``), and
+  a call that could not finish in time is not started at all.
+- Single-flight: identical queries already in flight share one request;
+  later callers wait for the leader's result instead of calling Radar.
+- Circuit breaker: after ``RADAR_BREAKER_FAILURES`` consecutive failures
+  (timeouts, connection errors, 429/5xx) calls fail fast with
+  ``RadarUnavailable`` for ``RADAR_BREAKER_RESET_SECONDS``, then a single
+  trial request decides whether to close the circuit again.
+"""
+import os
+import time
+import logging
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+from src.services.http_pool import register_pool_metrics
+from src.utils import metrics
+from src.utils.tracing import remaining_seconds, span
+
+load_dotenv()
+
+RADAR_BASE_URL = os.getenv("RADAR_BASE_URL", "https://api.radar.io/v1")
+RADAR_TIMEOUT_SECONDS = float(os.getenv("RADAR_TIMEOUT_SECONDS", "8"))
+RADAR_CONNECT_TIMEOUT_SECONDS = float(os.getenv("RADAR_CONNECT_TIMEOUT_SECONDS", "3"))
+# Left over for the handler to build its response after Radar answers
+RADAR_DEADLINE_MARGIN_SECONDS = float(os.getenv("RADAR_DEADLINE_MARGIN_SECONDS", "1"))
+RADAR_MIN_TIMEOUT_SECONDS = float(os.getenv("RADAR_MIN_TIMEOUT_SECONDS", "0.25"))
+RADAR_POOL_SIZE = int(os.getenv("RADAR_POOL_SIZE", "20"))
+RADAR_BREAKER_FAILURES = int(os.getenv("RADAR_BREAKER_FAILURES", "5"))
+RADAR_BREAKER_RESET_SECONDS = float(os.getenv("RADAR_BREAKER_RESET_SECONDS", "30"))
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+
+
+class RadarError(Exception):
+    """Radar answered with an error status."""
+
+    def __init__(self, status_code, message):
+        super().__init__(f"Radar {status_code}: {message}")
+        self.status_code = status_code
+
+
+class RadarUnavailable(Exception):
+    """The call was not attempted: circuit open or no time left."""
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold, reset_seconds):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                logging.info("[RADAR] Circuit closed")
+            self.state = CLOSED
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    logging.warning(
+                        f"[RADAR] Circuit opened after {self.failures} failures; "
+                        f"failing fast for {self.reset_seconds:.0f}s"
+                    )
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self._trial_in_flight = False
+
+
+class RadarClient:
+
+    def __init__(self, api_key=None, base_url=RADAR_BASE_URL, pool_size=RADAR_POOL_SIZE):
+        self.base_url = base_url.rstrip("/")
+        self.session = requests.Session()
+        self.adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+        self.session.headers["Authorization"] = api_key if api_key is not None else os.getenv("RADAR_API_KEY", "")
+        self.breaker = CircuitBreaker(RADAR_BREAKER_FAILURES, RADAR_BREAKER_RESET_SECONDS)
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+
+    def geocode_forward(self, query, operation="geocode"):
+        """Raw JSON of ``GET /geocode/forward?query=...``.
+
+        Raises ``RadarUnavailable`` without calling Radar when the circuit
+        is open or the deadline leaves too little time, ``RadarError`` for
+        error statuses and ``requests`` exceptions for transport failures.
+        """
+        return self._single_flight(("geocode/forward", query.strip().lower()), operation,
+                                   lambda timeout: self._get("geocode/forward", {"query": query},
+                                                             operation, timeout))
+
+    def _timeout(self):
+        timeout = RADAR_TIMEOUT_SECONDS
+        remaining = remaining_seconds()
+        if remaining is not None:
+            timeout = min(timeout, remaining - RADAR_DEADLINE_MARGIN_SECONDS)
+        if timeout < RADAR_MIN_TIMEOUT_SECONDS:
+            metrics.inc("radar_rejected_total", reason="deadline")
+            raise RadarUnavailable(f"only {max(timeout, 0):.2f}s left in the tool budget")
+        return timeout
+
+    def _single_flight(self, key, operation, call):
+        timeout = self._timeout()
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        if not leader:
+            metrics.inc("radar_singleflight_total", role="follower", operation=operation)
+            try:
+                return future.result(timeout=timeout)
+            except FutureTimeout:
+                raise requests.exceptions.Timeout(f"waited {timeout:.2f}s for in-flight Radar call")
+
+        metrics.inc("radar_singleflight_total", role="leader", operation=operation)
+        try:
+            result = call(timeout)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+    def _get(self, path, params, operation, timeout):
+        if not self.breaker.allow():
+            metrics.inc("radar_rejected_total", reason="circuit_open")
+            raise RadarUnavailable("circuit open")
+        try:
+            with span("radar.geocode", operation=operation), \
+                    metrics.timed("external_call_duration_seconds", service="radar", operation=operation):
+                response = self.session.get(
+                    f"{self.base_url}/{path}", params=params,
+                    timeout=(min(RADAR_CONNECT_TIMEOUT_SECONDS, timeout), timeout),
+                )
+        except requests.exceptions.RequestException:
+            self.breaker.record_failure()
+            raise
+        if response.status_code == 429 or response.status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        if response.status_code != 200:
+            metrics.inc("external_call_errors_total", service="radar", operation=operation)
+            raise RadarError(response.status_code, response.text[:200])
+        return response.json()
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_radar_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = RadarClient()
+    return _client
+
+
+def close_radar_client():
+    if _client is not None:
+        _client.close()
+
+
+def _circuit_state():
+    if _client is None:
+        return 0
+    return {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}[_client.breaker.state]
+
+
+metrics.describe("radar_singleflight_total", "counter",
+                 "Radar lookups by single-flight role (leader called Radar, follower shared a result)")
+metrics.describe("radar_rejected_total", "counter",
+                 "Radar calls not attempted, by reason (circuit_open, deadline)")
+register_pool_metrics("radar", "Radar", lambda: _client)
+metrics.register_gauge("radar_circuit_state",
+                       "Radar circuit breaker state (0 closed, 1 half-open, 2 open)", _circuit_state)
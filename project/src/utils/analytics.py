@@ -0,0 +1,351 @@
+"""Pre-aggregated time-series analytics for calls and bookings.
+
+Row triggers on ``call_logs`` and ``appointments`` add into hourly buckets
+(``analytics_hourly``) inside the writing transaction. A compaction job
+rolls hourly buckets older than ``ANALYTICS_HOURLY_RETENTION_DAYS`` into
+``analytics_daily``. Queries never touch the base tables.
+
+Each bucket row is ``(bucket_start, metric, dimension, event_count,
+value_total)``:
+
+==================== ============== ============= ==========================
+metric               dimension      bucketed by   value_total
+==================== ============== ============= ==========================
+call_volume          direction      created_at    --
+call_duration        direction      created_at    seconds (calls > 0s only)
+hangup_reason        reason         created_at    --
+bookings             service_type   created_at    --
+revenue              service_type   created_at    quoted_price
+tech_booked_minutes  technician_id  start_time    duration_minutes
+==================== ============== ============= ==========================
+
+Cancelled appointments are excluded from revenue and booked minutes.
+"""
+import os
+import logging
+from datetime import datetime, timedelta
+
+from psycopg2.extras import RealDictCursor
+
+from src.utils.db import _connect, get_db_connection, run_bootstrap_once
+
+ANALYTICS_HOURLY_RETENTION_DAYS = int(os.getenv("ANALYTICS_HOURLY_RETENTION_DAYS", "14"))
+
+# Bookable minutes per tech, used to turn booked minutes into utilization
+BUSINESS_MINUTES_PER_DAY = 9 * 60
+
+METRICS = {
+    "call_volume": "direction",
+    "call_duration": "direction",
+    "hangup_reason": "disconnection_reason",
+    "bookings": "service_type",
+    "revenue": "service_type",
+    "tech_booked_minutes": "technician_id",
+}
+
+BUCKETS = ("hour", "day")
+GROUP_BYS = ("none", "dimension")
+
+
+def ensure_analytics_schema(cur):
+    """Create bucket tables, bump functions and triggers (idempotent)."""
+    for table in ("analytics_hourly", "analytics_daily"):
+        cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                bucket_start TIMESTAMP NOT NULL,
+                metric VARCHAR(50) NOT NULL,
+                dimension VARCHAR(255) NOT NULL,
+                event_count BIGINT NOT NULL DEFAULT 0,
+                value_total NUMERIC(14, 2) NOT NULL DEFAULT 0,
+                PRIMARY KEY (bucket_start, metric, dimension)
+            )
+        """)
+        cur.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_{table}_metric_bucket
+            ON {table} (metric, bucket_start)
+        """)
+
+    cur.execute("""
+        CREATE OR REPLACE FUNCTION analytics_bump(
+            p_at TIMESTAMP, p_metric VARCHAR, p_dimension VARCHAR,
+            p_count INTEGER, p_total NUMERIC
+        ) RETURNS VOID AS $$
+            INSERT INTO analytics_hourly (bucket_start, metric, dimension, event_count, value_total)
+            VALUES (
+                date_trunc('hour', COALESCE(p_at, TIMESTAMP 'epoch')),
+                p_metric, COALESCE(p_dimension, ''), p_count, COALESCE(p_total, 0)
+            )
+            ON CONFLICT (bucket_start, metric, dimension) DO UPDATE SET
+                event_count = analytics_hourly.event_count + EXCLUDED.event_count,
+                value_total = analytics_hourly.value_total + EXCLUDED.value_total
+        $$ LANGUAGE sql
+    """)
+
+    cur.execute("""
+        CREATE OR REPLACE FUNCTION analytics_call_apply(r call_logs, p_sign INTEGER)
+        RETURNS VOID AS $$
+        BEGIN
+            PERFORM analytics_bump(r.created_at, 'call_volume', r.direction, p_sign, 0);
+            IF r.duration_seconds > 0 THEN
+                PERFORM analytics_bump(r.created_at, 'call_duration', r.direction,
+                                       p_sign, p_sign * r.duration_seconds);
+            END IF;
+            IF r.disconnection_reason IS NOT NULL THEN
+                PERFORM analytics_bump(r.created_at, 'hangup_reason', r.disconnection_reason,
+                                       p_sign, 0);
+            END IF;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+
+    cur.execute("""
+        CREATE OR REPLACE FUNCTION analytics_appointment_apply(r appointments, p_sign INTEGER)
+        RETURNS VOID AS $$
+        BEGIN
+            PERFORM analytics_bump(r.created_at, 'bookings', r.service_type, p_sign, 0);
+            IF COALESCE(r.status, '') <> 'cancelled' THEN
+                IF r.quoted_price IS NOT NULL THEN
+                    PERFORM analytics_bump(r.created_at, 'revenue', r.service_type,
+                                           p_sign, p_sign * r.quoted_price);
+                END IF;
+                IF r.technician_id IS NOT NULL THEN
+                    PERFORM analytics_bump(r.start_time, 'tech_booked_minutes',
+                                           r.technician_id::text, p_sign,
+                                           p_sign * COALESCE(r.duration_minutes, 0));
+                END IF;
+            END IF;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+
+    for table, apply_fn in (("call_logs", "analytics_call_apply"),
+                            ("appointments", "analytics_appointment_apply")):
+        cur.execute(f"""
+            CREATE OR REPLACE FUNCTION {table}_analytics_trigger() RETURNS TRIGGER AS $$
+            BEGIN
+                IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                    PERFORM {apply_fn}(OLD, -1);
+                END IF;
+                IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                    PERFORM {apply_fn}(NEW, 1);
+                END IF;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+        """)
+        cur.execute(f"DROP TRIGGER IF EXISTS {table}_analytics_ins_del ON {table}")
+        cur.execute(f"""
+            CREATE TRIGGER {table}_analytics_ins_del
+            AFTER INSERT OR DELETE ON {table}
+            FOR EACH ROW EXECUTE FUNCTION {table}_analytics_trigger()
+        """)
+
+    cur.execute("DROP TRIGGER IF EXISTS call_logs_analytics_upd ON call_logs")
+    cur.execute("""
+        CREATE TRIGGER call_logs_analytics_upd
+        AFTER UPDATE OF created_at, direction, disconnection_reason, duration_seconds ON call_logs
+        FOR EACH ROW
+        WHEN (OLD.created_at IS DISTINCT FROM NEW.created_at
+              OR OLD.direction IS DISTINCT FROM NEW.direction
+              OR OLD.disconnection_reason IS DISTINCT FROM NEW.disconnection_reason
+              OR OLD.duration_seconds IS DISTINCT FROM NEW.duration_seconds)
+        EXECUTE FUNCTION call_logs_analytics_trigger()
+    """)
+    cur.execute("DROP TRIGGER IF EXISTS appointments_analytics_upd ON appointments")
+    cur.execute("""
+        CREATE TRIGGER appointments_analytics_upd
+        AFTER UPDATE OF created_at, start_time, status, service_type, quoted_price,
+                        technician_id, duration_minutes ON appointments
+        FOR EACH ROW
+        WHEN (OLD.created_at IS DISTINCT FROM NEW.created_at
+              OR OLD.start_time IS DISTINCT FROM NEW.start_time
+              OR OLD.status IS DISTINCT FROM NEW.status
+              OR OLD.service_type IS DISTINCT FROM NEW.service_type
+              OR OLD.quoted_price IS DISTINCT FROM NEW.quoted_price
+              OR OLD.technician_id IS DISTINCT FROM NEW.technician_id
+              OR OLD.duration_minutes IS DISTINCT FROM NEW.duration_minutes)
+        EXECUTE FUNCTION appointments_analytics_trigger()
+    """)
+
+
+def rebuild_analytics(conn=None):
+    """Recompute all buckets from the base tables, then compact.
+
+    Used once when the triggers are installed on a populated database. With
+    ``conn`` the rebuild joins the caller's transaction and the caller
+    compacts after committing.
+    """
+    owned = conn is None
+    conn = _connect(conn)
+    cur = conn.cursor()
+    try:
+        cur.execute("LOCK TABLE appointments, call_logs IN SHARE MODE")
+        cur.execute("DELETE FROM analytics_hourly")
+        cur.execute("DELETE FROM analytics_daily")
+        cur.execute("SELECT analytics_call_apply(c, 1) FROM call_logs c")
+        cur.execute("SELECT analytics_appointment_apply(a, 1) FROM appointments a")
+        conn.commit()
+        logging.info("[ANALYTICS] Buckets rebuilt from base tables")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+    if owned:
+        compact_analytics()
+
+
+def bootstrap_analytics():
+    """Backfill the buckets once, the first time the triggers are installed."""
+    if run_bootstrap_once("analytics_buckets", rebuild_analytics):
+        compact_analytics()
+
+
+def compact_analytics(retention_days=None):
+    """Roll hourly buckets older than the retention window into daily ones.
+
+    The move is a single DELETE ... RETURNING feeding an upsert, so a bucket
+    is never counted in both tables. Late trigger writes into an already
+    compacted hour simply re-create a small hourly row that the next run
+    folds in additively.
+    """
+    if retention_days is None:
+        retention_days = ANALYTICS_HOURLY_RETENTION_DAYS
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            WITH moved AS (
+                DELETE FROM analytics_hourly
+                WHERE bucket_start < date_trunc('day', LOCALTIMESTAMP) - make_interval(days => %s)
+                RETURNING bucket_start, metric, dimension, event_count, value_total
+            )
+            INSERT INTO analytics_daily (bucket_start, metric, dimension, event_count, value_total)
+            SELECT date_trunc('day', bucket_start), metric, dimension,
+                   SUM(event_count), SUM(value_total)
+            FROM moved
+            GROUP BY 1, 2, 3
+            ON CONFLICT (bucket_start, metric, dimension) DO UPDATE SET
+                event_count = analytics_daily.event_count + EXCLUDED.event_count,
+                value_total = analytics_daily.value_total + EXCLUDED.value_total
+        """, (retention_days,))
+        moved = cur.rowcount
+        cur.execute("""
+            DELETE FROM analytics_daily WHERE event_count = 0 AND value_total = 0
+        """)
+        conn.commit()
+        logging.info("[ANALYTICS] Compacted hourly buckets into %d daily rows", moved)
+        return moved
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+
+def _row_out(row, metric, bucket, grouped):
+    count = int(row["event_count"])
+    total = float(row["value_total"] or 0)
+    out = {
+        "bucket_start": row["bucket_start"].isoformat(),
+        "count": count,
+    }
+    if grouped:
+        out["dimension"] = row["dimension"]
+
+    if metric == "call_duration":
+        out["total_seconds"] = total
+        out["avg_seconds"] = round(total / count, 1) if count else 0
+    elif metric == "revenue":
+        out["revenue"] = round(total, 2)
+    elif metric == "tech_booked_minutes":
+        out["booked_minutes"] = total
+        if grouped:
+            capacity = 60 if bucket == "hour" else BUSINESS_MINUTES_PER_DAY
+            out["utilization"] = round(total / capacity, 3)
+    return out
+
+
+def query_metric(metric, bucket, start, end, group_by="none"):
+    """Return a time series for ``metric`` in ``[start, end)``.
+
+    Day buckets cover whole days, so for ``bucket="day"`` the range is
+    widened to midnight boundaries; otherwise a partial first or last day
+    would count its hourly rows but not its compacted daily row.
+
+    Raises ValueError for unknown parameters or when hourly resolution is
+    requested for a range that has already been compacted to daily.
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric '{metric}'")
+    if bucket not in BUCKETS:
+        raise ValueError(f"Unknown bucket '{bucket}'")
+    if group_by not in GROUP_BYS:
+        raise ValueError(f"Unknown group_by '{group_by}'")
+    if end <= start:
+        raise ValueError("end must be after start")
+    if bucket == "day":
+        start = datetime.combine(start.date(), datetime.min.time())
+        end_day = datetime.combine(end.date(), datetime.min.time())
+        end = end_day if end == end_day else end_day + timedelta(days=1)
+
+    if bucket == "hour":
+        horizon = datetime.combine(
+            datetime.now().date() - timedelta(days=ANALYTICS_HOURLY_RETENTION_DAYS),
+            datetime.min.time(),
+        )
+        if start < horizon:
+            raise ValueError(
+                f"Hourly buckets are kept for {ANALYTICS_HOURLY_RETENTION_DAYS} days; "
+                f"use bucket=day before {horizon.date()}"
+            )
+        source = """
+            SELECT bucket_start, dimension, event_count, value_total
+            FROM analytics_hourly
+            WHERE metric = %s AND bucket_start >= %s AND bucket_start < %s
+        """
+        params = [metric, start, end]
+    else:
+        # Days not yet compacted still live in the hourly table
+        source = """
+            SELECT bucket_start, dimension, event_count, value_total
+            FROM analytics_daily
+            WHERE metric = %s AND bucket_start >= %s AND bucket_start < %s
+            UNION ALL
+            SELECT date_trunc('day', bucket_start), dimension, event_count, value_total
+            FROM analytics_hourly
+            WHERE metric = %s AND bucket_start >= %s AND bucket_start < %s
+        """
+        params = [metric, start, end, metric, start, end]
+
+    grouped = group_by == "dimension"
+    dim_select = "dimension" if grouped else "'' AS dimension"
+    group_cols = "bucket_start, dimension" if grouped else "bucket_start"
+
+    conn = get_db_connection()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        cur.execute(f"""
+            SELECT bucket_start, {dim_select},
+                   SUM(event_count) AS event_count, SUM(value_total) AS value_total
+            FROM ({source}) s
+            GROUP BY {group_cols}
+            HAVING SUM(event_count) <> 0 OR SUM(value_total) <> 0
+            ORDER BY {group_cols}
+        """, params)
+        rows = cur.fetchall()
+    finally:
+        cur.close()
+        conn.close()
+
+    return {
+        "metric": metric,
+        "bucket": bucket,
+        "group_by": group_by,
+        "dimension": METRICS[metric] if grouped else None,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "series": [_row_out(r, metric, bucket, grouped) for r in rows],
+    }
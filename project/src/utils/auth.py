@@ -3,6 +3,7 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from src.utils.jwt_utils import decode_access_token
 from src.utils.db import get_user_by_id
+from src.utils.user_cache import get_user
 
 auth_scheme = HTTPBearer(auto_error=False)
 
@@ -25,7 +26,7 @@ async def get_current_user(token: HTTPAuthorizationCredentials = Depends(auth_sc
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid token payload"
         )
-    user = get_user_by_id(user_id)
+    user = get_user(user_id, get_user_by_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
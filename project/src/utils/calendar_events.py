@@ -0,0 +1,65 @@
+"""Calendar event helpers shared by booking, backfill and calendar sync.
+
+The booking flow and the calendar backfill both push appointments to the
+tech's and the admin's calendars; ``event_fields`` keeps the event text
+identical. Provider sync code shares the time parsing and token errors.
+"""
+import re
+from datetime import datetime, timezone
+
+_LONG_FRACTION = re.compile(r"(\.\d{6})\d+")
+
+
+class SyncTokenExpired(Exception):
+    """The provider no longer accepts the stored sync token / delta link."""
+
+
+def parse_event_time(value):
+    """Naive UTC datetime for a provider event time.
+
+    Handles Google RFC 3339 times and all-day dates, and Graph's
+    7-digit fractions (Graph returns UTC when no time zone is requested).
+    """
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(_LONG_FRACTION.sub(r"\1", value.replace("Z", "+00:00")))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def event_fields(target, appointment, tech_name=None, invite_customer=True):
+    """``create_event`` keyword arguments for one appointment.
+
+    ``target`` is ``"tech"`` or ``"admin"``; ``appointment`` is an
+    appointments row (or a dict with the same keys). The public
+    appointment id is ``calendar_event_id``.
+    """
+    service_label = (appointment.get("service_type") or "").replace("_", " ").title()
+    customer_name = appointment.get("customer_name")
+    customer_email = appointment.get("customer_email")
+    details = (
+        f"Customer: {customer_name}\n"
+        f"Phone: {appointment.get('customer_phone')}\n"
+        f"Email: {customer_email or 'N/A'}\n"
+        f"Service: {service_label}\n"
+        f"Price: ${appointment.get('quoted_price')}\n"
+        f"Discount: {appointment.get('discount_applied') or 'none'}\n"
+        f"Appointment ID: {appointment.get('calendar_event_id') or appointment.get('id')}"
+    )
+    if target == "admin":
+        summary = f"[{tech_name}] {service_label} - {customer_name}"
+        description = f"Technician: {tech_name}\n" + details
+        attendees = []
+    else:
+        summary = f"{service_label} - {customer_name}"
+        description = details
+        attendees = [customer_email] if customer_email and invite_customer else []
+    return {
+        "summary": summary,
+        "start_datetime": appointment["start_time"],
+        "end_datetime": appointment["end_time"],
+        "description": description,
+        "location": appointment.get("address") or "",
+        "attendees": attendees,
+    }
@@ -0,0 +1,508 @@
+"""Push-driven calendar change tracking for technicians.
+
+Each connected tech calendar is mirrored into ``calendar_event_cache``:
+
+- a first full sync lists the window (``CALENDAR_SYNC_HORIZON_DAYS``) and
+  stores the provider's cursor (Google ``nextSyncToken``, Graph delta
+  link) in ``calendar_sync_state``; later syncs fetch only what changed;
+- a push channel per calendar (Google ``events.watch``, Graph
+  subscription) notifies ``/api/calendar/notifications/<provider>``, which
+  marks the calendar dirty and runs a targeted incremental sync;
+- ``renew_calendar_channels`` replaces or extends channels before they
+  expire and opens missing ones.
+
+Reads serve straight from the cache while a channel is live and nothing is
+dirty; otherwise they run an incremental sync first, so calendars without
+a channel (``CALENDAR_WEBHOOK_BASE_URL`` unset) still avoid full re-pulls.
+"""
+import os
+import uuid
+import json
+import logging
+import secrets
+import threading
+from datetime import datetime, timedelta
+
+from psycopg2.extras import RealDictCursor, execute_values
+
+from src.utils import metrics
+from src.utils.calendar_events import SyncTokenExpired, parse_event_time
+from src.utils.db import get_calendar_credentials, get_db_connection, save_calendar_credentials
+
+# Public base URL providers can reach; channels are not opened without it
+CALENDAR_WEBHOOK_BASE_URL = os.getenv("CALENDAR_WEBHOOK_BASE_URL", "").rstrip("/")
+# Graph caps event subscriptions at 4230 minutes
+CALENDAR_CHANNEL_TTL_HOURS = float(os.getenv("CALENDAR_CHANNEL_TTL_HOURS", "70"))
+CALENDAR_CHANNEL_RENEW_HOURS = float(os.getenv("CALENDAR_CHANNEL_RENEW_HOURS", "12"))
+CALENDAR_SYNC_HORIZON_DAYS = int(os.getenv("CALENDAR_SYNC_HORIZON_DAYS", "90"))
+CALENDAR_SYNC_LOOKBACK_DAYS = int(os.getenv("CALENDAR_SYNC_LOOKBACK_DAYS", "1"))
+
+# A cursor's window may trail the horizon this much before a full resync
+WINDOW_SLACK = timedelta(days=1)
+
+_tech_locks = {}
+_tech_locks_guard = threading.Lock()
+
+
+def ensure_calendar_sync_schema(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS calendar_sync_state (
+            technician_id INTEGER PRIMARY KEY REFERENCES technicians(id) ON DELETE CASCADE,
+            provider VARCHAR(50) NOT NULL,
+            sync_token TEXT,
+            window_start TIMESTAMP,
+            window_end TIMESTAMP,
+            dirty BOOLEAN NOT NULL DEFAULT TRUE,
+            last_synced_at TIMESTAMP
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS calendar_event_cache (
+            technician_id INTEGER NOT NULL REFERENCES technicians(id) ON DELETE CASCADE,
+            event_id VARCHAR(1024) NOT NULL,
+            start_at TIMESTAMP,
+            end_at TIMESTAMP,
+            data JSONB NOT NULL,
+            PRIMARY KEY (technician_id, event_id)
+        )
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_calendar_event_cache_start
+        ON calendar_event_cache (technician_id, start_at)
+    """)
+    # id is the Google channel id or the Graph subscription id
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS calendar_channels (
+            id VARCHAR(255) PRIMARY KEY,
+            technician_id INTEGER NOT NULL REFERENCES technicians(id) ON DELETE CASCADE,
+            provider VARCHAR(50) NOT NULL,
+            resource_id VARCHAR(255),
+            client_state VARCHAR(255) NOT NULL,
+            expires_at TIMESTAMP NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_calendar_channels_tech
+        ON calendar_channels (technician_id)
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_calendar_channels_expires
+        ON calendar_channels (expires_at)
+    """)
+
+
+def _tech_lock(technician_id):
+    with _tech_locks_guard:
+        return _tech_locks.setdefault(technician_id, threading.Lock())
+
+
+def _open_calendar(technician_id):
+    """(provider, service, creds row) for a connected tech, or (None, None, None)."""
+    creds = get_calendar_credentials(technician_id)
+    if not creds or not creds.get("calendar_connected"):
+        return None, None, None
+    provider = creds["calendar_provider"]
+    if provider == "google":
+        from src.services.google_calendar import GoogleCalendarService
+        return provider, GoogleCalendarService(creds["calendar_credentials"]), creds
+    if provider == "outlook":
+        from src.services.outlook_calendar import OutlookCalendarService
+        return provider, OutlookCalendarService(creds["calendar_credentials"]), creds
+    return None, None, None
+
+
+def _save_credentials(technician_id, provider, creds, service):
+    save_calendar_credentials(technician_id, provider, creds.get("calendar_email", ""),
+                              service.get_updated_credentials())
+
+
+def _get_state(cur, technician_id):
+    cur.execute("SELECT * FROM calendar_sync_state WHERE technician_id = %s", (technician_id,))
+    return cur.fetchone()
+
+
+def _has_live_channel(cur, technician_id):
+    cur.execute("""
+        SELECT 1 FROM calendar_channels
+        WHERE technician_id = %s AND expires_at > %s
+        LIMIT 1
+    """, (technician_id, datetime.utcnow()))
+    return cur.fetchone() is not None
+
+
+def _apply_changes(cur, technician_id, events, deleted, replace=False):
+    if replace:
+        cur.execute("DELETE FROM calendar_event_cache WHERE technician_id = %s", (technician_id,))
+    if deleted:
+        cur.execute("""
+            DELETE FROM calendar_event_cache
+            WHERE technician_id = %s AND event_id = ANY(%s)
+        """, (technician_id, deleted))
+    if events:
+        # A page can repeat an event; keep its last version
+        latest = {event["id"]: event for event in events}
+        execute_values(cur, """
+            INSERT INTO calendar_event_cache (technician_id, event_id, start_at, end_at, data)
+            VALUES %s
+            ON CONFLICT (technician_id, event_id) DO UPDATE SET
+                start_at = EXCLUDED.start_at,
+                end_at = EXCLUDED.end_at,
+                data = EXCLUDED.data
+        """, [
+            (technician_id, event_id, parse_event_time(event["start"]), parse_event_time(event["end"]),
+             json.dumps(event))
+            for event_id, event in latest.items()
+        ])
+
+
+def sync_technician_calendar(technician_id, full=False):
+    """Bring one tech's cached events up to date; returns the sync kind run.
+
+    Incremental when a cursor exists, full (replacing the cache) for the
+    first sync, an expired cursor, or a window that no longer covers the
+    horizon. Returns None when the tech has no connected calendar.
+
+    Leaves the dirty flag alone: callers clear it with ``_claim_dirty``
+    before syncing, so a notification that lands mid-sync stays recorded.
+    """
+    provider, service, creds = _open_calendar(technician_id)
+    if service is None:
+        return None
+    now = datetime.utcnow()
+    horizon_end = now + timedelta(days=CALENDAR_SYNC_HORIZON_DAYS)
+    conn = get_db_connection()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        state = _get_state(cur, technician_id)
+        cursor = None
+        if state and not full and state["provider"] == provider and state["window_end"] \
+                and state["window_end"] >= horizon_end - WINDOW_SLACK:
+            cursor = state["sync_token"]
+        window_start = state["window_start"] if cursor else now - timedelta(days=CALENDAR_SYNC_LOOKBACK_DAYS)
+        window_end = state["window_end"] if cursor else horizon_end
+
+        kind = "incremental" if cursor else "full"
+        with metrics.timed("calendar_sync_duration_seconds", provider=provider, kind=kind):
+            try:
+                events, deleted, next_cursor = service.sync_events(cursor, window_start, window_end)
+            except SyncTokenExpired:
+                logging.info(f"[CALSYNC] tech {technician_id}: sync cursor expired; full resync")
+                kind, window_start, window_end = "full", now - timedelta(days=CALENDAR_SYNC_LOOKBACK_DAYS), horizon_end
+                events, deleted, next_cursor = service.sync_events(None, window_start, window_end)
+
+        _apply_changes(cur, technician_id, events, deleted, replace=(kind == "full"))
+        cur.execute("""
+            INSERT INTO calendar_sync_state
+                (technician_id, provider, sync_token, window_start, window_end, dirty, last_synced_at)
+            VALUES (%s, %s, %s, %s, %s, FALSE, %s)
+            ON CONFLICT (technician_id) DO UPDATE SET
+                provider = EXCLUDED.provider,
+                sync_token = EXCLUDED.sync_token,
+                window_start = EXCLUDED.window_start,
+                window_end = EXCLUDED.window_end,
+                last_synced_at = EXCLUDED.last_synced_at
+        """, (technician_id, provider, next_cursor, window_start, window_end, now))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+    _save_credentials(technician_id, provider, creds, service)
+    metrics.inc("calendar_sync_total", provider=provider, kind=kind)
+    logging.info(f"[CALSYNC] tech {technician_id}: {kind} sync, "
+                 f"{len(events)} changed, {len(deleted)} deleted")
+    return kind
+
+
+def sync_if_dirty(technician_id):
+    """Run incremental syncs while the tech's calendar is marked dirty.
+
+    Only one sync per tech runs in this process; notifications arriving
+    during it set the flag again and are picked up by the next loop.
+    """
+    lock = _tech_lock(technician_id)
+    if not lock.acquire(blocking=False):
+        return
+    try:
+        while True:
+            if not _claim_dirty(technician_id):
+                return
+            try:
+                sync_technician_calendar(technician_id)
+            except Exception as e:
+                logging.error(f"[CALSYNC] tech {technician_id}: sync after notification failed: {e}")
+                _set_dirty(technician_id)
+                return
+    finally:
+        lock.release()
+
+
+def _claim_dirty(technician_id):
+    """Clear the tech's dirty flag; True if it was set."""
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            UPDATE calendar_sync_state SET dirty = FALSE
+            WHERE technician_id = %s AND dirty
+            RETURNING technician_id
+        """, (technician_id,))
+        claimed = cur.fetchone() is not None
+        conn.commit()
+        return claimed
+    finally:
+        cur.close()
+        conn.close()
+
+
+def _set_dirty(technician_id):
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("UPDATE calendar_sync_state SET dirty = TRUE WHERE technician_id = %s", (technician_id,))
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+
+
+def mark_dirty(provider, channel_id, client_state, resource_id=None):
+    """Record a push notification; returns the tech id, or None if it is not ours."""
+    conn = get_db_connection()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        cur.execute("SELECT * FROM calendar_channels WHERE id = %s AND provider = %s",
+                    (channel_id, provider))
+        channel = cur.fetchone()
+        if not channel or not secrets.compare_digest(channel["client_state"], client_state or "") \
+                or (resource_id and channel["resource_id"] and resource_id != channel["resource_id"]):
+            metrics.inc("calendar_notifications_total", provider=provider, result="rejected")
+            return None
+        cur.execute("""
+            UPDATE calendar_sync_state SET dirty = TRUE WHERE technician_id = %s
+        """, (channel["technician_id"],))
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+    metrics.inc("calendar_notifications_total", provider=provider, result="accepted")
+    return channel["technician_id"]
+
+
+def get_cached_events(technician_id, time_min, time_max):
+    """Events overlapping the window, syncing first unless a live channel vouches for the cache."""
+    conn = get_db_connection()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        state = _get_state(cur, technician_id)
+        fresh = (state is not None and not state["dirty"]
+                 and state["window_end"] >= time_max - WINDOW_SLACK
+                 and _has_live_channel(cur, technician_id))
+    finally:
+        cur.close()
+        conn.close()
+    if fresh:
+        metrics.inc("cache_requests_total", cache="calendar_events", result="hit")
+    else:
+        metrics.inc("cache_requests_total", cache="calendar_events", result="miss")
+        with _tech_lock(technician_id):
+            claimed = _claim_dirty(technician_id)
+            try:
+                sync_technician_calendar(technician_id)
+            except Exception:
+                if claimed:
+                    _set_dirty(technician_id)
+                raise
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            SELECT data FROM calendar_event_cache
+            WHERE technician_id = %s AND start_at < %s AND end_at > %s
+            ORDER BY start_at
+        """, (technician_id, time_max, time_min))
+        return [r[0] for r in cur.fetchall()]
+    finally:
+        cur.close()
+        conn.close()
+
+
+def _store_channel(technician_id, provider, channel_id, resource_id, client_state, expires_at):
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            INSERT INTO calendar_channels (id, technician_id, provider, resource_id, client_state, expires_at)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """, (channel_id, technician_id, provider, resource_id, client_state, expires_at))
+        # Changes between the last sync and the channel opening were not notified
+        cur.execute("UPDATE calendar_sync_state SET dirty = TRUE WHERE technician_id = %s", (technician_id,))
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+
+
+def _delete_channel(channel_id):
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("DELETE FROM calendar_channels WHERE id = %s", (channel_id,))
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+
+
+def open_channel(technician_id):
+    """Open a push channel for a connected tech calendar; returns its id or None."""
+    if not CALENDAR_WEBHOOK_BASE_URL:
+        return None
+    provider, service, creds = _open_calendar(technician_id)
+    if service is None:
+        return None
+    client_state = secrets.token_urlsafe(24)
+    address = f"{CALENDAR_WEBHOOK_BASE_URL}/api/calendar/notifications/{provider}"
+    if provider == "google":
+        channel_id = str(uuid.uuid4())
+        resource_id, expires_at = service.watch(
+            channel_id, address, client_state, CALENDAR_CHANNEL_TTL_HOURS * 3600
+        )
+    else:
+        resource_id = None
+        channel_id, expires_at = service.create_subscription(
+            address, client_state, datetime.utcnow() + timedelta(hours=CALENDAR_CHANNEL_TTL_HOURS)
+        )
+    _store_channel(technician_id, provider, channel_id, resource_id, client_state, expires_at)
+    _save_credentials(technician_id, provider, creds, service)
+    metrics.inc("calendar_channels_opened_total", provider=provider)
+    logging.info(f"[CALSYNC] tech {technician_id}: {provider} channel {channel_id} until {expires_at}")
+    return channel_id
+
+
+def _close_channel(channel, service):
+    try:
+        if channel["provider"] == "google":
+            service.stop_channel(channel["id"], channel["resource_id"])
+        else:
+            service.delete_subscription(channel["id"])
+    except Exception as e:
+        logging.warning(f"[CALSYNC] Could not close channel {channel['id']}: {e}")
+    _delete_channel(channel["id"])
+
+
+def renew_calendar_channels():
+    """Scheduled: renew channels close to expiry and open missing ones.
+
+    Graph subscriptions are extended in place; Google channels cannot be
+    extended, so a new one is opened before the old one is stopped.
+    """
+    if not CALENDAR_WEBHOOK_BASE_URL:
+        return
+    now = datetime.utcnow()
+    conn = get_db_connection()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        cur.execute("""
+            SELECT * FROM calendar_channels
+            WHERE expires_at < %s
+            ORDER BY expires_at
+        """, (now + timedelta(hours=CALENDAR_CHANNEL_RENEW_HOURS),))
+        expiring = [dict(r) for r in cur.fetchall()]
+        cur.execute("""
+            SELECT t.id FROM technicians t
+            WHERE t.calendar_connected = TRUE
+              AND t.calendar_provider IN ('google', 'outlook')
+              AND NOT EXISTS (SELECT 1 FROM calendar_channels c WHERE c.technician_id = t.id)
+        """)
+        missing = [r["id"] for r in cur.fetchall()]
+    finally:
+        cur.close()
+        conn.close()
+
+    renewed = opened = failed = 0
+    for channel in expiring:
+        technician_id = channel["technician_id"]
+        try:
+            provider, service, creds = _open_calendar(technician_id)
+            if service is None or provider != channel["provider"]:
+                _delete_channel(channel["id"])
+                continue
+            if provider == "outlook" and channel["expires_at"] > now:
+                expires_at = service.renew_subscription(
+                    channel["id"], now + timedelta(hours=CALENDAR_CHANNEL_TTL_HOURS)
+                )
+                _extend_channel(channel["id"], expires_at)
+                _save_credentials(technician_id, provider, creds, service)
+            else:
+                open_channel(technician_id)
+                _close_channel(channel, service)
+            renewed += 1
+        except Exception as e:
+            failed += 1
+            logging.error(f"[CALSYNC] Renewing channel {channel['id']} for tech {technician_id} failed: {e}")
+    for technician_id in missing:
+        try:
+            if open_channel(technician_id):
+                opened += 1
+        except Exception as e:
+            failed += 1
+            logging.error(f"[CALSYNC] Opening channel for tech {technician_id} failed: {e}")
+    if renewed or opened or failed:
+        logging.info(f"[CALSYNC] Channels: {renewed} renewed, {opened} opened, {failed} failed")
+
+
+def _extend_channel(channel_id, expires_at):
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("UPDATE calendar_channels SET expires_at = %s WHERE id = %s", (expires_at, channel_id))
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+
+
+def forget_technician_calendar(technician_id):
+    """Close the tech's channels and drop its cached events and cursor.
+
+    Call before the calendar credentials are replaced or removed.
+    """
+    conn = get_db_connection()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        cur.execute("SELECT * FROM calendar_channels WHERE technician_id = %s", (technician_id,))
+        channels = [dict(r) for r in cur.fetchall()]
+    finally:
+        cur.close()
+        conn.close()
+    if channels:
+        try:
+            _, service, _ = _open_calendar(technician_id)
+        except Exception as e:
+            logging.warning(f"[CALSYNC] tech {technician_id}: cannot open calendar to close channels: {e}")
+            service = None
+        for channel in channels:
+            if service is not None:
+                _close_channel(channel, service)
+            else:
+                _delete_channel(channel["id"])
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("DELETE FROM calendar_event_cache WHERE technician_id = %s", (technician_id,))
+        cur.execute("DELETE FROM calendar_sync_state WHERE technician_id = %s", (technician_id,))
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+
+
+metrics.describe("calendar_sync_total", "counter", "Tech calendar syncs by provider and kind (full, incremental)")
+metrics.describe("calendar_notifications_total", "counter",
+                 "Calendar push notifications by provider and result (accepted, rejected)")
+metrics.describe("calendar_channels_opened_total", "counter", "Calendar push channels opened")
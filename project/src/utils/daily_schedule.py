@@ -0,0 +1,100 @@
+"""Nightly technician schedule emails.
+
+One grouped query loads tomorrow's appointments for every tech, all emails
+are rendered up front, and delivery goes through ``send_email_batch`` so a
+handful of authenticated SMTP connections are reused across the whole run.
+"""
+import os
+import time
+import logging
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from src.utils.db import get_tech_schedules_between
+from src.utils.email_templates import render_batch
+from src.utils.mail_service import schedule_context, send_email_batch
+
+
+def _clock(value):
+    if isinstance(value, datetime):
+        return value.strftime("%H:%M")
+    text = str(value)
+    return text.split(" ")[1][:5] if " " in text else text
+
+
+def send_daily_schedules():
+    """Send each technician their next-day schedule at 6 PM ET.
+
+    Returns a run report with per-phase timings and any failures.
+    """
+    started = time.perf_counter()
+    eastern = ZoneInfo("America/New_York")
+    now = datetime.now(eastern)
+    tomorrow = (now + timedelta(days=1)).date()
+    tomorrow_start = datetime.combine(tomorrow, datetime.min.time())
+    tomorrow_end = datetime.combine(tomorrow, datetime.max.time())
+    frontend_url = os.getenv("FRONTEND_URL", "http://localhost:3000")
+    schedule_url = f"{frontend_url}/schedule"
+
+    techs = get_tech_schedules_between(tomorrow_start, tomorrow_end)
+    query_done = time.perf_counter()
+
+    contexts = []
+    recipients = []
+    for tech in techs:
+        appt_list = [
+            {
+                "start_time": _clock(appt["start_time"]),
+                "end_time": _clock(appt["end_time"]),
+                "service_type": appt["service_type"],
+                "customer_name": appt["customer_name"],
+                "customer_phone": appt.get("customer_phone") or "",
+                "address": appt.get("address") or "",
+            }
+            for appt in tech["appointments"]
+        ]
+        contexts.append(schedule_context(tech["name"], str(tomorrow), appt_list, schedule_url))
+        recipients.append(tech["email"])
+    rendered = render_batch("daily_schedule", contexts)
+    messages = [
+        {
+            "to_email": to_email,
+            "subject": email.subject,
+            "html_body": email.html,
+            "plain_body": email.text,
+        }
+        for to_email, email in zip(recipients, rendered)
+    ]
+    render_done = time.perf_counter()
+
+    logging.info(
+        "Sending daily schedules to %d technicians for %s",
+        len(messages), tomorrow,
+    )
+    results = send_email_batch(messages)
+    send_done = time.perf_counter()
+
+    failures = [r for r in results if not r["sent"]]
+    for r in failures:
+        logging.error("Failed to send schedule to %s: %s", r["to_email"], r["error"])
+
+    report = {
+        "schedule_date": str(tomorrow),
+        "technicians": len(messages),
+        "appointments": sum(len(c["appointments"]) for c in contexts),
+        "sent": len(results) - len(failures),
+        "failed": len(failures),
+        "failures": failures,
+        "timings_ms": {
+            "query": round((query_done - started) * 1000, 1),
+            "render": round((render_done - query_done) * 1000, 1),
+            "send": round((send_done - render_done) * 1000, 1),
+            "total": round((send_done - started) * 1000, 1),
+        },
+    }
+    logging.info(
+        "Daily schedules for %s: %d sent, %d failed, %d appointments (query=%.0fms render=%.0fms send=%.0fms)",
+        tomorrow, report["sent"], report["failed"], report["appointments"],
+        report["timings_ms"]["query"], report["timings_ms"]["render"], report["timings_ms"]["send"],
+    )
+    return report
@@ -1,20 +1,77 @@
 import os
 import json
-import bcrypt
 import logging
+from datetime import datetime, timedelta
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
 from dotenv import load_dotenv
 
+from src.utils.user_cache import invalidate_user
+from src.utils.password_hashing import hash_password, needs_rehash, verify_password
+from src.utils.metrics import instrument_module
+from src.utils import query_log
+
 load_dotenv()
 
 
 def get_db_connection():
-    return psycopg2.connect(os.getenv("DATABASE_URL"))
+    return query_log.connect(os.getenv("DATABASE_URL"))
 
 
-def create_tables():
-    conn = get_db_connection()
+class _BorrowedConnection:
+    """A caller's connection lent to a helper.
+
+    The caller owns the transaction, so the helper's ``commit``,
+    ``rollback`` and ``close`` do nothing; an error inside the helper
+    leaves the transaction failed for the caller to roll back.
+    """
+    __slots__ = ("_conn",)
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def _connect(conn=None):
+    """Connection for a helper: ``conn`` (borrowed) if given, else a new one it owns.
+
+    Every public helper takes ``conn=None``; passing the request's
+    connection (see ``src.utils.unit_of_work``) runs the helper inside that
+    transaction instead of opening and committing its own.
+    """
+    if conn is None:
+        return get_db_connection()
+    return conn if isinstance(conn, _BorrowedConnection) else _BorrowedConnection(conn)
+
+
+def after_commit(conn, callback):
+    """Run ``callback`` once the transaction on ``conn`` has committed.
+
+    Call it after the helper's own ``conn.commit()``: on a connection the
+    helper owns that commit was real, so ``callback`` runs now; inside a
+    unit of work it waits for the request's commit and is dropped on
+    rollback.
+    """
+    pending = getattr(conn, "post_commit", None) if isinstance(conn, _BorrowedConnection) else None
+    if pending is None:
+        callback()
+    else:
+        pending.append(callback)
+
+
+def create_tables(conn=None):
+    conn = _connect(conn)
     cur = conn.cursor()
 
     cur.execute("""
@@ -82,6 +139,49 @@ def create_tables():
         )
     """)
 
+    # Ranged per-tech schedule lookups (get_active_tech_schedules)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_appointments_tech_start
+        ON appointments (technician_id, start_time)
+    """)
+
+    # One row per one-time backfill that has completed (see run_bootstrap_once)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_bootstraps (
+            name VARCHAR(100) PRIMARY KEY,
+            completed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # Provider event ids of the pushed tech/admin calendar copies. Bookings
+    # made before the columns existed were pushed but have no id; the
+    # "calendar_event_ids" marker records when ids started being kept so
+    # the backfill script can leave those bookings alone.
+    cur.execute("""
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'appointments' AND column_name = 'tech_calendar_event_id'
+    """)
+    if cur.fetchone() is None:
+        cur.execute("""
+            INSERT INTO schema_bootstraps (name) VALUES ('calendar_event_ids')
+            ON CONFLICT (name) DO NOTHING
+        """)
+    cur.execute("""
+        ALTER TABLE appointments
+        ADD COLUMN IF NOT EXISTS tech_calendar_event_id VARCHAR(255),
+        ADD COLUMN IF NOT EXISTS admin_calendar_event_id VARCHAR(255)
+    """)
+    # Backfill scans: appointments still missing an admin calendar event
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_appointments_admin_event_missing
+        ON appointments (id) WHERE admin_calendar_event_id IS NULL
+    """)
+    # Reminder dispatcher: scheduled appointments still waiting for a reminder
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_appointments_reminder_due
+        ON appointments (start_time) WHERE reminder_sent = FALSE AND status = 'scheduled'
+    """)
+
     cur.execute("""
         CREATE TABLE IF NOT EXISTS appointments_cache (
             id SERIAL PRIMARY KEY,
@@ -147,16 +247,34 @@ def create_tables():
 
     _ensure_schema_migration(cur)
 
+    from src.utils.stats import ensure_stats_schema, bootstrap_stats_rollups
+    from src.utils.analytics import ensure_analytics_schema, bootstrap_analytics
+    from src.utils.mail_outbox import ensure_outbox_schema
+    from src.utils.skills import ensure_skills_schema, bootstrap_technician_skills
+    from src.utils.calendar_sync import ensure_calendar_sync_schema
+    from src.utils.scheduler import ensure_scheduler_schema
+    from src.utils.job_queue import ensure_job_queue_schema
+    ensure_stats_schema(cur)
+    ensure_analytics_schema(cur)
+    ensure_outbox_schema(cur)
+    ensure_skills_schema(cur)
+    ensure_calendar_sync_schema(cur)
+    ensure_scheduler_schema(cur)
+    ensure_job_queue_schema(cur)
+
     conn.commit()
     cur.close()
     conn.close()
 
+    bootstrap_stats_rollups()
+    bootstrap_analytics()
+    bootstrap_technician_skills()
     _seed_admin_user()
 
 
-def save_admin_calendar_credentials(provider, email, creds_dict):
+def save_admin_calendar_credentials(provider, email, creds_dict, conn=None):
     import json
-    conn = get_db_connection()
+    conn = _connect(conn)
     cur = conn.cursor()
     try:
         cur.execute("""
@@ -175,8 +293,8 @@ def save_admin_calendar_credentials(provider, email, creds_dict):
         conn.close()
 
 
-def get_admin_calendar_credentials():
-    conn = get_db_connection()
+def get_admin_calendar_credentials(conn=None):
+    conn = _connect(conn)
     cur = conn.cursor(cursor_factory=RealDictCursor)
     try:
         cur.execute("SELECT * FROM admin_calendar_config WHERE id = 1")
@@ -187,8 +305,8 @@ def get_admin_calendar_credentials():
         conn.close()
 
 
-def disconnect_admin_calendar():
-    conn = get_db_connection()
+def disconnect_admin_calendar(conn=None):
+    conn = _connect(conn)
     cur = conn.cursor()
     try:
         cur.execute("""
@@ -228,6 +346,47 @@ def _ensure_schema_migration(cur):
                 pass
 
 
+def run_bootstrap_once(name, backfill):
+    """Run ``backfill(conn=conn)`` once per database and record it as ``name``.
+
+    Concurrent starters serialize on an advisory transaction lock; the
+    marker row is written in the same transaction as the backfill, so a
+    crash leaves neither and the next start runs it again. Returns True if
+    the backfill ran.
+    """
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (f"bootstrap:{name}",))
+        cur.execute("SELECT 1 FROM schema_bootstraps WHERE name = %s", (name,))
+        if cur.fetchone() is not None:
+            conn.commit()
+            return False
+        backfill(conn=conn)
+        cur.execute("INSERT INTO schema_bootstraps (name) VALUES (%s)", (name,))
+        conn.commit()
+        return True
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+
+def get_bootstrap_time(name, conn=None):
+    """When the one-time step ``name`` was recorded, or None."""
+    conn = _connect(conn)
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT completed_at FROM schema_bootstraps WHERE name = %s", (name,))
+        row = cur.fetchone()
+        return row[0] if row else None
+    finally:
+        cur.close()
+        conn.close()
+
+
 def _seed_admin_user():
     try:
         conn = get_db_connection()
@@ -244,7 +403,7 @@ def _seed_admin_user():
             cur.close()
             conn.close()
             return
-        hashed = bcrypt.hashpw(admin_password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+        hashed = hash_password(admin_password)
         cur.execute("""
             INSERT INTO users (username, email, password_hash, first_name, is_admin)
             VALUES (%s, %s, %s, %s, TRUE)
@@ -258,8 +417,9 @@ def _seed_admin_user():
         logging.error(f"Error seeding admin: {e}")
 
 
-def register_user(user_data):
-    conn = get_db_connection()
+def register_user(user_data, conn=None):
+    hashed = hash_password(user_data["password"])
+    conn = _connect(conn)
     cur = conn.cursor(cursor_factory=RealDictCursor)
     try:
         cur.execute("SELECT id FROM users WHERE email = %s", (user_data["email"],))
@@ -268,10 +428,6 @@ def register_user(user_data):
         cur.execute("SELECT id FROM users WHERE username = %s", (user_data["username"],))
         if cur.fetchone():
             raise ValueError("Username already taken")
-        hashed = bcrypt.hashpw(
-            user_data["password"].encode("utf-8"),
-            bcrypt.gensalt()
-        ).decode("utf-8")
         cur.execute("""
             INSERT INTO users (username, email, password_hash)
             VALUES (%s, %s, %s)
@@ -285,8 +441,8 @@ def register_user(user_data):
         conn.close()
 
 
-def login_user(user_data):
-    conn = get_db_connection()
+def login_user(user_data, conn=None):
+    conn = _connect(conn)
     cur = conn.cursor(cursor_factory=RealDictCursor)
     try:
         cur.execute("""
@@ -295,25 +451,48 @@ def login_user(user_data):
             FROM users WHERE email = %s
         """, (user_data["email"],))
         user = cur.fetchone()
-        if not user:
-            return None
-        if user.get("is_active") is False:
-            return "deactivated"
-        if not bcrypt.checkpw(
-            user_data["password"].encode("utf-8"),
-            user["password_hash"].encode("utf-8")
-        ):
-            return None
-        user = dict(user)
-        del user["password_hash"]
-        return user
     finally:
         cur.close()
         conn.close()
 
+    # The connection is released before the (slow) password check
+    if not user:
+        return None
+    if user.get("is_active") is False:
+        return "deactivated"
+    user = dict(user)
+    password_hash = user.pop("password_hash")
+    if not verify_password(user_data["password"], password_hash):
+        return None
+    if needs_rehash(password_hash):
+        _rehash_password(user["id"], user_data["password"], password_hash)
+    return user
+
+
+def _rehash_password(user_id, password, old_hash):
+    """Upgrade a stored hash to the current BCRYPT_ROUNDS after a
+    successful login. Best effort: a failure leaves the old hash valid."""
+    try:
+        new_hash = hash_password(password)
+        conn = get_db_connection()
+        cur = conn.cursor()
+        try:
+            # Skip if the password changed while we were hashing
+            cur.execute("""
+                UPDATE users SET password_hash = %s
+                WHERE id = %s AND password_hash = %s
+            """, (new_hash, user_id, old_hash))
+            conn.commit()
+        finally:
+            cur.close()
+            conn.close()
+        logging.info(f"[AUTH] Rehashed password for user {user_id}")
+    except Exception as e:
+        logging.error(f"[AUTH] Password rehash failed for user {user_id}: {e}")
 
-def get_user_by_id(user_id):
-    conn = get_db_connection()
+
+def get_user_by_id(user_id, conn=None):
+    conn = _connect(conn)
     cur = conn.cursor(cursor_factory=RealDictCursor)
     try:
         cur.execute("""
@@ -328,8 +507,8 @@ def get_user_by_id(user_id):
         conn.close()
 
 
-def get_all_users_paginated(page=1, page_size=20, search=None):
-    conn = get_db_connection()
+def get_all_users_paginated(page=1, page_size=20, search=None, conn=None):
+    conn = _connect(conn)
     cur = conn.cursor(cursor_factory=RealDictCursor)
     try:
         offset = (page - 1) * page_size
@@ -383,8 +562,9 @@ def get_all_users_paginated(page=1, page_size=20, search=None):
         conn.close()
 
 
-def create_user_by_admin(user_data, temp_password):
-    conn = get_db_connection()
+def create_user_by_admin(user_data, temp_password, conn=None):
+    hashed = hash_password(temp_password)
+    conn = _connect(conn)
     cur = conn.cursor(cursor_factory=RealDictCursor)
     try:
         cur.execute("SELECT id FROM users WHERE email = %s", (user_data["email"],))
@@ -402,10 +582,6 @@ def create_user_by_admin(user_data, temp_password):
             username = f"{base_username}_{suffix}"
             suffix += 1
 
-        hashed = bcrypt.hashpw(
-            temp_password.encode("utf-8"),
-            bcrypt.gensalt()
-        ).decode("utf-8")
         cur.execute("""
             INSERT INTO users (username, email, password_hash, first_name, last_name, phone)
             VALUES (%s, %s, %s, %s, %s, %s)
@@ -447,6 +623,13 @@ def create_user_by_admin(user_data, temp_password):
                 50
             ))
             tech_id = cur.fetchone()
+            if tech_id:
+                from src.utils.skills import sync_technician_skills
+                sync_technician_skills(cur, tech_id["id"], normalized)
+            if tech_id and user_data.get("home_address") and user_data.get("home_latitude") is None:
+                from src.utils.job_queue import enqueue
+                enqueue("technician.geocode_home",
+                        {"user_id": user["id"], "address": user_data["home_address"]}, cur=cur)
             logging.info(f"[USER CREATE] Created technician id={tech_id['id'] if tech_id else 'unknown'} for user {user['id']}")
 
         conn.commit()
@@ -456,14 +639,11 @@ def create_user_by_admin(user_data, temp_password):
         conn.close()
 
 
-def update_user_password(email, new_password):
-    conn = get_db_connection()
+def update_user_password(email, new_password, conn=None):
+    hashed = hash_password(new_password)
+    conn = _connect(conn)
     cur = conn.cursor()
     try:
-        hashed = bcrypt.hashpw(
-            new_password.encode("utf-8"),
-            bcrypt.gensalt()
-        ).decode("utf-8")
         cur.execute("""
             UPDATE users SET password_hash = %s WHERE email = %s
         """, (hashed, email))
@@ -474,8 +654,8 @@ def update_user_password(email, new_password):
         conn.close()
 
 
-def deactivate_user(user_id):
-    conn = get_db_connection()
+def deactivate_user(user_id, conn=None):
+    conn = _connect(conn)
     cur = conn.cursor()
     try:
         cur.execute("UPDATE users SET is_active = FALSE WHERE id = %s", (user_id,))
@@ -483,14 +663,15 @@ def deactivate_user(user_id):
             UPDATE technicians SET status = 'inactive' WHERE user_id = %s
         """, (user_id,))
         conn.commit()
+        after_commit(conn, lambda: invalidate_user(user_id))
         return cur.rowcount > 0
     finally:
         cur.close()
         conn.close()
 
 
-def activate_user(user_id):
-    conn = get_db_connection()
+def activate_user(user_id, conn=None):
+    conn = _connect(conn)
     cur = conn.cursor()
     try:
         cur.execute("UPDATE users SET is_active = TRUE WHERE id = %s", (user_id,))
@@ -498,14 +679,15 @@ def activate_user(user_id):
             UPDATE technicians SET status = 'active' WHERE user_id = %s
         """, (user_id,))
         conn.commit()
+        after_commit(conn, lambda: invalidate_user(user_id))
         return cur.rowcount > 0
     finally:
         cur.close()
         conn.close()
 
 
-def delete_user(user_id):
-    conn = get_db_connection()
+def delete_user(user_id, conn=None):
+    conn = _connect(conn)
     cur = conn.cursor()
     try:
         cur.execute("SELECT id FROM technicians WHERE user_id = %s", (user_id,))
@@ -521,6 +703,7 @@ def delete_user(user_id):
             cur.execute("DELETE FROM technicians WHERE id = %s", (tech_id,))
         cur.execute("DELETE FROM users WHERE id = %s", (user_id,))
         conn.commit()
+        after_commit(conn, lambda: invalidate_user(user_id))
         return True
     except Exception as e:
         conn.rollback()
@@ -531,8 +714,8 @@ def delete_user(user_id):
         conn.close()
 
 
-def get_user_detail_with_calendar(user_id):
-    conn = get_db_connection()
+def get_user_detail_with_calendar(user_id, conn=None):
+    conn = _connect(conn)
     cur = conn.cursor(cursor_factory=RealDictCursor)
     try:
         cur.execute("""
@@ -552,8 +735,8 @@ def get_user_detail_with_calendar(user_id):
         conn.close()
 
 
-def update_user(user_id, updates):
-    conn = get_db_connection()
+def update_user(user_id, updates, conn=None):
+    conn = _connect(conn)
     cur = conn.cursor(cursor_factory=RealDictCursor)
     try:
         user_fields = {}
@@ -569,31 +752,11 @@ def update_user(user_id, updates):
                 parts = [p.strip().lower() for p in s.split(",") if p.strip()]
                 normalized.extend(parts)
             tech_fields["skills"] = json.dumps(normalized)
+            skill_list = normalized
 
-        # Handle address update: geocode and store in technicians table
+        # Address update: store it now, geocode in the background
         if "address" in updates and updates["address"]:
             tech_fields["home_address"] = updates["address"]
-            try:
-                from src.utils.radar import geocode_address
-                geo = geocode_address(updates["address"])
-                if geo and geo.get("latitude") and geo.get("longitude"):
-                    tech_fields["home_latitude"] = geo["latitude"]
-                    tech_fields["home_longitude"] = geo["longitude"]
-                    # Use the formatted address from geocoder if available
-                    if geo.get("formatted_address"):
-                        tech_fields["home_address"] = geo["formatted_address"]
-                    logging.info(
-                        "[USER UPDATE] Geocoded address for user %s: %s -> (%s, %s)",
-                        user_id, updates["address"],
-                        tech_fields["home_latitude"], tech_fields["home_longitude"],
-                    )
-                else:
-                    logging.warning(
-                        "[USER UPDATE] Geocoding failed for user %s address: %s",
-                        user_id, updates["address"],
-                    )
-            except Exception as e:
-                logging.error("[USER UPDATE] Geocode error for user %s: %s", user_id, e)
 
         if user_fields:
             set_clause = ", ".join(f"{k} = %s" for k in user_fields)
@@ -602,6 +765,7 @@ def update_user(user_id, updates):
 
         # If tech fields were provided (skills or address), upsert the technician row
         if tech_fields:
+            tech_id = None
             cur.execute("SELECT id FROM technicians WHERE user_id = %s", (user_id,))
             tech = cur.fetchone()
             if tech:
@@ -622,6 +786,7 @@ def update_user(user_id, updates):
                     f"UPDATE technicians SET {', '.join(set_parts)} WHERE user_id = %s",
                     vals,
                 )
+                tech_id = tech["id"]
                 logging.info("[USER UPDATE] Updated tech fields for user %s: %s", user_id, list(tech_fields.keys()))
             else:
                 # No tech row exists - create one
@@ -638,6 +803,7 @@ def update_user(user_id, updates):
                         (user_id, name, email, phone, skills, home_address,
                          home_latitude, home_longitude, max_radius_miles, status)
                         VALUES (%s, %s, %s, %s, %s::jsonb, %s, %s, %s, %s, 'active')
+                        RETURNING id
                     """, (
                         user_id, name, user_row["email"], user_row.get("phone"),
                         tech_fields.get("skills", "[]"),
@@ -646,8 +812,17 @@ def update_user(user_id, updates):
                         tech_fields.get("home_longitude"),
                         50,
                     ))
+                    tech_id = cur.fetchone()["id"]
                     logging.info("[USER UPDATE] Created new tech row for user %s", user_id)
 
+            if tech_id is not None and "skills" in tech_fields:
+                from src.utils.skills import sync_technician_skills
+                sync_technician_skills(cur, tech_id, skill_list)
+
+            if tech_id is not None and "address" in updates and updates["address"]:
+                from src.utils.job_queue import enqueue
+                enqueue("technician.geocode_home", {"user_id": user_id, "address": updates["address"]}, cur=cur)
+
         # Sync name/phone changes to technicians table
         if user_fields and any(k in user_fields for k in ["first_name", "last_name", "phone"]):
             cur.execute("SELECT id FROM technicians WHERE user_id = %s", (user_id,))
@@ -671,14 +846,33 @@ def update_user(user_id, updates):
                     cur.execute(f"UPDATE technicians SET {set_clause} WHERE user_id = %s", values)
 
         conn.commit()
-        return get_user_detail_with_calendar(user_id)
+        after_commit(conn, lambda: invalidate_user(user_id))
+        return get_user_detail_with_calendar(user_id, conn=conn)
     finally:
         cur.close()
         conn.close()
 
 
-def save_calendar_credentials(tech_id, provider, email, credentials):
-    conn = get_db_connection()
+def set_technician_home_location(user_id, address, latitude, longitude, formatted_address=None,
+                                 conn=None):
+    """Store geocoded coordinates for ``address`` if it is still the tech's home address."""
+    conn = _connect(conn)
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            UPDATE technicians
+            SET home_latitude = %s, home_longitude = %s, home_address = COALESCE(%s, home_address)
+            WHERE user_id = %s AND home_address = %s
+        """, (latitude, longitude, formatted_address, user_id, address))
+        conn.commit()
+        return cur.rowcount > 0
+    finally:
+        cur.close()
+        conn.close()
+
+
+def save_calendar_credentials(tech_id, provider, email, credentials, conn=None):
+    conn = _connect(conn)
     cur = conn.cursor()
     try:
         cur.execute("""
@@ -696,8 +890,8 @@ def save_calendar_credentials(tech_id, provider, email, credentials):
         conn.close()
 
 
-def get_calendar_credentials(tech_id):
-    conn = get_db_connection()
+def get_calendar_credentials(tech_id, conn=None):
+    conn = _connect(conn)
     cur = conn.cursor(cursor_factory=RealDictCursor)
     try:
         cur.execute("""
@@ -711,8 +905,8 @@ def get_calendar_credentials(tech_id):
         conn.close()
 
 
-def disconnect_calendar(tech_id):
-    conn = get_db_connection()
+def disconnect_calendar(tech_id, conn=None):
+    conn = _connect(conn)
     cur = conn.cursor()
     try:
         cur.execute("""
@@ -730,8 +924,8 @@ def disconnect_calendar(tech_id):
         conn.close()
 
 
-def create_appointment(appointment_data):
-    conn = get_db_connection()
+def create_appointment(appointment_data, conn=None):
+    conn = _connect(conn)
     cur = conn.cursor(cursor_factory=RealDictCursor)
     try:
         cur.execute("""
@@ -767,8 +961,8 @@ def create_appointment(appointment_data):
 
 def get_appointments_paginated(page=1, page_size=20, technician_id=None,
                                 status_filter=None, date_from=None, date_to=None,
-                                search=None, time_filter=None):
-    conn = get_db_connection()
+                                search=None, time_filter=None, conn=None):
+    conn = _connect(conn)
     cur = conn.cursor(cursor_factory=RealDictCursor)
     try:
         offset = (page - 1) * page_size
@@ -827,8 +1021,57 @@ def get_appointments_paginated(page=1, page_size=20, technician_id=None,
         conn.close()
 
 
-def get_appointment_by_id(appointment_id):
-    conn = get_db_connection()
+def get_tech_schedules_between(window_start, window_end, conn=None):
+    """Active techs with an email plus their upcoming appointments in the
+    window, grouped per tech in a single query. Techs with no appointments
+    are included with an empty list."""
+    conn = _connect(conn)
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        cur.execute("""
+            SELECT
+                t.id, t.name, t.email,
+                a.id             AS appt_id,
+                a.start_time     AS appt_start_time,
+                a.end_time       AS appt_end_time,
+                a.service_type   AS appt_service_type,
+                a.customer_name  AS appt_customer_name,
+                a.customer_phone AS appt_customer_phone,
+                a.address        AS appt_address
+            FROM technicians t
+            LEFT JOIN appointments a
+                ON a.technician_id = t.id
+               AND a.start_time >= %s
+               AND a.start_time <= %s
+               AND a.start_time > NOW()
+            WHERE t.status = 'active'
+              AND t.email IS NOT NULL AND t.email <> ''
+            ORDER BY t.id, a.start_time
+        """, (window_start, window_end))
+        rows = cur.fetchall()
+
+        tech_map = {}
+        for row in rows:
+            tid = row["id"]
+            if tid not in tech_map:
+                tech_map[tid] = {
+                    "id": tid,
+                    "name": row["name"],
+                    "email": row["email"],
+                    "appointments": [],
+                }
+            if row["appt_id"] is not None:
+                tech_map[tid]["appointments"].append({
+                    k[len("appt_"):]: v for k, v in row.items() if k.startswith("appt_")
+                })
+        return list(tech_map.values())
+    finally:
+        cur.close()
+        conn.close()
+
+
+def get_appointment_by_id(appointment_id, conn=None):
+    conn = _connect(conn)
     cur = conn.cursor(cursor_factory=RealDictCursor)
     try:
         cur.execute("""
@@ -844,8 +1087,8 @@ def get_appointment_by_id(appointment_id):
         conn.close()
 
 
-def update_appointment_status(appointment_id, status):
-    conn = get_db_connection()
+def update_appointment_status(appointment_id, status, conn=None):
+    conn = _connect(conn)
     cur = conn.cursor()
     try:
         cur.execute("""
@@ -860,28 +1103,8 @@ def update_appointment_status(appointment_id, status):
         conn.close()
 
 
-def get_appointment_stats():
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    try:
-        cur.execute("""
-            SELECT
-                COUNT(*) as total,
-                COUNT(*) FILTER (WHERE status = 'scheduled') as scheduled,
-                COUNT(*) FILTER (WHERE status = 'completed') as completed,
-                COUNT(*) FILTER (WHERE status = 'cancelled') as cancelled,
-                COUNT(*) FILTER (WHERE status = 'no_show') as no_show,
-                COUNT(*) FILTER (WHERE start_time > NOW() AND status = 'scheduled') as upcoming
-            FROM appointments
-        """)
-        return dict(cur.fetchone())
-    finally:
-        cur.close()
-        conn.close()
-
-
-def get_pending_reminders(hours_before=2):
-    conn = get_db_connection()
+def get_pending_reminders(hours_before=2, conn=None):
+    conn = _connect(conn)
     cur = conn.cursor(cursor_factory=RealDictCursor)
     try:
         cur.execute("""
@@ -898,8 +1121,8 @@ def get_pending_reminders(hours_before=2):
         conn.close()
 
 
-def mark_reminder_sent(appointment_id):
-    conn = get_db_connection()
+def mark_reminder_sent(appointment_id, conn=None):
+    conn = _connect(conn)
     cur = conn.cursor()
     try:
         cur.execute("""
@@ -911,8 +1134,65 @@ def mark_reminder_sent(appointment_id):
         conn.close()
 
 
-def get_technician(tech_id):
-    conn = get_db_connection()
+def claim_due_reminders(hours_before=2, limit=200, timezone="America/New_York", conn=None):
+    """Atomically mark up to ``limit`` due reminders as sent and return them.
+
+    Same window as ``get_pending_reminders``, with appointment times read as
+    wall-clock time in ``timezone``. Rows locked by another dispatcher are
+    skipped, so concurrent dispatchers never claim the same appointment.
+    ``lag_seconds`` is how long after the intended send time (``hours_before``
+    ahead of the start, or the booking time if later) the claim happened.
+    """
+    conn = _connect(conn)
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        cur.execute("""
+            UPDATE appointments a SET reminder_sent = TRUE
+            WHERE a.id IN (
+                SELECT id FROM appointments
+                WHERE status = 'scheduled'
+                  AND reminder_sent = FALSE
+                  AND start_time BETWEEN (NOW() AT TIME ZONE %(tz)s)
+                      AND (NOW() AT TIME ZONE %(tz)s) + make_interval(hours => %(hours)s)
+                ORDER BY start_time
+                LIMIT %(limit)s
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING a.id, a.customer_name, a.customer_email, a.service_type, a.address,
+                      a.start_time,
+                      (SELECT name FROM technicians t WHERE t.id = a.technician_id) AS technician_name,
+                      EXTRACT(EPOCH FROM (NOW() AT TIME ZONE %(tz)s) - GREATEST(
+                          a.start_time - make_interval(hours => %(hours)s),
+                          a.created_at::timestamptz AT TIME ZONE %(tz)s
+                      ))::float AS lag_seconds
+        """, {"tz": timezone, "hours": hours_before, "limit": limit})
+        reminders = [dict(r) for r in cur.fetchall()]
+        conn.commit()
+        return reminders
+    finally:
+        cur.close()
+        conn.close()
+
+
+def release_reminders(appointment_ids, conn=None):
+    """Undo ``claim_due_reminders`` for reminders that could not be sent."""
+    if not appointment_ids:
+        return 0
+    conn = _connect(conn)
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            UPDATE appointments SET reminder_sent = FALSE WHERE id = ANY(%s)
+        """, (list(appointment_ids),))
+        conn.commit()
+        return cur.rowcount
+    finally:
+        cur.close()
+        conn.close()
+
+
+def get_technician(tech_id, conn=None):
+    conn = _connect(conn)
     cur = conn.cursor(cursor_factory=RealDictCursor)
     try:
         cur.execute("SELECT * FROM technicians WHERE id = %s", (tech_id,))
@@ -923,8 +1203,8 @@ def get_technician(tech_id):
         conn.close()
 
 
-def get_technician_by_user_id(user_id):
-    conn = get_db_connection()
+def get_technician_by_user_id(user_id, conn=None):
+    conn = _connect(conn)
     cur = conn.cursor(cursor_factory=RealDictCursor)
     try:
         cur.execute("SELECT * FROM technicians WHERE user_id = %s", (user_id,))
@@ -935,64 +1215,29 @@ def get_technician_by_user_id(user_id):
         conn.close()
 
 
-def get_techs_with_skill(service_type):
-    """Find technicians with a matching skill. Uses fuzzy matching to handle
-    variations like 'chimney', 'chimney cleaning', 'Chimney Cleaning', etc."""
-    import logging
-
-    # Normalize service type to lowercase keyword
-    service_lower = service_type.lower().strip()
-
-    # Map common variations to canonical service keywords
-    service_keywords = {
-        "chimney": ["chimney"],
-        "chimney cleaning": ["chimney"],
-        "dryer_vent": ["dryer", "vent"],
-        "dryer vent": ["dryer", "vent"],
-        "dryer vent cleaning": ["dryer", "vent"],
-        "gutter": ["gutter"],
-        "gutter cleaning": ["gutter"],
-        "power_washing": ["power", "wash", "pressure"],
-        "power washing": ["power", "wash", "pressure"],
-        "pressure washing": ["power", "wash", "pressure"],
-        "air_duct": ["duct", "air"],
-        "air duct": ["duct", "air"],
-        "air duct cleaning": ["duct", "air"],
-        "duct cleaning": ["duct", "air"],
-    }
+def get_techs_with_skill(service_type, conn=None):
+    """Find active technicians with a matching skill. The service type is
+    resolved through the skill taxonomy, so variations like 'chimney',
+    'chimney cleaning' and 'Chimney Cleaning' all match."""
+    from src.utils.skills import resolve_service_id
 
-    # Get the keywords to match against
-    match_keywords = service_keywords.get(service_lower, [service_lower.split()[0] if service_lower else service_lower])
+    service_id = resolve_service_id(service_type)
 
-    conn = get_db_connection()
+    conn = _connect(conn)
     cur = conn.cursor(cursor_factory=RealDictCursor)
     try:
-        # First try: exact JSONB match
-        cur.execute("""
-            SELECT * FROM technicians
-            WHERE status = 'active'
-            AND skills @> %s::jsonb
-        """, (f'["{service_type}"]',))
-        results = [dict(tech) for tech in cur.fetchall()]
-
-        if results:
-            logging.info(f"[SKILL MATCH] Exact match for '{service_type}': found {len(results)} techs: {[t['name'] for t in results]}")
-            return results
-
-        # Second try: case-insensitive text search in skills array
-        keyword_conditions = " OR ".join(["skills::text ILIKE %s" for _ in match_keywords])
-        keyword_params = [f'%{kw}%' for kw in match_keywords]
-
-        cur.execute(f"""
-            SELECT * FROM technicians
-            WHERE status = 'active'
-            AND ({keyword_conditions})
-        """, keyword_params)
-        results = [dict(tech) for tech in cur.fetchall()]
+        if service_id is not None:
+            cur.execute("""
+                SELECT t.* FROM technician_skills ts
+                JOIN technicians t ON t.id = ts.technician_id
+                WHERE ts.service_id = %s
+                AND t.status = 'active'
+            """, (service_id,))
+            results = [dict(tech) for tech in cur.fetchall()]
 
-        if results:
-            logging.info(f"[SKILL MATCH] Fuzzy match for '{service_type}' (keywords: {match_keywords}): found {len(results)} techs: {[t['name'] for t in results]}")
-            return results
+            if results:
+                logging.info(f"[SKILL MATCH] Match for '{service_type}': found {len(results)} techs: {[t['name'] for t in results]}")
+                return results
 
         # Fallback: return ALL active techs (better to suggest someone than no one)
         logging.warning(f"[SKILL MATCH] No skill match for '{service_type}'. Falling back to ALL active techs.")
@@ -1005,67 +1250,61 @@ def get_techs_with_skill(service_type):
         conn.close()
 
 
-
-def get_techs_with_appointments_for_day(service_type, date):
-    service_lower = service_type.lower().strip()
-
-    service_keywords = {
-        "chimney": ["chimney"],
-        "chimney cleaning": ["chimney"],
-        "dryer_vent": ["dryer", "vent"],
-        "dryer vent": ["dryer", "vent"],
-        "dryer vent cleaning": ["dryer", "vent"],
-        "gutter": ["gutter"],
-        "gutter cleaning": ["gutter"],
-        "power_washing": ["power", "wash", "pressure"],
-        "power washing": ["power", "wash", "pressure"],
-        "pressure washing": ["power", "wash", "pressure"],
-        "air_duct": ["duct", "air"],
-        "air duct": ["duct", "air"],
-        "air duct cleaning": ["duct", "air"],
-        "duct cleaning": ["duct", "air"],
-    }
-
-    match_keywords = service_keywords.get(
-        service_lower,
-        [service_lower.split()[0] if service_lower else service_lower],
-    )
-
-    conn = get_db_connection()
+def _group_tech_rows(rows):
+    """Fold technician x appointment join rows into {tech_id: tech} with an
+    ``appointments`` list per tech, preserving row order."""
+    tech_map = {}
+    for row in rows:
+        row = dict(row)
+        tid = row["id"]
+        if tid not in tech_map:
+            tech_map[tid] = {k: v for k, v in row.items() if not k.startswith("appt_")}
+            tech_map[tid]["appointments"] = []
+        if row["appt_id"] is not None:
+            tech_map[tid]["appointments"].append({
+                "start_time": row["appt_start_time"],
+                "end_time": row["appt_end_time"],
+                "latitude": row["appt_latitude"],
+                "longitude": row["appt_longitude"],
+            })
+    return tech_map
+
+
+def get_techs_with_appointments_for_day(service_type, date, conn=None):
+    from src.utils.skills import resolve_service_id
+
+    service_id = resolve_service_id(service_type)
+
+    conn = _connect(conn)
     cur = conn.cursor(cursor_factory=RealDictCursor)
     try:
-        keyword_conditions = " OR ".join(
-            ["t.skills::text ILIKE %s" for _ in match_keywords]
-        )
-        keyword_params = [f"%{kw}%" for kw in match_keywords]
-
-        cur.execute(
-            f"""
-            SELECT
-                t.id, t.name, t.email, t.phone, t.skills,
-                t.home_address, t.home_latitude, t.home_longitude,
-                t.max_radius_miles, t.status,
-                t.calendar_provider, t.calendar_email, t.calendar_connected,
-                a.id          AS appt_id,
-                a.start_time  AS appt_start_time,
-                a.end_time    AS appt_end_time,
-                a.latitude    AS appt_latitude,
-                a.longitude   AS appt_longitude
-            FROM technicians t
-            LEFT JOIN appointments a
-                ON a.technician_id = t.id
-               AND DATE(a.start_time) = %s
-               AND a.status = 'scheduled'
-            WHERE t.status = 'active'
-              AND (
-                  t.skills @> %s::jsonb
-                  OR ({keyword_conditions})
-              )
-            ORDER BY t.id, a.start_time
-            """,
-            [date, f'["{service_type}"]'] + keyword_params,
-        )
-        rows = cur.fetchall()
+        rows = []
+        if service_id is not None:
+            cur.execute(
+                """
+                SELECT
+                    t.id, t.name, t.email, t.phone, t.skills,
+                    t.home_address, t.home_latitude, t.home_longitude,
+                    t.max_radius_miles, t.status,
+                    t.calendar_provider, t.calendar_email, t.calendar_connected,
+                    a.id          AS appt_id,
+                    a.start_time  AS appt_start_time,
+                    a.end_time    AS appt_end_time,
+                    a.latitude    AS appt_latitude,
+                    a.longitude   AS appt_longitude
+                FROM technician_skills ts
+                JOIN technicians t ON t.id = ts.technician_id
+                LEFT JOIN appointments a
+                    ON a.technician_id = t.id
+                   AND DATE(a.start_time) = %s
+                   AND a.status = 'scheduled'
+                WHERE ts.service_id = %s
+                  AND t.status = 'active'
+                ORDER BY t.id, a.start_time
+                """,
+                (date, service_id),
+            )
+            rows = cur.fetchall()
 
         if not rows:
             logging.warning(
@@ -1096,20 +1335,7 @@ def get_techs_with_appointments_for_day(service_type, date):
             )
             rows = cur.fetchall()
 
-        tech_map = {}
-        for row in rows:
-            row = dict(row)
-            tid = row["id"]
-            if tid not in tech_map:
-                tech_map[tid] = {k: v for k, v in row.items() if not k.startswith("appt_")}
-                tech_map[tid]["appointments"] = []
-            if row["appt_id"] is not None:
-                tech_map[tid]["appointments"].append({
-                    "start_time": row["appt_start_time"],
-                    "end_time": row["appt_end_time"],
-                    "latitude": row["appt_latitude"],
-                    "longitude": row["appt_longitude"],
-                })
+        tech_map = _group_tech_rows(rows)
 
         logging.info(
             "[SKILL MATCH] Single-query found %d techs for '%s'", len(tech_map), service_type
@@ -1120,8 +1346,45 @@ def get_techs_with_appointments_for_day(service_type, date):
         conn.close()
 
 
-def get_tech_appointments_for_day(tech_id, date):
-    conn = get_db_connection()
+def get_active_tech_schedules(start, end, conn=None):
+    """Active technicians with their non-cancelled, geocoded appointments on
+    every calendar day from ``start`` through ``end``, in one ranged query.
+
+    Appointments without coordinates cannot place a tech, so they are left
+    out and the tech stays at the previous site (or home).
+    """
+    range_start = datetime.combine(start.date(), datetime.min.time())
+    range_end = datetime.combine(end.date() + timedelta(days=1), datetime.min.time())
+    conn = _connect(conn)
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        cur.execute("""
+            SELECT
+                t.id, t.name, t.home_latitude, t.home_longitude,
+                a.id          AS appt_id,
+                a.start_time  AS appt_start_time,
+                a.end_time    AS appt_end_time,
+                a.latitude    AS appt_latitude,
+                a.longitude   AS appt_longitude
+            FROM technicians t
+            LEFT JOIN appointments a
+                ON a.technician_id = t.id
+               AND a.start_time >= %s
+               AND a.start_time < %s
+               AND a.status <> 'cancelled'
+               AND a.latitude IS NOT NULL
+               AND a.longitude IS NOT NULL
+            WHERE t.status = 'active'
+            ORDER BY t.id, a.start_time
+        """, (range_start, range_end))
+        return list(_group_tech_rows(cur.fetchall()).values())
+    finally:
+        cur.close()
+        conn.close()
+
+
+def get_tech_appointments_for_day(tech_id, date, conn=None):
+    conn = _connect(conn)
     cur = conn.cursor(cursor_factory=RealDictCursor)
     try:
         cur.execute("""
@@ -1136,13 +1399,83 @@ def get_tech_appointments_for_day(tech_id, date):
         conn.close()
 
 
+CALENDAR_EVENT_COLUMNS = {
+    "tech": "tech_calendar_event_id",
+    "admin": "admin_calendar_event_id",
+}
+
+
+def set_calendar_event_ids(target, event_ids, conn=None):
+    """Record provider event ids; ``event_ids`` is ``[(appointment_id, event_id), ...]``."""
+    column = CALENDAR_EVENT_COLUMNS[target]
+    if not event_ids:
+        return 0
+    conn = _connect(conn)
+    cur = conn.cursor()
+    try:
+        execute_values(cur, f"""
+            UPDATE appointments AS a SET {column} = v.event_id
+            FROM (VALUES %s) AS v(id, event_id)
+            WHERE a.id = v.id
+        """, event_ids)
+        conn.commit()
+        return cur.rowcount
+    finally:
+        cur.close()
+        conn.close()
+
+
+def get_appointments_missing_calendar_event(target, after_id=0, limit=500, technician_id=None,
+                                            since=None, booked_since=None, conn=None):
+    """Non-cancelled appointments with no ``target`` calendar event, by id after ``after_id``.
+
+    ``since`` filters on start time, ``booked_since`` on when the
+    appointment was created. Appointments with a push job still pending or
+    running are left to that job.
+    """
+    column = CALENDAR_EVENT_COLUMNS[target]
+    conn = _connect(conn)
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        query = f"""
+            SELECT a.*, t.name AS technician_name
+            FROM appointments a
+            LEFT JOIN technicians t ON t.id = a.technician_id
+            WHERE a.{column} IS NULL AND a.id > %s
+              AND COALESCE(a.status, '') <> 'cancelled'
+              AND NOT EXISTS (
+                  SELECT 1 FROM jobs j
+                  WHERE j.task = 'calendar.push_appointment'
+                    AND j.status IN ('pending', 'running')
+                    AND j.payload->>'appointment_id' = a.id::text
+              )
+        """
+        params = [after_id]
+        if technician_id is not None:
+            query += " AND a.technician_id = %s"
+            params.append(technician_id)
+        if since is not None:
+            query += " AND a.start_time >= %s"
+            params.append(since)
+        if booked_since is not None:
+            query += " AND a.created_at >= %s"
+            params.append(booked_since)
+        query += " ORDER BY a.id LIMIT %s"
+        params.append(limit)
+        cur.execute(query, params)
+        return [dict(r) for r in cur.fetchall()]
+    finally:
+        cur.close()
+        conn.close()
+
+
 def insert_appointment(calendar_event_id, technician_id, customer_name,
                        customer_phone, customer_email, service_type, address,
                        latitude, longitude, start_time, end_time,
                        duration_minutes, status, quoted_price=None,
-                       discount_applied=None, notes=None):
+                       discount_applied=None, notes=None, conn=None):
     """Insert a new appointment into the MAIN appointments table."""
-    conn = get_db_connection()
+    conn = _connect(conn)
     cur = conn.cursor()
     try:
         cur.execute("""
@@ -1172,8 +1505,8 @@ def insert_appointment(calendar_event_id, technician_id, customer_name,
 
 def insert_appointment_cache(ghl_appointment_id, technician_id, customer_name,
                             customer_phone, service_type, address, latitude,
-                            longitude, start_time, end_time, status):
-    conn = get_db_connection()
+                            longitude, start_time, end_time, status, conn=None):
+    conn = _connect(conn)
     cur = conn.cursor()
     try:
         cur.execute("""
@@ -1200,8 +1533,8 @@ def insert_appointment_cache(ghl_appointment_id, technician_id, customer_name,
         conn.close()
 
 
-def delete_appointment_cache(ghl_appointment_id):
-    conn = get_db_connection()
+def delete_appointment_cache(ghl_appointment_id, conn=None):
+    conn = _connect(conn)
     cur = conn.cursor()
     try:
         cur.execute("DELETE FROM appointments_cache WHERE ghl_appointment_id = %s",
@@ -1212,8 +1545,8 @@ def delete_appointment_cache(ghl_appointment_id):
         conn.close()
 
 
-def delete_route_cache(tech_id, date):
-    conn = get_db_connection()
+def delete_route_cache(tech_id, date, conn=None):
+    conn = _connect(conn)
     cur = conn.cursor()
     try:
         cur.execute("""
@@ -1227,8 +1560,8 @@ def delete_route_cache(tech_id, date):
 
 
 def insert_technician(name, email, phone, skills, home_latitude, home_longitude,
-                     ghl_user_id=None, ghl_calendar_id=None, user_id=None):
-    conn = get_db_connection()
+                     ghl_user_id=None, ghl_calendar_id=None, user_id=None, conn=None):
+    conn = _connect(conn)
     cur = conn.cursor(cursor_factory=RealDictCursor)
     try:
         cur.execute("""
@@ -1247,8 +1580,8 @@ def insert_technician(name, email, phone, skills, home_latitude, home_longitude,
         conn.close()
 
 
-def get_all_technicians():
-    conn = get_db_connection()
+def get_all_technicians(conn=None):
+    conn = _connect(conn)
     cur = conn.cursor(cursor_factory=RealDictCursor)
     try:
         cur.execute("SELECT * FROM technicians WHERE status = 'active'")
@@ -1258,8 +1591,8 @@ def get_all_technicians():
         conn.close()
 
 
-def get_technician_by_ghl_user_id(ghl_user_id):
-    conn = get_db_connection()
+def get_technician_by_ghl_user_id(ghl_user_id, conn=None):
+    conn = _connect(conn)
     cur = conn.cursor(cursor_factory=RealDictCursor)
     try:
         cur.execute("SELECT * FROM technicians WHERE ghl_user_id = %s", (ghl_user_id,))
@@ -1271,8 +1604,8 @@ def get_technician_by_ghl_user_id(ghl_user_id):
 
 
 def upsert_technician_from_ghl(ghl_user_id, ghl_calendar_id, name, email, phone,
-                               skills=None, home_latitude=None, home_longitude=None):
-    conn = get_db_connection()
+                               skills=None, home_latitude=None, home_longitude=None, conn=None):
+    conn = _connect(conn)
     cur = conn.cursor(cursor_factory=RealDictCursor)
     try:
         cur.execute("""
@@ -1297,8 +1630,8 @@ def upsert_technician_from_ghl(ghl_user_id, ghl_calendar_id, name, email, phone,
         conn.close()
 
 
-def upsert_call_log(call_data):
-    conn = get_db_connection()
+def upsert_call_log(call_data, conn=None):
+    conn = _connect(conn)
     cur = conn.cursor(cursor_factory=RealDictCursor)
     try:
         duration = None
@@ -1351,8 +1684,8 @@ def upsert_call_log(call_data):
 
 def get_call_logs_paginated(page=1, page_size=20, direction=None,
                              call_status=None, date_from=None, date_to=None,
-                             search=None):
-    conn = get_db_connection()
+                             search=None, conn=None):
+    conn = _connect(conn)
     cur = conn.cursor(cursor_factory=RealDictCursor)
     try:
         offset = (page - 1) * page_size
@@ -1402,8 +1735,8 @@ def get_call_logs_paginated(page=1, page_size=20, direction=None,
         conn.close()
 
 
-def get_call_log_by_call_id(call_id):
-    conn = get_db_connection()
+def get_call_log_by_call_id(call_id, conn=None):
+    conn = _connect(conn)
     cur = conn.cursor(cursor_factory=RealDictCursor)
     try:
         cur.execute("SELECT * FROM call_logs WHERE call_id = %s", (call_id,))
@@ -1414,26 +1747,5 @@ def get_call_log_by_call_id(call_id):
         conn.close()
 
 
-def get_call_stats():
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    try:
-        cur.execute("""
-            SELECT
-                COUNT(*) as total_calls,
-                COUNT(*) FILTER (WHERE direction = 'inbound') as inbound,
-                COUNT(*) FILTER (WHERE direction = 'outbound') as outbound,
-                COUNT(*) FILTER (WHERE disconnection_reason = 'user_hangup') as user_hangup,
-                COUNT(*) FILTER (WHERE disconnection_reason = 'agent_hangup') as agent_hangup,
-                COUNT(*) FILTER (WHERE disconnection_reason LIKE 'dial_%') as failed,
-                COALESCE(AVG(duration_seconds) FILTER (WHERE duration_seconds > 0), 0) as avg_duration_seconds,
-                COUNT(*) FILTER (WHERE created_at >= CURRENT_DATE) as today,
-                COUNT(*) FILTER (WHERE created_at >= CURRENT_DATE - INTERVAL '7 days') as last_7_days
-            FROM call_logs
-        """)
-        stats = cur.fetchone()
-        return dict(stats) if stats else {}
-    finally:
-        cur.close()
-        conn.close()
-
+# Per-helper latency/error metrics; must stay at the bottom of the module
+instrument_module(globals(), "db_helper_duration_seconds", "helper")
@@ -1,8 +1,10 @@
 """Distance and location estimation utilities."""
 import math
+from bisect import bisect_right
+from collections import defaultdict
 from datetime import datetime
 
-from src.utils.db import get_technician, get_tech_appointments_for_day
+from src.utils.db import get_active_tech_schedules, get_technician, get_tech_appointments_for_day
 
 # Earth radius in miles
 EARTH_RADIUS_MILES = 3959
@@ -56,22 +58,26 @@ def estimate_tech_location(tech_id, target_datetime):
     if not tech.get("home_latitude") or not tech.get("home_longitude"):
         return None
 
-    target_date = target_datetime.date()
-    appointments = get_tech_appointments_for_day(tech_id, target_date)
+    appointments = get_tech_appointments_for_day(tech_id, target_datetime.date())
+    return locate_in_schedule(
+        appointments, target_datetime,
+        float(tech["home_latitude"]), float(tech["home_longitude"]),
+    )
+
 
+def locate_in_schedule(appointments, target_datetime, home_lat, home_lon):
+    """Position at ``target_datetime`` given a day's appointments in start order.
+
+    Before the first job the tech is at home; during a job they are at its
+    site; between and after jobs they are at the last site they visited.
+    """
     if not appointments:
-        return {
-            "latitude": float(tech["home_latitude"]),
-            "longitude": float(tech["home_longitude"]),
-        }
+        return {"latitude": home_lat, "longitude": home_lon}
 
     for i, appt in enumerate(appointments):
         if target_datetime < appt["start_time"]:
             if i == 0:
-                return {
-                    "latitude": float(tech["home_latitude"]),
-                    "longitude": float(tech["home_longitude"]),
-                }
+                return {"latitude": home_lat, "longitude": home_lon}
             prev_appt = appointments[i - 1]
             return {
                 "latitude": float(prev_appt["latitude"]),
@@ -89,3 +95,58 @@ def estimate_tech_location(tech_id, target_datetime):
         "latitude": float(last_appt["latitude"]),
         "longitude": float(last_appt["longitude"]),
     }
+
+
+def _day_index(appointments):
+    """{date: (start_times, appointments)} for bisecting within a day."""
+    days = defaultdict(lambda: ([], []))
+    for appt in appointments:
+        starts, appts = days[appt["start_time"].date()]
+        starts.append(appt["start_time"])
+        appts.append(appt)
+    return days
+
+
+def _locate_indexed(days, target_datetime, home_lat, home_lon):
+    """Same answer as ``locate_in_schedule``: the last job that has started
+    by ``target_datetime`` that day, or home if none has."""
+    entry = days.get(target_datetime.date())
+    i = bisect_right(entry[0], target_datetime) if entry else 0
+    if i == 0:
+        return home_lat, home_lon, "home"
+    appt = entry[1][i - 1]
+    state = "on_job" if target_datetime <= appt["end_time"] else "last_job_site"
+    return float(appt["latitude"]), float(appt["longitude"]), state
+
+
+def estimate_tech_locations(times):
+    """Estimate every active technician's position at each of ``times``.
+
+    Loads all schedules in one ranged query, then answers each
+    (tech, time) pair with a binary search over that day's start times.
+    Technicians without home coordinates are skipped, as in
+    ``estimate_tech_location``.
+
+    Args:
+        times: Sorted list of naive datetimes (Eastern, like the DB).
+
+    Returns:
+        List of dicts with 'id', 'name' and 'positions' -- one
+        (latitude, longitude, state) tuple per time, where state is
+        'home', 'on_job' or 'last_job_site'.
+    """
+    if not times:
+        return []
+    results = []
+    for tech in get_active_tech_schedules(times[0], times[-1]):
+        if not tech.get("home_latitude") or not tech.get("home_longitude"):
+            continue
+        home_lat = float(tech["home_latitude"])
+        home_lon = float(tech["home_longitude"])
+        days = _day_index(tech["appointments"])
+        results.append({
+            "id": tech["id"],
+            "name": tech["name"],
+            "positions": [_locate_indexed(days, t, home_lat, home_lon) for t in times],
+        })
+    return results
@@ -0,0 +1,164 @@
+"""Precompiled, auto-escaping email templates.
+
+Every template under ``src/templates/email`` is compiled once by
+``load_templates()`` (called at startup, or lazily on first render).
+Rendering returns the subject, the HTML body and a plain-text alternative
+derived from the HTML, so callers never hand-build markup and user values
+are always escaped.
+"""
+import os
+import re
+import threading
+from collections import namedtuple
+from html.parser import HTMLParser
+
+from jinja2 import Environment, FileSystemLoader, StrictUndefined, select_autoescape
+
+TEMPLATE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "templates", "email"
+)
+
+RenderedEmail = namedtuple("RenderedEmail", ["subject", "html", "text"])
+
+# name -> (template file, subject template, layout defaults)
+EMAIL_TEMPLATES = {
+    "welcome": ("welcome.html", "Welcome to United Home Services", {}),
+    "password_reset": ("password_reset.html", "Password Reset - United Home Services", {}),
+    "booking_confirmation": (
+        "booking_confirmation.html", "Appointment Confirmed - {{ service_type }}", {}
+    ),
+    "technician_booking": (
+        "technician_booking.html", "New Appointment - {{ service_type }}", {}
+    ),
+    "admin_booking": (
+        "admin_booking.html", "New Booking - {{ customer_name }} - {{ service_type }}", {}
+    ),
+    "appointment_reminder": (
+        "appointment_reminder.html", "Appointment Reminder - {{ service_type }}", {}
+    ),
+    "cancellation": ("cancellation.html", "Appointment Cancelled - {{ service_type }}", {}),
+    "daily_schedule": (
+        "daily_schedule.html",
+        "Your Schedule for {{ schedule_date }} - United Home Services",
+        {"max_width": 650},
+    ),
+}
+
+_html_env = Environment(
+    loader=FileSystemLoader(TEMPLATE_DIR),
+    autoescape=select_autoescape(["html"]),
+    undefined=StrictUndefined,
+    auto_reload=False,
+    trim_blocks=True,
+    lstrip_blocks=True,
+)
+# Subjects are header text, not markup: no escaping
+_subject_env = Environment(autoescape=False, undefined=StrictUndefined)
+
+_compiled = {}
+_compile_lock = threading.Lock()
+
+
+def load_templates():
+    """Compile every registered template. Safe to call more than once."""
+    compiled = {}
+    for name, (filename, subject, defaults) in EMAIL_TEMPLATES.items():
+        compiled[name] = (
+            _html_env.get_template(filename),
+            _subject_env.from_string(subject),
+            defaults,
+        )
+    with _compile_lock:
+        _compiled.clear()
+        _compiled.update(compiled)
+    return len(compiled)
+
+
+def _get(name):
+    entry = _compiled.get(name)
+    if entry is None:
+        load_templates()
+        entry = _compiled[name]
+    return entry
+
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class _TextExtractor(HTMLParser):
+    """Turn the simple markup used by our emails into readable plain text."""
+
+    _BLOCK_TAGS = {"p", "div", "h1", "h2", "h3", "h4", "tr", "table", "thead", "tbody", "li"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self._href = None
+        self._cells = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self._BLOCK_TAGS:
+            self.parts.append("\n")
+            if tag == "tr":
+                self._cells = 0
+        elif tag == "br":
+            # Keep a table row on one line
+            self.parts.append(" " if self._cells else "\n")
+        elif tag in ("td", "th"):
+            if self._cells:
+                self.parts.append(" | ")
+            self._cells += 1
+        elif tag == "a":
+            self._href = dict(attrs).get("href")
+
+    def handle_endtag(self, tag):
+        if tag in self._BLOCK_TAGS:
+            self.parts.append("\n")
+            if tag == "tr":
+                self._cells = 0
+        elif tag == "a" and self._href:
+            self.parts.append(f" ({self._href})")
+            self._href = None
+
+    def handle_data(self, data):
+        # Source whitespace is insignificant in HTML; line breaks come from tags
+        self.parts.append(_WHITESPACE.sub(" ", data))
+
+
+_SPACES = re.compile(r"[ \t\r\f\v]+")
+_BLANK_LINES = re.compile(r"\n\s*\n+")
+
+
+def html_to_text(html):
+    extractor = _TextExtractor()
+    extractor.feed(html)
+    extractor.close()
+    text = _SPACES.sub(" ", "".join(extractor.parts))
+    text = "\n".join(line.strip() for line in text.split("\n"))
+    return _BLANK_LINES.sub("\n\n", text).strip() + "\n"
+
+
+def render_email(name, **context):
+    html_template, subject_template, defaults = _get(name)
+    if defaults:
+        context = {**defaults, **context}
+    html = html_template.render(context)
+    return RenderedEmail(
+        subject=subject_template.render(context).strip(),
+        html=html,
+        text=html_to_text(html),
+    )
+
+
+def render_batch(name, contexts):
+    """Render one template for many recipients."""
+    html_template, subject_template, defaults = _get(name)
+    render_html = html_template.render
+    render_subject = subject_template.render
+    out = []
+    for context in contexts:
+        if defaults:
+            context = {**defaults, **context}
+        html = render_html(context)
+        out.append(RenderedEmail(render_subject(context).strip(), html, html_to_text(html)))
+    return out
@@ -0,0 +1,487 @@
+"""Durable background job queue on Postgres.
+
+Request handlers call ``enqueue(task, payload)`` (one INSERT, optionally on
+the caller's cursor so the job commits with the caller's writes) and
+return. Workers claim due jobs with ``FOR UPDATE SKIP LOCKED``, so any
+number of threads and processes can drain a queue without double-running
+a job; throughput scales with ``JOB_QUEUE_CONCURRENCY`` or by running
+``scripts/run_job_worker.py`` next to the app.
+
+- Tasks are registered with ``@task(name, queue=...)``; the payload is
+  JSON and is passed to the handler as a dict.
+- Jobs run highest ``priority`` first, then oldest ``run_at``; ``run_at``
+  / ``delay_seconds`` schedule a job for later.
+- A failing job is retried with exponential backoff
+  (``JOB_RETRY_BASE_SECONDS`` doubling, capped at
+  ``JOB_RETRY_MAX_SECONDS``) until ``max_attempts``, then dead-lettered
+  (status ``dead``) for an admin to inspect and retry. Raising
+  ``PermanentJobError`` dead-letters straight away.
+- ``JOB_QUEUE_CONCURRENCY`` sets worker threads per queue in each process
+  (``"calendar=8,geocode=2"``); ``JOB_QUEUE_LIMITS`` caps running jobs per
+  queue across all processes (``"geocode=2"``).
+- A job left ``running`` by a worker that died is reclaimed after
+  ``JOB_STALE_SECONDS``.
+"""
+import os
+import json
+import random
+import socket
+import logging
+import importlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from psycopg2.extras import RealDictCursor
+
+from src.utils import metrics
+from src.utils.db import get_db_connection
+
+JOB_DEFAULT_CONCURRENCY = int(os.getenv("JOB_DEFAULT_CONCURRENCY", "4"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "8"))
+JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "15"))
+JOB_RETRY_MAX_SECONDS = float(os.getenv("JOB_RETRY_MAX_SECONDS", "3600"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1"))
+JOB_STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", "900"))
+JOB_RETENTION_DAYS = int(os.getenv("JOB_RETENTION_DAYS", "7"))
+# false: the API process only enqueues; scripts/run_job_worker.py does the work
+JOB_WORKERS_ENABLED = os.getenv("JOB_WORKERS_ENABLED", "true").lower() != "false"
+
+# Modules that register tasks; imported before workers start so a
+# standalone worker process knows every handler
+TASK_MODULES = (
+    "src.services.calendar_dispatch",
+    "src.utils.radar",
+    "src.api.retell_webhooks",
+)
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _parse_queue_settings(value):
+    settings = {}
+    for item in (value or "").split(","):
+        if "=" in item:
+            name, number = item.split("=", 1)
+            settings[name.strip()] = int(number)
+    return settings
+
+
+JOB_QUEUE_CONCURRENCY = _parse_queue_settings(os.getenv("JOB_QUEUE_CONCURRENCY", "calendar=8,geocode=2"))
+JOB_QUEUE_LIMITS = _parse_queue_settings(os.getenv("JOB_QUEUE_LIMITS", ""))
+
+
+class PermanentJobError(Exception):
+    """Raised by a handler when retrying cannot help; the job is dead-lettered."""
+
+
+def ensure_job_queue_schema(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            id BIGSERIAL PRIMARY KEY,
+            queue VARCHAR(50) NOT NULL,
+            task VARCHAR(100) NOT NULL,
+            payload JSONB NOT NULL DEFAULT '{}'::jsonb,
+            priority INTEGER NOT NULL DEFAULT 0,
+            status VARCHAR(20) NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL,
+            run_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            locked_by VARCHAR(255),
+            locked_at TIMESTAMP,
+            last_error TEXT,
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_jobs_due
+        ON jobs (queue, priority DESC, run_at) WHERE status = 'pending'
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_jobs_running
+        ON jobs (queue, locked_at) WHERE status = 'running'
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_jobs_finished
+        ON jobs (finished_at) WHERE status = 'done'
+    """)
+
+
+# task name -> (handler, queue, max_attempts)
+_tasks = {}
+_wakeups = {}
+_wakeups_lock = threading.Lock()
+
+
+def task(name, queue="default", max_attempts=None):
+    """Register ``handler(payload)`` as task ``name`` on ``queue``."""
+    def register(handler):
+        _tasks[name] = (handler, queue, max_attempts or JOB_MAX_ATTEMPTS)
+        return handler
+    return register
+
+
+def _wakeup(queue):
+    with _wakeups_lock:
+        event = _wakeups.get(queue)
+        if event is None:
+            event = _wakeups[queue] = threading.Event()
+        return event
+
+
+def enqueue(task_name, payload=None, priority=0, run_at=None, delay_seconds=None,
+            queue=None, max_attempts=None, cur=None):
+    """Queue a job and return its id.
+
+    With ``cur`` the INSERT runs on the caller's cursor and commits (or
+    rolls back) with the caller's transaction.
+    """
+    if task_name not in _tasks:
+        load_task_modules()
+        if task_name not in _tasks:
+            raise ValueError(f"unknown job task '{task_name}'")
+    _, task_queue, task_max_attempts = _tasks[task_name]
+    queue = queue or task_queue
+    sql = """
+        INSERT INTO jobs (queue, task, payload, priority, max_attempts, run_at)
+        VALUES (%s, %s, %s, %s, %s,
+                COALESCE(%s, CURRENT_TIMESTAMP + make_interval(secs => %s)))
+        RETURNING id
+    """
+    params = (queue, task_name, json.dumps(payload or {}, default=str), priority,
+              max_attempts or task_max_attempts, run_at, delay_seconds or 0)
+    if cur is not None:
+        cur.execute(sql, params)
+        row = cur.fetchone()
+        job_id = row["id"] if isinstance(row, dict) else row[0]
+    else:
+        conn = get_db_connection()
+        own_cur = conn.cursor()
+        try:
+            own_cur.execute(sql, params)
+            job_id = own_cur.fetchone()[0]
+            conn.commit()
+        finally:
+            own_cur.close()
+            conn.close()
+    metrics.inc("jobs_enqueued_total", queue=queue, task=task_name)
+    if not run_at and not delay_seconds:
+        # Only helps workers in this process; others pick it up on their next poll
+        _wakeup(queue).set()
+    return job_id
+
+
+def claim_jobs(queue, limit):
+    """Mark up to ``limit`` due jobs on ``queue`` as running and return them."""
+    conn = get_db_connection()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        cap = JOB_QUEUE_LIMITS.get(queue)
+        if cap is not None:
+            # Serialize claims on this queue so the running count stays accurate
+            cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (f"job_queue:{queue}",))
+            cur.execute("""
+                SELECT COUNT(*) AS running FROM jobs
+                WHERE queue = %s AND status = 'running'
+                  AND locked_at >= CURRENT_TIMESTAMP - make_interval(secs => %s)
+            """, (queue, JOB_STALE_SECONDS))
+            limit = min(limit, cap - cur.fetchone()["running"])
+            if limit <= 0:
+                conn.commit()
+                return []
+        # A job that kills or hangs its worker on every attempt would
+        # otherwise be reclaimed forever
+        cur.execute("""
+            UPDATE jobs SET
+                status = 'dead',
+                last_error = 'worker stopped while running the last attempt',
+                locked_by = NULL,
+                locked_at = NULL,
+                finished_at = CURRENT_TIMESTAMP
+            WHERE queue = %s AND status = 'running'
+              AND locked_at < CURRENT_TIMESTAMP - make_interval(secs => %s)
+              AND attempts >= max_attempts
+        """, (queue, JOB_STALE_SECONDS))
+        if cur.rowcount:
+            logging.error(f"[JOBS] Dead-lettered {cur.rowcount} stale job(s) on '{queue}'")
+        cur.execute("""
+            UPDATE jobs SET
+                status = 'running',
+                attempts = attempts + 1,
+                locked_by = %s,
+                locked_at = CURRENT_TIMESTAMP
+            WHERE id IN (
+                SELECT id FROM jobs
+                WHERE queue = %s
+                  AND ((status = 'pending' AND run_at <= CURRENT_TIMESTAMP)
+                       OR (status = 'running'
+                           AND locked_at < CURRENT_TIMESTAMP - make_interval(secs => %s)
+                           AND attempts < max_attempts))
+                ORDER BY priority DESC, run_at, id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING *
+        """, (WORKER_ID, queue, JOB_STALE_SECONDS, limit))
+        jobs = [dict(r) for r in cur.fetchall()]
+        conn.commit()
+        # RETURNING does not keep the subquery's order
+        jobs.sort(key=lambda j: (-j["priority"], j["run_at"], j["id"]))
+        return jobs
+    finally:
+        cur.close()
+        conn.close()
+
+
+def mark_done(job_id):
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            UPDATE jobs
+            SET status = 'done', finished_at = CURRENT_TIMESTAMP, locked_by = NULL, locked_at = NULL
+            WHERE id = %s
+        """, (job_id,))
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+
+
+def mark_failed(job, error, permanent=False):
+    """Schedule a retry with exponential backoff or dead-letter the job.
+
+    Returns True if the job will be retried.
+    """
+    dead = permanent or job["attempts"] >= job["max_attempts"]
+    delay = min(JOB_RETRY_BASE_SECONDS * (2 ** (job["attempts"] - 1)), JOB_RETRY_MAX_SECONDS)
+    delay *= random.uniform(0.8, 1.2)
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            UPDATE jobs SET
+                status = %s,
+                last_error = %s,
+                locked_by = NULL,
+                locked_at = NULL,
+                run_at = CASE WHEN %s THEN run_at
+                              ELSE CURRENT_TIMESTAMP + make_interval(secs => %s) END,
+                finished_at = CASE WHEN %s THEN CURRENT_TIMESTAMP END
+            WHERE id = %s
+        """, ("dead" if dead else "pending", str(error)[:2000], dead, delay, dead, job["id"]))
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+    return not dead
+
+
+def retry_job(job_id):
+    """Put a dead-lettered job back in its queue (admin action)."""
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            UPDATE jobs
+            SET status = 'pending', attempts = 0, run_at = CURRENT_TIMESTAMP, finished_at = NULL
+            WHERE id = %s AND status = 'dead'
+            RETURNING queue
+        """, (job_id,))
+        row = cur.fetchone()
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+    if row:
+        _wakeup(row[0]).set()
+    return row is not None
+
+
+def get_jobs(page=1, page_size=20, queue=None, status=None):
+    conn = get_db_connection()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        conditions, params = [], []
+        if queue:
+            conditions.append("queue = %s")
+            params.append(queue)
+        if status:
+            conditions.append("status = %s")
+            params.append(status)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        cur.execute(f"""
+            SELECT id, queue, task, payload, priority, status, attempts, max_attempts,
+                   run_at, locked_by, last_error, created_at, finished_at
+            FROM jobs {where}
+            ORDER BY id DESC
+            LIMIT %s OFFSET %s
+        """, params + [page_size, (page - 1) * page_size])
+        jobs = [dict(j) for j in cur.fetchall()]
+        cur.execute(f"SELECT COUNT(*) FROM jobs {where}", params)
+        total = cur.fetchone()["count"]
+        return {
+            "jobs": jobs,
+            "total": total,
+            "page": page,
+            "page_size": page_size,
+            "total_pages": (total + page_size - 1) // page_size
+        }
+    finally:
+        cur.close()
+        conn.close()
+
+
+def get_queue_depths():
+    """``{(queue, status): count}`` for jobs not yet done."""
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            SELECT queue, status, COUNT(*) FROM jobs
+            WHERE status IN ('pending', 'running', 'dead')
+            GROUP BY queue, status
+        """)
+        return {(queue, status): count for queue, status, count in cur.fetchall()}
+    finally:
+        cur.close()
+        conn.close()
+
+
+def prune_jobs(days=None):
+    """Delete finished jobs older than ``JOB_RETENTION_DAYS``; dead jobs stay."""
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            DELETE FROM jobs
+            WHERE status = 'done' AND finished_at < CURRENT_TIMESTAMP - make_interval(days => %s)
+        """, (days or JOB_RETENTION_DAYS,))
+        conn.commit()
+        return {"deleted": cur.rowcount}
+    finally:
+        cur.close()
+        conn.close()
+
+
+def run_job(job):
+    """Run one claimed job and record the outcome."""
+    queue, name = job["queue"], job["task"]
+    entry = _tasks.get(name)
+    started = datetime.utcnow()
+    try:
+        if entry is None:
+            raise PermanentJobError(f"no handler registered for task '{name}'")
+        if job["attempts"] > job["max_attempts"]:
+            # Reclaimed from a worker that died on the final attempt
+            raise PermanentJobError("worker stopped while running the final attempt")
+        with metrics.timed("job_duration_seconds", queue=queue, task=name):
+            entry[0](job["payload"] or {})
+    except Exception as e:
+        permanent = isinstance(e, PermanentJobError)
+        will_retry = mark_failed(job, f"{type(e).__name__}: {e}", permanent=permanent)
+        status = "retry" if will_retry else "dead"
+        logging.error(f"[JOBS] {name} job {job['id']} failed (attempt {job['attempts']}/"
+                      f"{job['max_attempts']}, {'will retry' if will_retry else 'dead-lettered'}): {e}")
+    else:
+        mark_done(job["id"])
+        status = "done"
+    metrics.inc("jobs_processed_total", queue=queue, task=name, status=status)
+    metrics.observe("job_queue_lag_seconds", max(0.0, (started - job["run_at"]).total_seconds()),
+                    queue=queue)
+    return status
+
+
+class QueueWorker:
+    """Keeps up to ``concurrency`` jobs from one queue running on a thread pool."""
+
+    def __init__(self, queue, concurrency, poll_seconds=JOB_POLL_SECONDS):
+        self.queue = queue
+        self.concurrency = concurrency
+        self.poll_seconds = poll_seconds
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wakeup = _wakeup(queue)
+        self._thread = None
+        self._executor = None
+
+    def start(self):
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.concurrency, thread_name_prefix=f"jobs-{self.queue}"
+        )
+        self._thread = threading.Thread(target=self._run, name=f"jobs-{self.queue}", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=10):
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout)
+        if self._executor:
+            self._executor.shutdown(wait=True)
+
+    def _release(self, _future):
+        with self._lock:
+            self._in_flight -= 1
+        # A slot opened up: claim the next job without waiting for the poll
+        self._wakeup.set()
+
+    def run_once(self):
+        with self._lock:
+            free = self.concurrency - self._in_flight
+        if free <= 0:
+            return 0
+        jobs = claim_jobs(self.queue, free)
+        for job in jobs:
+            with self._lock:
+                self._in_flight += 1
+            self._executor.submit(run_job, job).add_done_callback(self._release)
+        return len(jobs)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                claimed = self.run_once()
+            except Exception as e:
+                logging.error(f"[JOBS] {self.queue} worker error: {e}")
+                claimed = 0
+            if claimed == 0:
+                self._wakeup.wait(self.poll_seconds)
+                self._wakeup.clear()
+
+
+_workers = []
+
+
+def load_task_modules():
+    for module in TASK_MODULES:
+        importlib.import_module(module)
+
+
+def start_job_workers(queues=None):
+    """Start one ``QueueWorker`` per queue (default: every registered queue)."""
+    load_task_modules()
+    queues = queues or sorted({queue for _, queue, _ in _tasks.values()})
+    for queue in queues:
+        worker = QueueWorker(queue, JOB_QUEUE_CONCURRENCY.get(queue, JOB_DEFAULT_CONCURRENCY))
+        worker.start()
+        _workers.append(worker)
+    logging.info("[JOBS] Workers started: " + ", ".join(f"{w.queue}x{w.concurrency}" for w in _workers))
+    return list(_workers)
+
+
+def stop_job_workers():
+    while _workers:
+        _workers.pop().stop()
+
+
+metrics.register_gauge(
+    "job_queue_depth", "Jobs by queue and status (pending, running, dead)",
+    lambda: {(("queue", q), ("status", s)): n for (q, s), n in get_queue_depths().items()},
+)
+metrics.describe("jobs_enqueued_total", "counter", "Jobs enqueued by queue and task")
+metrics.describe("jobs_processed_total", "counter", "Job attempts by queue, task and outcome (done, retry, dead)")
+metrics.describe("job_duration_seconds", "histogram", "Job handler run time")
+metrics.describe("job_queue_lag_seconds", "histogram", "Delay between a job's run_at and a worker starting it")
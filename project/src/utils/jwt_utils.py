@@ -1,11 +1,21 @@
 import os
+import time
+import hashlib
+import threading
 from datetime import datetime, timedelta
 from jose import jwt, JWTError
 import logging
 
+from src.utils import metrics
+
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "change_me_in_production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "480"))
+TOKEN_CACHE_MAX_ENTRIES = int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", "5000"))
+
+# sha256(token) -> (exp as epoch seconds, payload); valid tokens only
+_token_cache = {}
+_token_cache_lock = threading.Lock()
 
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
@@ -16,12 +26,44 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
 
 
 def decode_access_token(token: str):
+    """Decode and verify an access token.
+
+    Successful decodes are cached by token hash until the token's ``exp``,
+    so repeat requests with the same bearer token skip signature checks.
+    """
+    key = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    now = time.time()
+    with _token_cache_lock:
+        cached = _token_cache.get(key)
+    if cached is not None:
+        if cached[0] > now:
+            metrics.inc("cache_requests_total", cache="jwt", result="hit")
+            return dict(cached[1])
+        with _token_cache_lock:
+            _token_cache.pop(key, None)
+
+    metrics.inc("cache_requests_total", cache="jwt", result="miss")
     try:
-        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
     except JWTError as e:
         logging.error(f"JWT decode error: {e}")
         return None
 
+    exp = payload.get("exp")
+    if isinstance(exp, (int, float)):
+        with _token_cache_lock:
+            if len(_token_cache) >= TOKEN_CACHE_MAX_ENTRIES:
+                _evict_tokens(now)
+            _token_cache[key] = (exp, dict(payload))
+    return payload
+
+
+def _evict_tokens(now):
+    for key in [k for k, (exp, _) in _token_cache.items() if exp <= now]:
+        del _token_cache[key]
+    while len(_token_cache) >= TOKEN_CACHE_MAX_ENTRIES:
+        del _token_cache[next(iter(_token_cache))]
+
 
 def create_password_reset_token(email: str, expires_delta: timedelta = timedelta(hours=1)):
     expire = datetime.utcnow() + expires_delta
@@ -0,0 +1,340 @@
+"""Durable mail outbox.
+
+Request handlers call ``enqueue_email`` which is a single INSERT; a
+background worker claims due rows with ``FOR UPDATE SKIP LOCKED`` (so any
+number of app processes can run one), sends them over the shared SMTP
+connection pool and records per-message status. Failed sends are retried
+with exponential backoff up to ``MAIL_MAX_ATTEMPTS``.
+
+Bodies can carry credentials (temporary passwords, reset links), so they
+are cleared as soon as a message is sent, and sent rows are deleted after
+``MAIL_OUTBOX_RETENTION_DAYS``.
+"""
+import os
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from psycopg2.extras import RealDictCursor
+
+from src.utils import metrics
+from src.utils.db import _connect, after_commit, get_db_connection
+from src.utils.smtp_pool import (
+    SMTP_POOL_SIZE,
+    build_message,
+    get_smtp_pool,
+    smtp_configured,
+)
+
+MAIL_MAX_ATTEMPTS = int(os.getenv("MAIL_MAX_ATTEMPTS", "5"))
+MAIL_RETRY_BASE_SECONDS = int(os.getenv("MAIL_RETRY_BASE_SECONDS", "30"))
+MAIL_OUTBOX_POLL_SECONDS = float(os.getenv("MAIL_OUTBOX_POLL_SECONDS", "2"))
+MAIL_OUTBOX_BATCH_SIZE = int(os.getenv("MAIL_OUTBOX_BATCH_SIZE", "20"))
+# A row stuck in 'sending' this long belongs to a worker that died mid-send
+MAIL_OUTBOX_STALE_SECONDS = int(os.getenv("MAIL_OUTBOX_STALE_SECONDS", "600"))
+MAIL_OUTBOX_RETENTION_DAYS = int(os.getenv("MAIL_OUTBOX_RETENTION_DAYS", "14"))
+
+
+def ensure_outbox_schema(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS mail_outbox (
+            id BIGSERIAL PRIMARY KEY,
+            to_email VARCHAR(255) NOT NULL,
+            subject VARCHAR(500) NOT NULL,
+            html_body TEXT NOT NULL,
+            plain_body TEXT,
+            status VARCHAR(20) NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT,
+            next_attempt_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            locked_at TIMESTAMP,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            sent_at TIMESTAMP
+        )
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_mail_outbox_due
+        ON mail_outbox (next_attempt_at) WHERE status IN ('pending', 'sending')
+    """)
+    # Sent rows keep only their envelope; the body is cleared on delivery
+    cur.execute("ALTER TABLE mail_outbox ALTER COLUMN html_body DROP NOT NULL")
+    cur.execute("""
+        UPDATE mail_outbox SET html_body = NULL, plain_body = NULL
+        WHERE status = 'sent' AND html_body IS NOT NULL
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_mail_outbox_sent
+        ON mail_outbox (sent_at) WHERE status = 'sent'
+    """)
+
+
+def enqueue_email(to_email, subject, html_body, plain_body=None, conn=None):
+    """Queue one message; with ``conn`` it commits with the caller's transaction."""
+    conn = _connect(conn)
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            INSERT INTO mail_outbox (to_email, subject, html_body, plain_body)
+            VALUES (%s, %s, %s, %s)
+            RETURNING id
+        """, (to_email, subject, html_body, plain_body))
+        message_id = cur.fetchone()[0]
+        conn.commit()
+        after_commit(conn, _worker_wakeup.set)
+    finally:
+        cur.close()
+        conn.close()
+    logging.info(f"Email queued id={message_id} to {to_email}: {subject}")
+    return message_id
+
+
+def claim_due_messages(limit=MAIL_OUTBOX_BATCH_SIZE):
+    conn = get_db_connection()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        # A message that kills or hangs its worker on every attempt would
+        # otherwise be reclaimed forever
+        cur.execute("""
+            UPDATE mail_outbox SET
+                status = 'failed',
+                last_error = 'worker stopped during send on the last attempt',
+                locked_at = NULL
+            WHERE status = 'sending'
+              AND locked_at < CURRENT_TIMESTAMP - make_interval(secs => %s)
+              AND attempts >= %s
+        """, (MAIL_OUTBOX_STALE_SECONDS, MAIL_MAX_ATTEMPTS))
+        if cur.rowcount:
+            logging.error(f"Email gave up on {cur.rowcount} message(s) stuck in sending")
+            metrics.inc("mail_outbox_failures_total", cur.rowcount)
+        cur.execute("""
+            UPDATE mail_outbox SET
+                status = 'sending',
+                attempts = attempts + 1,
+                locked_at = CURRENT_TIMESTAMP
+            WHERE id IN (
+                SELECT id FROM mail_outbox
+                WHERE (status = 'pending' AND next_attempt_at <= CURRENT_TIMESTAMP)
+                   OR (status = 'sending'
+                       AND locked_at < CURRENT_TIMESTAMP - make_interval(secs => %s)
+                       AND attempts < %s)
+                ORDER BY next_attempt_at
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING *
+        """, (MAIL_OUTBOX_STALE_SECONDS, MAIL_MAX_ATTEMPTS, limit))
+        rows = [dict(r) for r in cur.fetchall()]
+        conn.commit()
+        return rows
+    finally:
+        cur.close()
+        conn.close()
+
+
+def mark_sent(message_id):
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            UPDATE mail_outbox
+            SET status = 'sent', sent_at = CURRENT_TIMESTAMP, last_error = NULL, locked_at = NULL,
+                html_body = NULL, plain_body = NULL
+            WHERE id = %s
+        """, (message_id,))
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+
+
+def mark_failed(message_id, attempts, error):
+    """Schedule a retry with exponential backoff, or give up after
+    MAIL_MAX_ATTEMPTS."""
+    give_up = attempts >= MAIL_MAX_ATTEMPTS
+    delay = MAIL_RETRY_BASE_SECONDS * (2 ** (attempts - 1))
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            UPDATE mail_outbox SET
+                status = %s,
+                last_error = %s,
+                locked_at = NULL,
+                next_attempt_at = CURRENT_TIMESTAMP + make_interval(secs => %s)
+            WHERE id = %s
+        """, ("failed" if give_up else "pending", str(error)[:2000], delay, message_id))
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+    return not give_up
+
+
+def retry_message(message_id):
+    """Put a failed message back in the queue (admin action)."""
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            UPDATE mail_outbox
+            SET status = 'pending', attempts = 0, next_attempt_at = CURRENT_TIMESTAMP
+            WHERE id = %s AND status = 'failed'
+        """, (message_id,))
+        conn.commit()
+        updated = cur.rowcount > 0
+    finally:
+        cur.close()
+        conn.close()
+    if updated:
+        _worker_wakeup.set()
+    return updated
+
+
+def prune_sent_messages(days=None):
+    """Delete sent messages older than ``MAIL_OUTBOX_RETENTION_DAYS``."""
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            DELETE FROM mail_outbox
+            WHERE status = 'sent' AND sent_at < CURRENT_TIMESTAMP - make_interval(days => %s)
+        """, (days or MAIL_OUTBOX_RETENTION_DAYS,))
+        conn.commit()
+        return {"deleted": cur.rowcount}
+    finally:
+        cur.close()
+        conn.close()
+
+
+def get_outbox_messages(page=1, page_size=20, status=None):
+    conn = get_db_connection()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        offset = (page - 1) * page_size
+        where = "WHERE status = %s" if status else ""
+        params = [status] if status else []
+        cur.execute(f"""
+            SELECT id, to_email, subject, status, attempts, last_error,
+                   next_attempt_at, created_at, sent_at
+            FROM mail_outbox {where}
+            ORDER BY id DESC
+            LIMIT %s OFFSET %s
+        """, params + [page_size, offset])
+        messages = cur.fetchall()
+        cur.execute(f"SELECT COUNT(*) FROM mail_outbox {where}", params)
+        total = cur.fetchone()["count"]
+        return {
+            "messages": [dict(m) for m in messages],
+            "total": total,
+            "page": page,
+            "page_size": page_size,
+            "total_pages": (total + page_size - 1) // page_size
+        }
+    finally:
+        cur.close()
+        conn.close()
+
+
+def get_outbox_depth():
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT COUNT(*) FROM mail_outbox WHERE status IN ('pending', 'sending')")
+        return cur.fetchone()[0]
+    finally:
+        cur.close()
+        conn.close()
+
+
+def _deliver(message):
+    metrics.inc("mail_outbox_attempts_total")
+    try:
+        msg = build_message(
+            message["to_email"], message["subject"],
+            message["html_body"], message.get("plain_body"),
+        )
+        get_smtp_pool().send(msg)
+    except Exception as e:
+        will_retry = mark_failed(message["id"], message["attempts"], e)
+        logging.error(
+            "Email send failed id=%s to %s (attempt %d, %s): %s",
+            message["id"], message["to_email"], message["attempts"],
+            "will retry" if will_retry else "giving up", e,
+        )
+        metrics.inc("mail_outbox_failures_total")
+        return False
+    mark_sent(message["id"])
+    logging.info(f"Email sent id={message['id']} to {message['to_email']}: {message['subject']}")
+    return True
+
+
+_worker_wakeup = threading.Event()
+
+
+class OutboxWorker:
+    """Background thread that drains the outbox through the SMTP pool."""
+
+    def __init__(self, concurrency=SMTP_POOL_SIZE, poll_seconds=MAIL_OUTBOX_POLL_SECONDS):
+        self.concurrency = concurrency
+        self.poll_seconds = poll_seconds
+        self._stop = threading.Event()
+        self._thread = None
+        self._executor = None
+
+    def start(self):
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.concurrency, thread_name_prefix="mail-outbox"
+        )
+        self._thread = threading.Thread(target=self._run, name="mail-outbox", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=10):
+        self._stop.set()
+        _worker_wakeup.set()
+        if self._thread:
+            self._thread.join(timeout)
+        if self._executor:
+            self._executor.shutdown(wait=True)
+
+    def run_once(self):
+        messages = claim_due_messages()
+        if messages:
+            list(self._executor.map(_deliver, messages))
+        return len(messages)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                processed = self.run_once()
+            except Exception as e:
+                logging.error(f"Mail outbox worker error: {e}")
+                processed = 0
+            if processed == 0:
+                _worker_wakeup.wait(self.poll_seconds)
+                _worker_wakeup.clear()
+
+
+_worker = None
+
+
+def start_outbox_worker():
+    global _worker
+    if not smtp_configured():
+        logging.warning("SMTP credentials not configured, mail outbox worker not started")
+        return None
+    _worker = OutboxWorker()
+    _worker.start()
+    logging.info("Mail outbox worker started")
+    return _worker
+
+
+def stop_outbox_worker():
+    global _worker
+    if _worker is not None:
+        _worker.stop()
+        _worker = None
+
+
+metrics.register_gauge(
+    "mail_outbox_depth", "Outbox messages pending or being sent", get_outbox_depth
+)
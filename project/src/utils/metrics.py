@@ -0,0 +1,249 @@
+"""In-process metrics with Prometheus text exposition.
+
+Recording is lock-free: every thread writes to its own shard (plain dicts
+reached through a ``threading.local``), and ``render_metrics`` merges the
+shards when ``/metrics`` is scraped. A shard is registered once, the first
+time a thread records anything; after that ``inc``/``observe`` are a couple
+of dict operations. Shards of threads that have exited are folded into a
+retired aggregate (when a new shard registers and at scrape time), so
+short-lived thread pools do not grow the registry.
+
+Values computed at scrape time (queue depths, cache sizes) are exposed
+through ``register_gauge`` callbacks owned by the module that has the data.
+"""
+import time
+import logging
+import inspect
+import functools
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0)
+
+# name -> (type, help, buckets)
+_metadata = {}
+# name -> (type, help, callback)
+_gauges = {}
+
+_local = threading.local()
+# (owning thread, shard) for threads that may still record
+_shards = []
+# Totals from shards whose thread has exited
+_retired = ({}, {})
+_shards_lock = threading.Lock()
+
+
+def describe(name, metric_type, help_text, buckets=None):
+    """Declare a metric's type and help text (and buckets for histograms)."""
+    _metadata[name] = (metric_type, help_text, tuple(buckets or DEFAULT_BUCKETS))
+
+
+def register_gauge(name, help_text, callback, metric_type="gauge"):
+    """Expose ``callback()`` at scrape time. It may return a number or a
+    dict mapping label tuples (``(("queue", "mail"),)``) to numbers."""
+    _gauges[name] = (metric_type, help_text, callback)
+
+
+def _shard():
+    shard = getattr(_local, "shard", None)
+    if shard is None:
+        shard = ({}, {})  # counters, histograms
+        _local.shard = shard
+        with _shards_lock:
+            _retire_dead_shards()
+            _shards.append((threading.current_thread(), shard))
+    return shard
+
+
+def _retire_dead_shards():
+    """Fold shards of exited threads into ``_retired``; caller holds ``_shards_lock``."""
+    live = []
+    for thread, shard in _shards:
+        if thread.is_alive():
+            live.append((thread, shard))
+        else:
+            _merge(_retired, shard)
+    _shards[:] = live
+
+
+def _merge(into, shard):
+    counters, histograms = into
+    shard_counters, shard_histograms = shard
+    for key, value in list(shard_counters.items()):
+        counters[key] = counters.get(key, 0) + value
+    for key, h in list(shard_histograms.items()):
+        merged = histograms.get(key)
+        if merged is None:
+            histograms[key] = list(h)
+        else:
+            for i, v in enumerate(h):
+                merged[i] += v
+
+
+def _key(name, labels):
+    return (name, tuple(sorted(labels.items()))) if labels else (name, ())
+
+
+def inc(name, value=1, **labels):
+    counters = _shard()[0]
+    key = _key(name, labels)
+    counters[key] = counters.get(key, 0) + value
+
+
+def observe(name, value, **labels):
+    histograms = _shard()[1]
+    key = _key(name, labels)
+    meta = _metadata.get(name)
+    buckets = meta[2] if meta else DEFAULT_BUCKETS
+    h = histograms.get(key)
+    if h is None:
+        # [per-bucket counts..., +Inf count, sum]
+        h = histograms[key] = [0] * (len(buckets) + 1) + [0.0]
+    h[bisect_left(buckets, value)] += 1
+    h[-1] += value
+
+
+@contextmanager
+def timed(name, **labels):
+    """Observe the duration of the block in seconds. Exceptions also bump
+    ``<name minus _duration_seconds>_errors_total``."""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        inc(_errors_name(name), **labels)
+        raise
+    finally:
+        observe(name, time.perf_counter() - started, **labels)
+
+
+def _errors_name(name):
+    base = name[:-len("_duration_seconds")] if name.endswith("_duration_seconds") else name
+    return base + "_errors_total"
+
+
+def instrument_module(namespace, metric, label):
+    """Wrap every public function defined in a module with ``timed``.
+
+    Call at the bottom of the module with ``globals()`` so both importers
+    and intra-module calls see the wrapped versions.
+    """
+    module = namespace["__name__"]
+    for name, fn in list(namespace.items()):
+        if name.startswith("_") or not inspect.isfunction(fn) or fn.__module__ != module:
+            continue
+        namespace[name] = _wrap(fn, metric, label, name)
+
+
+def _wrap(fn, metric, label, value):
+    labels = {label: value}
+    errors = _errors_name(metric)
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        except Exception:
+            inc(errors, **labels)
+            raise
+        finally:
+            observe(metric, time.perf_counter() - started, **labels)
+
+    return wrapper
+
+
+def _collect():
+    merged = ({}, {})
+    with _shards_lock:
+        _retire_dead_shards()
+        _merge(merged, _retired)
+        shards = [shard for _, shard in _shards]
+    for shard in shards:
+        _merge(merged, shard)
+    return merged
+
+
+def snapshot():
+    """Merged counters and histogram totals as plain dicts (for tests/admin)."""
+    counters, histograms = _collect()
+    return {
+        "counters": {_series(n, l): v for (n, l), v in counters.items()},
+        "histograms": {
+            _series(n, l): {"count": sum(h[:-1]), "sum": h[-1]}
+            for (n, l), h in histograms.items()
+        },
+    }
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _series(name, labels, extra=None):
+    pairs = list(labels) + (extra or [])
+    if not pairs:
+        return name
+    return name + "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _number(value):
+    if isinstance(value, float):
+        return repr(value) if value != int(value) or abs(value) >= 1e15 else str(int(value))
+    return str(value)
+
+
+def _header(lines, name, metric_type, help_text, seen):
+    if name in seen:
+        return
+    seen.add(name)
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {metric_type}")
+
+
+def render_metrics():
+    counters, histograms = _collect()
+    lines = []
+    seen = set()
+
+    for (name, labels), value in sorted(counters.items()):
+        metric_type, help_text, _ = _metadata.get(name, ("counter", name, None))
+        _header(lines, name, metric_type, help_text, seen)
+        lines.append(f"{_series(name, labels)} {_number(value)}")
+
+    for (name, labels), h in sorted(histograms.items()):
+        _, help_text, buckets = _metadata.get(name, ("histogram", name, DEFAULT_BUCKETS))
+        _header(lines, name, "histogram", help_text, seen)
+        cumulative = 0
+        for bound, count in zip(buckets, h):
+            cumulative += count
+            lines.append(f"{_series(name + '_bucket', labels, [('le', bound)])} {cumulative}")
+        cumulative += h[len(buckets)]
+        lines.append(f"{_series(name + '_bucket', labels, [('le', '+Inf')])} {cumulative}")
+        lines.append(f"{_series(name + '_sum', labels)} {_number(h[-1])}")
+        lines.append(f"{_series(name + '_count', labels)} {cumulative}")
+
+    for name, (metric_type, help_text, callback) in sorted(_gauges.items()):
+        try:
+            value = callback()
+        except Exception as e:
+            logging.warning(f"[METRICS] Gauge {name} failed: {e}")
+            continue
+        _header(lines, name, metric_type, help_text, seen)
+        if isinstance(value, dict):
+            for labels, v in sorted(value.items()):
+                lines.append(f"{_series(name, labels)} {_number(v)}")
+        else:
+            lines.append(f"{name} {_number(value)}")
+
+    return "\n".join(lines) + "\n"
+
+
+describe("http_requests_total", "counter", "HTTP requests by route and status")
+describe("http_request_duration_seconds", "histogram", "HTTP request latency by route")
+describe("db_helper_duration_seconds", "histogram", "Time spent in DB helper functions")
+describe("db_helper_errors_total", "counter", "DB helper calls that raised")
+describe("external_call_duration_seconds", "histogram", "Latency of calls to external services")
+describe("external_call_errors_total", "counter", "External service calls that failed")
+describe("cache_requests_total", "counter", "Cache lookups by cache and result")
@@ -0,0 +1,144 @@
+"""bcrypt hashing on a dedicated, bounded process pool.
+
+bcrypt is deliberately slow; running it on request threads lets a burst of
+logins starve everything else sharing the threadpool. Work is sent to a
+small process pool instead (no GIL contention) and admission is capped at
+``PASSWORD_HASH_MAX_PENDING`` in-flight operations; callers beyond that wait
+up to ``PASSWORD_HASH_ACQUIRE_TIMEOUT`` seconds and then get
+``PasswordHashingBusy``.
+"""
+import os
+import time
+import bcrypt
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from src.utils import metrics
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "32"))
+PASSWORD_HASH_ACQUIRE_TIMEOUT = float(os.getenv("PASSWORD_HASH_ACQUIRE_TIMEOUT", "5"))
+
+
+class PasswordHashingBusy(RuntimeError):
+    """Raised when the hashing pool is saturated."""
+
+
+# Run in the worker processes; must stay module-level so they pickle.
+
+def _hash_worker(password, rounds):
+    started = time.perf_counter()
+    hashed = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds)).decode("utf-8")
+    return hashed, time.perf_counter() - started
+
+
+def _check_worker(password, hashed):
+    started = time.perf_counter()
+    ok = bcrypt.checkpw(password.encode("utf-8"), hashed.encode("utf-8"))
+    return ok, time.perf_counter() - started
+
+
+_executor = None
+_executor_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(PASSWORD_HASH_MAX_PENDING)
+_stats_lock = threading.Lock()
+_stats = {
+    "in_flight": 0,
+    "peak_in_flight": 0,
+    "completed": 0,
+    "rejected": 0,
+    "queue_wait_seconds": 0.0,
+    "hash_seconds": 0.0,
+}
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                # spawn, not fork: the parent runs scheduler/mail threads
+                _executor = ProcessPoolExecutor(
+                    max_workers=PASSWORD_HASH_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _executor
+
+
+def _run(fn, *args):
+    if not _slots.acquire(timeout=PASSWORD_HASH_ACQUIRE_TIMEOUT):
+        with _stats_lock:
+            _stats["rejected"] += 1
+        raise PasswordHashingBusy("Password hashing pool is saturated")
+    with _stats_lock:
+        _stats["in_flight"] += 1
+        _stats["peak_in_flight"] = max(_stats["peak_in_flight"], _stats["in_flight"])
+    started = time.perf_counter()
+    try:
+        result, worked = _get_executor().submit(fn, *args).result()
+    finally:
+        _slots.release()
+        with _stats_lock:
+            _stats["in_flight"] -= 1
+    elapsed = time.perf_counter() - started
+    metrics.observe("password_hash_duration_seconds", worked, operation=fn.__name__[1:-len("_worker")])
+    metrics.observe("password_hash_queue_wait_seconds", max(0.0, elapsed - worked))
+    with _stats_lock:
+        _stats["completed"] += 1
+        _stats["hash_seconds"] += worked
+        _stats["queue_wait_seconds"] += max(0.0, elapsed - worked)
+    return result
+
+
+def hash_password(password):
+    return _run(_hash_worker, password, BCRYPT_ROUNDS)
+
+
+def verify_password(password, hashed):
+    return _run(_check_worker, password, hashed)
+
+
+def needs_rehash(hashed):
+    """True when ``hashed`` was made with a different cost than BCRYPT_ROUNDS."""
+    try:
+        return int(hashed.split("$")[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError, AttributeError):
+        return True
+
+
+def password_hashing_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    completed = stats["completed"] or 1
+    stats.update({
+        "workers": PASSWORD_HASH_WORKERS,
+        "max_pending": PASSWORD_HASH_MAX_PENDING,
+        "rounds": BCRYPT_ROUNDS,
+        "avg_queue_wait_ms": round(stats.pop("queue_wait_seconds") / completed * 1000, 1),
+        "avg_hash_ms": round(stats.pop("hash_seconds") / completed * 1000, 1),
+    })
+    return stats
+
+
+def shutdown_password_hashing():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+            logging.info("Password hashing pool stopped")
+
+
+metrics.describe("password_hash_duration_seconds", "histogram", "bcrypt time inside the worker process")
+metrics.describe("password_hash_queue_wait_seconds", "histogram", "Time waiting for a bcrypt worker")
+metrics.register_gauge(
+    "password_hash_in_flight", "Password hash operations admitted and not finished",
+    lambda: _stats["in_flight"],
+)
+metrics.register_gauge(
+    "password_hash_rejected_total", "Password hash operations rejected as busy",
+    lambda: _stats["rejected"], metric_type="counter",
+)
@@ -0,0 +1,261 @@
+"""Per-statement SQL timing, fingerprints and sampled EXPLAIN plans.
+
+``get_db_connection`` creates connections with ``TimedConnection``; every
+cursor they hand out (including ``RealDictCursor``) times each
+``execute``/``executemany`` and records it under a normalized fingerprint
+(literals and placeholders replaced with ``?``). Per fingerprint we keep
+call/error counts, total and max time, and a reservoir of recent durations
+for percentiles.
+
+Statements slower than ``SLOW_QUERY_MS`` are logged; read-only ones are
+sampled for ``EXPLAIN (ANALYZE, BUFFERS)``, which runs on a separate
+connection in a background thread so the request that hit the slow query
+does not pay for it twice.
+"""
+import os
+import re
+import time
+import random
+import hashlib
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import psycopg2
+import psycopg2.extensions
+
+QUERY_LOG_ENABLED = os.getenv("QUERY_LOG_ENABLED", "true").lower() == "true"
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+SLOW_QUERY_EXPLAIN_SAMPLE_RATE = float(os.getenv("SLOW_QUERY_EXPLAIN_SAMPLE_RATE", "0.2"))
+# At most one EXPLAIN per fingerprint per this many seconds
+SLOW_QUERY_EXPLAIN_INTERVAL = float(os.getenv("SLOW_QUERY_EXPLAIN_INTERVAL", "300"))
+SLOW_QUERY_EXPLAIN_TIMEOUT_MS = int(os.getenv("SLOW_QUERY_EXPLAIN_TIMEOUT_MS", "10000"))
+QUERY_LOG_RESERVOIR = 512
+QUERY_LOG_EXPLAINS_KEPT = 3
+
+_COMMENTS = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_NUMBERS = re.compile(r"(?<![\w$])-?\d+(?:\.\d+)?\b")
+_PLACEHOLDERS = re.compile(r"%\(\w+\)s|%s")
+_IN_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+_WRITES = re.compile(r"\b(insert|update|delete|merge|truncate|create|drop|alter)\b", re.I)
+
+_fingerprints = {}  # raw SQL text -> (fingerprint id, normalized text)
+_stats = {}
+_lock = threading.Lock()
+_explainer = None
+
+
+def fingerprint(sql):
+    if isinstance(sql, bytes):
+        sql = sql.decode("utf-8", "replace")
+    else:
+        sql = str(sql)
+    cached = _fingerprints.get(sql)
+    if cached is not None:
+        return cached
+    text = _COMMENTS.sub(" ", sql)
+    text = _STRINGS.sub("?", text)
+    text = _PLACEHOLDERS.sub("?", text)
+    text = _NUMBERS.sub("?", text)
+    text = _IN_LISTS.sub("(...)", text)
+    text = _WHITESPACE.sub(" ", text).strip()
+    result = (hashlib.sha1(text.encode("utf-8")).hexdigest()[:12], text)
+    # Dynamic-WHERE helpers build a bounded set of texts; cap anyway
+    if len(_fingerprints) < 5000:
+        _fingerprints[sql] = result
+    return result
+
+
+class _QueryStats:
+    __slots__ = ("text", "calls", "errors", "rows", "total_ms", "max_ms",
+                 "recent", "slow_calls", "explains", "last_explain_at")
+
+    def __init__(self, text):
+        self.text = text
+        self.calls = 0
+        self.errors = 0
+        self.rows = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.recent = deque(maxlen=QUERY_LOG_RESERVOIR)
+        self.slow_calls = 0
+        self.explains = deque(maxlen=QUERY_LOG_EXPLAINS_KEPT)
+        self.last_explain_at = 0.0
+
+
+def _record(sql, elapsed_ms, rowcount, failed, executed_query):
+    fp_id, text = fingerprint(sql)
+    with _lock:
+        stats = _stats.get(fp_id)
+        if stats is None:
+            stats = _stats[fp_id] = _QueryStats(text)
+        stats.calls += 1
+        stats.total_ms += elapsed_ms
+        stats.recent.append(elapsed_ms)
+        if elapsed_ms > stats.max_ms:
+            stats.max_ms = elapsed_ms
+        if failed:
+            stats.errors += 1
+        elif rowcount and rowcount > 0:
+            stats.rows += rowcount
+        slow = elapsed_ms >= SLOW_QUERY_MS
+        explain = False
+        if slow:
+            stats.slow_calls += 1
+            now = time.monotonic()
+            if (not failed and executed_query
+                    and now - stats.last_explain_at >= SLOW_QUERY_EXPLAIN_INTERVAL
+                    and random.random() < SLOW_QUERY_EXPLAIN_SAMPLE_RATE
+                    and _explainable(text)):
+                stats.last_explain_at = now
+                explain = True
+    if slow:
+        logging.warning("[SLOW QUERY] %.0fms fp=%s %s", elapsed_ms, fp_id, text[:300])
+    if explain:
+        _get_explainer().submit(_capture_explain, fp_id, executed_query, elapsed_ms)
+
+
+def _explainable(text):
+    head = text.lstrip("( ").lower()
+    return (head.startswith("select") or head.startswith("with")) and not _WRITES.search(text)
+
+
+def _get_explainer():
+    global _explainer
+    if _explainer is None:
+        with _lock:
+            if _explainer is None:
+                _explainer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="query-explain")
+    return _explainer
+
+
+def _capture_explain(fp_id, executed_query, elapsed_ms):
+    if isinstance(executed_query, bytes):
+        executed_query = executed_query.decode("utf-8", "replace")
+    try:
+        # Plain connection: EXPLAIN statements must not feed back into the log
+        conn = psycopg2.connect(os.getenv("DATABASE_URL"))
+        try:
+            conn.set_session(readonly=True)
+            cur = conn.cursor()
+            cur.execute("SET LOCAL statement_timeout = %s", (SLOW_QUERY_EXPLAIN_TIMEOUT_MS,))
+            cur.execute("EXPLAIN (ANALYZE, BUFFERS) " + executed_query)
+            plan = "\n".join(row[0] for row in cur.fetchall())
+            conn.rollback()
+        finally:
+            conn.close()
+    except Exception as e:
+        logging.error(f"[SLOW QUERY] EXPLAIN failed for fp={fp_id}: {e}")
+        return
+    with _lock:
+        stats = _stats.get(fp_id)
+        if stats is not None:
+            stats.explains.append({
+                "captured_at": datetime.now(timezone.utc).isoformat(),
+                "observed_ms": round(elapsed_ms, 2),
+                "query": executed_query,
+                "plan": plan,
+            })
+
+
+class _TimedCursorMixin:
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        failed = True
+        try:
+            result = super().execute(query, vars)
+            failed = False
+            return result
+        finally:
+            _record(query, (time.perf_counter() - started) * 1000, self.rowcount,
+                    failed, getattr(self, "query", None))
+
+    def executemany(self, query, vars_list):
+        started = time.perf_counter()
+        failed = True
+        try:
+            result = super().executemany(query, vars_list)
+            failed = False
+            return result
+        finally:
+            # The per-row query text is not a useful EXPLAIN target
+            _record(query, (time.perf_counter() - started) * 1000, self.rowcount, failed, None)
+
+
+_timed_cursor_classes = {}
+
+
+def _timed_cursor_class(base):
+    cls = _timed_cursor_classes.get(base)
+    if cls is None:
+        cls = type("Timed" + base.__name__, (_TimedCursorMixin, base), {})
+        _timed_cursor_classes[base] = cls
+    return cls
+
+
+class TimedConnection(psycopg2.extensions.connection):
+    """Connection whose cursors record per-statement timings."""
+
+    def cursor(self, *args, **kwargs):
+        base = kwargs.get("cursor_factory") or self.cursor_factory or psycopg2.extensions.cursor
+        kwargs["cursor_factory"] = _timed_cursor_class(base)
+        return super().cursor(*args, **kwargs)
+
+
+def connect(dsn):
+    if QUERY_LOG_ENABLED:
+        return psycopg2.connect(dsn, connection_factory=TimedConnection)
+    return psycopg2.connect(dsn)
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return round(sorted_values[index], 2)
+
+
+def get_query_stats(sort="total_ms", limit=50):
+    with _lock:
+        snapshot = [
+            (fp_id, s.text, s.calls, s.errors, s.rows, s.total_ms, s.max_ms,
+             sorted(s.recent), s.slow_calls, len(s.explains))
+            for fp_id, s in _stats.items()
+        ]
+    out = []
+    for fp_id, text, calls, errors, rows, total_ms, max_ms, recent, slow_calls, explains in snapshot:
+        out.append({
+            "fingerprint": fp_id,
+            "query": text,
+            "calls": calls,
+            "errors": errors,
+            "rows": rows,
+            "total_ms": round(total_ms, 2),
+            "mean_ms": round(total_ms / calls, 2) if calls else None,
+            "p50_ms": _percentile(recent, 50),
+            "p95_ms": _percentile(recent, 95),
+            "p99_ms": _percentile(recent, 99),
+            "max_ms": round(max_ms, 2),
+            "slow_calls": slow_calls,
+            "explains": explains,
+        })
+    if sort in ("total_ms", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms", "calls", "slow_calls", "errors"):
+        out.sort(key=lambda q: q[sort] or 0, reverse=True)
+    return out[:limit]
+
+
+def get_query_explains(fp_id):
+    with _lock:
+        stats = _stats.get(fp_id)
+        if stats is None:
+            return None
+        return {"fingerprint": fp_id, "query": stats.text, "explains": list(stats.explains)}
+
+
+def reset_query_stats():
+    with _lock:
+        _stats.clear()
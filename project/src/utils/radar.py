@@ -1,47 +1,61 @@
-import os
 import logging
+
 import requests
-from dotenv import load_dotenv
 
-load_dotenv()
+from src.services.radar_client import RadarError, RadarUnavailable, get_radar_client
+from src.utils.job_queue import PermanentJobError, task
 
 
 def geocode_address(messy_address):
-    url = "https://api.radar.io/v1/geocode/forward"
-    api_key = os.getenv("RADAR_API_KEY")
-
     logging.info(f"[RADAR] Geocoding address: '{messy_address}'")
 
-    headers = {"Authorization": api_key}
-    params = {"query": messy_address}
-
     try:
-        response = requests.get(url, headers=headers, params=params, timeout=10)
-        logging.info(f"[RADAR] Response status: {response.status_code}")
-
-        if response.status_code == 200:
-            data = response.json()
-            addresses = data.get("addresses", [])
-            logging.info(f"[RADAR] Found {len(addresses)} address results")
-
-            if addresses:
-                addr = addresses[0]
-                result = {
-                    "formatted_address": addr.get("formattedAddress"),
-                    "latitude": addr.get("latitude"),
-                    "longitude": addr.get("longitude"),
-                    "confidence": addr.get("confidence")
-                }
-                logging.info(f"[RADAR] Result: {result['formatted_address']} ({result['latitude']}, {result['longitude']}) confidence={result['confidence']}")
-                return result
-            else:
-                logging.warning(f"[RADAR] No addresses found for: '{messy_address}'")
+        data = get_radar_client().geocode_forward(messy_address)
+        addresses = data.get("addresses", [])
+        logging.info(f"[RADAR] Found {len(addresses)} address results")
+
+        if addresses:
+            addr = addresses[0]
+            result = {
+                "formatted_address": addr.get("formattedAddress"),
+                "latitude": addr.get("latitude"),
+                "longitude": addr.get("longitude"),
+                "confidence": addr.get("confidence")
+            }
+            logging.info(f"[RADAR] Result: {result['formatted_address']} ({result['latitude']}, {result['longitude']}) confidence={result['confidence']}")
+            return result
         else:
-            logging.error(f"[RADAR] API error {response.status_code}: {response.text[:200]}")
+            logging.warning(f"[RADAR] No addresses found for: '{messy_address}'")
 
+    except RadarUnavailable as e:
+        logging.warning(f"[RADAR] Skipped geocode for '{messy_address}': {e}")
+    except RadarError as e:
+        logging.error(f"[RADAR] API error {e}")
     except requests.exceptions.Timeout:
         logging.error(f"[RADAR] Request timed out for: '{messy_address}'")
     except Exception as e:
         logging.error(f"[RADAR] Exception: {e}")
 
     return None
+
+
+@task("technician.geocode_home", queue="geocode")
+def geocode_technician_home(payload):
+    """Job: geocode a technician's home address and store the coordinates.
+
+    Radar errors propagate so the job is retried. If the address was
+    changed again after the job was queued, the newer job wins and this
+    one does nothing.
+    """
+    address = payload["address"]
+    addresses = get_radar_client().geocode_forward(address).get("addresses", [])
+    if not addresses or addresses[0].get("latitude") is None:
+        raise PermanentJobError(f"no geocode result for '{address}'")
+    addr = addresses[0]
+    from src.utils.db import set_technician_home_location
+    if set_technician_home_location(payload["user_id"], address, addr["latitude"], addr["longitude"],
+                                    addr.get("formattedAddress")):
+        logging.info(f"[RADAR] Geocoded home for user {payload['user_id']}: '{address}' -> "
+                     f"({addr['latitude']}, {addr['longitude']})")
+    else:
+        logging.info(f"[RADAR] Home address for user {payload['user_id']} changed since '{address}' was queued")
@@ -0,0 +1,121 @@
+"""Customer appointment reminders.
+
+Runs every minute on the scheduler leader. Each run claims due reminders in
+batches with one ``UPDATE ... RETURNING`` (``claim_due_reminders``, which
+skips rows another dispatcher has locked), renders them in one pass and
+sends them over the pooled SMTP connections. Sends that fail are released
+so the next run retries them while the appointment is still upcoming.
+
+A claimed reminder counts as sent before the email goes out: if the process
+dies mid-batch those customers get no reminder, but nobody gets two.
+"""
+import os
+import time
+import logging
+
+from src.utils import metrics
+from src.utils.db import claim_due_reminders, release_reminders
+from src.utils.email_templates import render_batch
+from src.utils.mail_service import send_email_batch
+from src.utils.smtp_pool import smtp_configured
+
+REMINDER_HOURS_BEFORE = int(os.getenv("REMINDER_HOURS_BEFORE", "2"))
+REMINDER_BATCH_SIZE = int(os.getenv("REMINDER_BATCH_SIZE", "200"))
+# Batches per run; whatever is left is picked up a minute later
+REMINDER_MAX_BATCHES = int(os.getenv("REMINDER_MAX_BATCHES", "10"))
+# Appointment times are stored as wall-clock time in this zone
+REMINDER_TIMEZONE = os.getenv("REMINDER_TIMEZONE", "America/New_York")
+
+
+def _when(value):
+    return value.strftime("%A, %B %d at %I:%M %p").replace(" 0", " ") if value else ""
+
+
+def _send_batch(reminders):
+    """Send one claimed batch; returns ``(sent, failed, skipped)`` counts."""
+    deliverable = [r for r in reminders if r.get("customer_email")]
+    skipped = len(reminders) - len(deliverable)
+    rendered = render_batch("appointment_reminder", [
+        {
+            "customer_name": r.get("customer_name") or "",
+            "technician_name": r.get("technician_name") or "",
+            "service_type": (r.get("service_type") or "").replace("_", " ").title(),
+            "start_time": _when(r.get("start_time")),
+            "address": r.get("address") or "",
+        }
+        for r in deliverable
+    ])
+    results = send_email_batch([
+        {
+            "to_email": r["customer_email"],
+            "subject": email.subject,
+            "html_body": email.html,
+            "plain_body": email.text,
+        }
+        for r, email in zip(deliverable, rendered)
+    ])
+
+    failed_ids = []
+    for r, result in zip(deliverable, results):
+        if result["sent"]:
+            metrics.observe("reminder_send_lag_seconds", max(0.0, r["lag_seconds"] or 0.0))
+        else:
+            failed_ids.append(r["id"])
+            logging.error("[REMINDERS] Reminder for appointment %s to %s failed: %s",
+                          r["id"], r["customer_email"], result["error"])
+    release_reminders(failed_ids)
+
+    sent = len(deliverable) - len(failed_ids)
+    metrics.inc("reminders_total", sent, status="sent")
+    metrics.inc("reminders_total", len(failed_ids), status="failed")
+    metrics.inc("reminders_total", skipped, status="no_email")
+    return sent, len(failed_ids), skipped
+
+
+def dispatch_reminders():
+    """Send every due appointment reminder. Returns a run report."""
+    if not smtp_configured():
+        logging.warning("[REMINDERS] SMTP credentials not configured, reminders not sent")
+        return {"claimed": 0, "sent": 0, "failed": 0, "no_email": 0}
+
+    started = time.perf_counter()
+    claimed = sent = failed = skipped = 0
+    lags = []
+    for _ in range(REMINDER_MAX_BATCHES):
+        reminders = claim_due_reminders(REMINDER_HOURS_BEFORE, REMINDER_BATCH_SIZE, REMINDER_TIMEZONE)
+        if not reminders:
+            break
+        claimed += len(reminders)
+        lags.extend(r["lag_seconds"] or 0.0 for r in reminders)
+        batch_sent, batch_failed, batch_skipped = _send_batch(reminders)
+        sent += batch_sent
+        failed += batch_failed
+        skipped += batch_skipped
+        if len(reminders) < REMINDER_BATCH_SIZE or batch_failed:
+            # Released failures would be claimed again straight away
+            break
+
+    report = {
+        "claimed": claimed,
+        "sent": sent,
+        "failed": failed,
+        "no_email": skipped,
+        "lag_seconds": {
+            "max": round(max(lags), 1) if lags else None,
+            "avg": round(sum(lags) / len(lags), 1) if lags else None,
+        },
+        "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+    if claimed:
+        logging.info(
+            "[REMINDERS] %d sent, %d failed, %d without email; lag avg=%ss max=%ss (%.0fms)",
+            sent, failed, skipped, report["lag_seconds"]["avg"], report["lag_seconds"]["max"],
+            report["duration_ms"],
+        )
+    return report
+
+
+metrics.describe("reminders_total", "counter", "Appointment reminders by outcome (sent, failed, no_email)")
+metrics.describe("reminder_send_lag_seconds", "histogram",
+                 "Delay between a reminder's intended send time and its delivery",
+                 buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600))
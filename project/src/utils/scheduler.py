@@ -0,0 +1,315 @@
+"""Leader-elected cron scheduler.
+
+Every app process creates a ``LeaderScheduler``, but only the one holding
+the Postgres session advisory lock ``SCHEDULER_LOCK_KEY`` runs the jobs,
+so N uvicorn/gunicorn workers still send one copy of each email.
+
+- Election: each process retries ``pg_try_advisory_lock`` every
+  ``SCHEDULER_ELECTION_SECONDS`` on a dedicated connection. The leader
+  checks that connection on the same interval and steps down if it is
+  gone. When the leader dies its session ends, Postgres drops the lock and
+  the next process to try takes over.
+- Catch-up: a new leader runs cron jobs whose last fire time fell within
+  ``SCHEDULER_CATCHUP_SECONDS`` and has no recorded run, so a 6 PM job is
+  not lost because the old leader died at 5:59.
+- History: every run is a row in ``scheduler_job_runs`` (holder, scheduled
+  time, duration, outcome, error). Cron runs are unique per scheduled time,
+  so even two leaders (e.g. during a network partition) cannot both run
+  the same slot.
+"""
+import os
+import json
+import time
+import socket
+import logging
+import threading
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import psycopg2
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.triggers.cron import CronTrigger
+
+from src.utils import metrics
+from src.utils.db import get_db_connection
+
+SCHEDULER_LOCK_KEY = int(os.getenv("SCHEDULER_LOCK_KEY", "727100"))
+SCHEDULER_ELECTION_SECONDS = float(os.getenv("SCHEDULER_ELECTION_SECONDS", "10"))
+SCHEDULER_CATCHUP_SECONDS = float(os.getenv("SCHEDULER_CATCHUP_SECONDS", "900"))
+SCHEDULER_HISTORY_DAYS = int(os.getenv("SCHEDULER_HISTORY_DAYS", "30"))
+
+HOLDER = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def ensure_scheduler_schema(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS scheduler_job_runs (
+            id BIGSERIAL PRIMARY KEY,
+            job_id VARCHAR(100) NOT NULL,
+            holder VARCHAR(255) NOT NULL,
+            scheduled_for TIMESTAMPTZ,
+            started_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            finished_at TIMESTAMPTZ,
+            duration_ms DOUBLE PRECISION,
+            status VARCHAR(20) NOT NULL DEFAULT 'running',
+            error TEXT,
+            result JSONB
+        )
+    """)
+    # One run per cron slot, whichever process got there first
+    cur.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_scheduler_job_runs_slot
+        ON scheduler_job_runs (job_id, scheduled_for) WHERE scheduled_for IS NOT NULL
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_scheduler_job_runs_recent
+        ON scheduler_job_runs (job_id, started_at DESC)
+    """)
+
+
+def _start_run(job_id, scheduled_for):
+    """Insert a 'running' row; returns its id, or None if the slot already ran."""
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            INSERT INTO scheduler_job_runs (job_id, holder, scheduled_for)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (job_id, scheduled_for) WHERE scheduled_for IS NOT NULL DO NOTHING
+            RETURNING id
+        """, (job_id, HOLDER, scheduled_for))
+        row = cur.fetchone()
+        conn.commit()
+        return row[0] if row else None
+    finally:
+        cur.close()
+        conn.close()
+
+
+def _finish_run(run_id, status, duration_ms, error=None, result=None):
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            UPDATE scheduler_job_runs
+            SET finished_at = now(), duration_ms = %s, status = %s, error = %s, result = %s
+            WHERE id = %s
+        """, (duration_ms, status, error, json.dumps(result, default=str) if result is not None else None,
+              run_id))
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+
+
+def _slot_already_run(job_id, scheduled_for):
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            SELECT 1 FROM scheduler_job_runs WHERE job_id = %s AND scheduled_for = %s
+        """, (job_id, scheduled_for))
+        return cur.fetchone() is not None
+    finally:
+        cur.close()
+        conn.close()
+
+
+def get_job_runs(job_id=None, limit=50):
+    from psycopg2.extras import RealDictCursor
+    conn = get_db_connection()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        if job_id:
+            cur.execute("""
+                SELECT * FROM scheduler_job_runs WHERE job_id = %s
+                ORDER BY started_at DESC LIMIT %s
+            """, (job_id, limit))
+        else:
+            cur.execute("SELECT * FROM scheduler_job_runs ORDER BY started_at DESC LIMIT %s", (limit,))
+        return [dict(r) for r in cur.fetchall()]
+    finally:
+        cur.close()
+        conn.close()
+
+
+def prune_job_runs(days=None):
+    """Drop run history older than ``SCHEDULER_HISTORY_DAYS``."""
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            DELETE FROM scheduler_job_runs WHERE started_at < now() - make_interval(days => %s)
+        """, (days or SCHEDULER_HISTORY_DAYS,))
+        conn.commit()
+        return {"deleted": cur.rowcount}
+    finally:
+        cur.close()
+        conn.close()
+
+
+def _previous_fire_time(trigger, now, within_seconds):
+    """Most recent cron fire time in ``(now - within_seconds, now]``, or None."""
+    candidate = trigger.get_next_fire_time(None, now - timedelta(seconds=within_seconds))
+    if candidate is None or candidate > now:
+        return None
+    while True:
+        following = trigger.get_next_fire_time(candidate, candidate + timedelta(microseconds=1))
+        if following is None or following > now:
+            return candidate
+        candidate = following
+
+
+class LeaderScheduler:
+
+    def __init__(self, lock_key=SCHEDULER_LOCK_KEY, election_seconds=SCHEDULER_ELECTION_SECONDS):
+        self.lock_key = lock_key
+        self.election_seconds = election_seconds
+        self._jobs = []  # (func, trigger, id, name)
+        self._scheduler = None
+        self._lock_conn = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._state_lock = threading.Lock()
+
+    @property
+    def is_leader(self):
+        return self._scheduler is not None
+
+    def add_job(self, func, trigger, id, name=None):
+        self._jobs.append((func, trigger, id, name or id))
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="scheduler-election", daemon=True)
+        self._thread.start()
+
+    def shutdown(self, timeout=5):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+        with self._state_lock:
+            self._step_down("shutdown", wait=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                with self._state_lock:
+                    self._tick()
+            except Exception as e:
+                logging.error(f"[SCHEDULER] Election error: {e}")
+            self._stop.wait(self.election_seconds)
+
+    def _tick(self):
+        if self.is_leader:
+            if not self._lock_alive():
+                self._step_down("lost the lock connection")
+            return
+        if self._try_acquire():
+            self._become_leader()
+
+    def _try_acquire(self):
+        if self._lock_conn is None or self._lock_conn.closed:
+            # Dedicated session: the advisory lock lives exactly as long as it
+            self._lock_conn = psycopg2.connect(
+                os.getenv("DATABASE_URL"), application_name=f"uhs-scheduler {HOLDER}",
+                keepalives=1, keepalives_idle=30, keepalives_interval=10, keepalives_count=3,
+            )
+            self._lock_conn.autocommit = True
+        with self._lock_conn.cursor() as cur:
+            cur.execute("SELECT pg_try_advisory_lock(%s)", (self.lock_key,))
+            return cur.fetchone()[0]
+
+    def _lock_alive(self):
+        try:
+            with self._lock_conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            return True
+        except Exception:
+            return False
+
+    def _become_leader(self):
+        scheduler = BackgroundScheduler()
+        for func, trigger, job_id, name in self._jobs:
+            scheduler.add_job(self._job_runner(func, trigger, job_id), trigger,
+                              id=job_id, name=name, replace_existing=True)
+        scheduler.start()
+        self._scheduler = scheduler
+        logging.info(f"[SCHEDULER] {HOLDER} is now the scheduler leader ({len(self._jobs)} jobs)")
+        metrics.inc("scheduler_leader_elections_total")
+        self._catch_up()
+
+    def _step_down(self, reason, wait=False):
+        if self._scheduler is not None:
+            # Runs already in flight finish and record their outcome either way
+            self._scheduler.shutdown(wait=wait)
+            self._scheduler = None
+            logging.warning(f"[SCHEDULER] {HOLDER} stepped down: {reason}")
+        if self._lock_conn is not None:
+            try:
+                self._lock_conn.close()
+            except Exception:
+                pass
+            self._lock_conn = None
+
+    def _catch_up(self):
+        now = datetime.now(ZoneInfo("UTC"))
+        for func, trigger, job_id, name in self._jobs:
+            if not isinstance(trigger, CronTrigger):
+                continue
+            missed = _previous_fire_time(trigger, now, SCHEDULER_CATCHUP_SECONDS)
+            if missed is not None and not _slot_already_run(job_id, missed):
+                logging.warning(f"[SCHEDULER] Running missed {job_id} scheduled for {missed}")
+                self._scheduler.add_job(self._job_runner(func, trigger, job_id, missed),
+                                        id=f"{job_id}-catchup", replace_existing=True)
+
+    def _job_runner(self, func, trigger, job_id, scheduled_for=None):
+        def run():
+            slot = scheduled_for
+            if slot is None and isinstance(trigger, CronTrigger):
+                slot = _previous_fire_time(trigger, datetime.now(ZoneInfo("UTC")), 60)
+            run_id = _start_run(job_id, slot)
+            if run_id is None:
+                logging.warning(f"[SCHEDULER] {job_id} for {slot} already ran elsewhere; skipping")
+                metrics.inc("scheduler_job_runs_total", job=job_id, status="duplicate")
+                return
+            started = time.perf_counter()
+            status, error, result = "success", None, None
+            try:
+                result = func()
+            except Exception as e:
+                status, error = "failed", f"{type(e).__name__}: {e}"
+                logging.error(f"[SCHEDULER] {job_id} failed: {error}")
+            duration_ms = round((time.perf_counter() - started) * 1000, 1)
+            try:
+                _finish_run(run_id, status, duration_ms, error, result)
+            except Exception as e:
+                logging.error(f"[SCHEDULER] Could not record {job_id} run {run_id}: {e}")
+            metrics.inc("scheduler_job_runs_total", job=job_id, status=status)
+            metrics.observe("scheduler_job_duration_seconds", duration_ms / 1000, job=job_id)
+        return run
+
+
+_scheduler = None
+
+
+def start_scheduler(jobs):
+    """Start leader election for ``jobs`` (``(func, trigger, id, name)`` tuples)."""
+    global _scheduler
+    _scheduler = LeaderScheduler()
+    for func, trigger, job_id, name in jobs:
+        _scheduler.add_job(func, trigger, job_id, name)
+    _scheduler.start()
+    return _scheduler
+
+
+def stop_scheduler():
+    if _scheduler is not None:
+        _scheduler.shutdown()
+
+
+metrics.register_gauge("scheduler_is_leader", "1 if this process currently runs the scheduled jobs",
+                       lambda: 1 if _scheduler is not None and _scheduler.is_leader else 0)
+metrics.describe("scheduler_leader_elections_total", "counter", "Times this process became scheduler leader")
+metrics.describe("scheduler_job_runs_total", "counter",
+                 "Scheduled job runs by job and status (success, failed, duplicate)")
+metrics.describe("scheduler_job_duration_seconds", "histogram", "Scheduled job run time")
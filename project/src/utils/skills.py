@@ -0,0 +1,210 @@
+"""Canonical service taxonomy and technician skill matching.
+
+Technicians type their skills as free text ("Chimney Cleaning", "gutters",
+"pressure washing") which is kept as-is in ``technicians.skills`` for
+display. Each entry is also resolved once, in memory, to a row of the
+``services`` table and stored in ``technician_skills`` so skill filters
+are indexed equality joins instead of ``skills::text ILIKE``.
+"""
+import re
+import logging
+import threading
+
+from psycopg2.extras import execute_values
+
+from src.utils.db import _connect, get_db_connection, run_bootstrap_once
+
+# key -> (display name, extra aliases, single-word keywords)
+SERVICE_CATALOG = {
+    "chimney": (
+        "Chimney Cleaning",
+        ["chimney cleaning", "chimney sweep", "chimney sweeping", "chimney inspection"],
+        ["chimney", "chimneys", "flue"],
+    ),
+    "dryer_vent": (
+        "Dryer Vent Cleaning",
+        ["dryer vent", "dryer vent cleaning", "dryer vents", "vent cleaning"],
+        ["dryer", "vent", "vents"],
+    ),
+    "gutter": (
+        "Gutter Cleaning",
+        ["gutter cleaning", "gutters", "gutter guard"],
+        ["gutter", "gutters"],
+    ),
+    "power_washing": (
+        "Power Washing",
+        ["power washing", "power wash", "power washer", "pressure washing", "pressure wash",
+         "pressure washer", "powerwashing"],
+        # Not bare "wash"/"washing": "window washing" is not power washing
+        ["power", "pressure", "powerwash", "powerwasher"],
+    ),
+    "air_duct": (
+        "Air Duct Cleaning",
+        ["air duct", "air duct cleaning", "air ducts", "duct cleaning"],
+        ["duct", "ducts", "ductwork"],
+    ),
+}
+
+# Keywords dropped from the catalog; removed from the services table too,
+# since the upsert keeps keywords it finds there
+RETIRED_KEYWORDS = {
+    "power_washing": ["wash", "washing"],
+}
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+_lock = threading.Lock()
+_aliases = None   # normalized alias -> service id
+_keywords = None  # single word -> service id
+
+
+def normalize_skill(text):
+    return _NON_WORD.sub(" ", str(text).lower()).strip()
+
+
+def ensure_skills_schema(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS services (
+            id SERIAL PRIMARY KEY,
+            key VARCHAR(50) UNIQUE NOT NULL,
+            name VARCHAR(100) NOT NULL,
+            aliases TEXT[] NOT NULL DEFAULT '{}',
+            keywords TEXT[] NOT NULL DEFAULT '{}'
+        )
+    """)
+    # Primary key order serves "techs with service X"; the second index
+    # serves per-tech rewrites and the technicians FK.
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS technician_skills (
+            service_id INTEGER NOT NULL REFERENCES services(id),
+            technician_id INTEGER NOT NULL REFERENCES technicians(id) ON DELETE CASCADE,
+            PRIMARY KEY (service_id, technician_id)
+        )
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_technician_skills_technician
+        ON technician_skills (technician_id)
+    """)
+    # Catalog entries are upserted; aliases added by hand in the DB are kept
+    for key, (name, aliases, keywords) in SERVICE_CATALOG.items():
+        cur.execute("""
+            INSERT INTO services (key, name, aliases, keywords)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (key) DO UPDATE SET
+                name = EXCLUDED.name,
+                aliases = ARRAY(SELECT DISTINCT unnest(services.aliases || EXCLUDED.aliases)),
+                keywords = ARRAY(SELECT DISTINCT unnest(services.keywords || EXCLUDED.keywords))
+        """, (key, name, aliases, keywords))
+    for key, retired in RETIRED_KEYWORDS.items():
+        cur.execute("""
+            UPDATE services
+            SET keywords = ARRAY(SELECT k FROM unnest(keywords) AS k WHERE k <> ALL(%s))
+            WHERE key = %s AND keywords && %s
+        """, (retired, key, retired))
+
+
+def load_services():
+    """Build the in-memory alias and keyword maps from the services table."""
+    global _aliases, _keywords
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT id, key, name, aliases, keywords FROM services ORDER BY id")
+        rows = cur.fetchall()
+    finally:
+        cur.close()
+        conn.close()
+    _install_services(rows)
+    logging.info(f"[SKILLS] Loaded {len(rows)} services, {len(_aliases)} aliases")
+
+
+def _install_services(rows):
+    """Swap in maps built from ``(id, key, name, aliases, keywords)`` rows."""
+    global _aliases, _keywords
+    aliases = {}
+    keywords = {}
+    for service_id, key, name, service_aliases, service_keywords in rows:
+        for alias in [key, name] + list(service_aliases):
+            aliases.setdefault(normalize_skill(alias), service_id)
+        for word in service_keywords:
+            keywords.setdefault(normalize_skill(word), service_id)
+    with _lock:
+        _aliases, _keywords = aliases, keywords
+
+
+def resolve_service_id(text):
+    """Service id for a free-text skill or service type, or None.
+
+    Whole-phrase aliases win; otherwise the first word that is a keyword
+    decides, so "repair" no longer matches "air" the way ILIKE did.
+    """
+    if _aliases is None:
+        load_services()
+    normalized = normalize_skill(text or "")
+    if not normalized:
+        return None
+    service_id = _aliases.get(normalized)
+    if service_id is not None:
+        return service_id
+    for word in normalized.split():
+        service_id = _keywords.get(word)
+        if service_id is not None:
+            return service_id
+    return None
+
+
+def resolve_service_ids(skills):
+    ids = []
+    for skill in skills or []:
+        service_id = resolve_service_id(skill)
+        if service_id is None:
+            logging.info(f"[SKILLS] No service matches skill '{skill}'")
+        elif service_id not in ids:
+            ids.append(service_id)
+    return ids
+
+
+def sync_technician_skills(cur, technician_id, skills):
+    """Rewrite one tech's technician_skills rows inside the caller's transaction."""
+    cur.execute("DELETE FROM technician_skills WHERE technician_id = %s", (technician_id,))
+    service_ids = resolve_service_ids(skills)
+    if service_ids:
+        execute_values(
+            cur,
+            "INSERT INTO technician_skills (service_id, technician_id) VALUES %s",
+            [(service_id, technician_id) for service_id in service_ids],
+        )
+    return service_ids
+
+
+def rebuild_technician_skills(conn=None):
+    """Re-derive technician_skills for every technician from the JSONB column."""
+    load_services()
+    conn = _connect(conn)
+    cur = conn.cursor()
+    try:
+        # Skill edits rewrite their rows in the same transaction; hold them off
+        # between the read and the rewrite
+        cur.execute("LOCK TABLE technicians IN SHARE MODE")
+        cur.execute("SELECT id, skills FROM technicians WHERE skills IS NOT NULL")
+        pairs = []
+        for technician_id, skills in cur.fetchall():
+            if isinstance(skills, list):
+                pairs.extend((sid, technician_id) for sid in resolve_service_ids(skills))
+        cur.execute("DELETE FROM technician_skills")
+        if pairs:
+            execute_values(
+                cur, "INSERT INTO technician_skills (service_id, technician_id) VALUES %s",
+                pairs, page_size=1000,
+            )
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+    logging.info(f"[SKILLS] Rebuilt technician_skills: {len(pairs)} rows")
+
+
+def bootstrap_technician_skills():
+    """Load aliases; backfill the join table once against an existing database."""
+    load_services()
+    run_bootstrap_once("technician_skills", rebuild_technician_skills)
@@ -0,0 +1,154 @@
+"""Process-wide pool of long-lived, authenticated SMTP connections.
+
+Opening a connection costs a TCP connect, STARTTLS and AUTH; the pool keeps
+up to ``SMTP_POOL_SIZE`` of them open and hands them out one caller at a
+time. Connections idle for longer than ``SMTP_POOL_IDLE_TIMEOUT`` seconds
+are assumed to have been dropped by the server and are reopened.
+"""
+import os
+import time
+import queue
+import smtplib
+import logging
+import threading
+from contextlib import contextmanager
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from dotenv import load_dotenv
+
+from src.utils import metrics
+
+load_dotenv()
+
+MAIL_SENDER = os.getenv("MAIL_SENDER")
+MAIL_PASSWORD = os.getenv("MAIL_PASSWORD")
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "4"))
+SMTP_POOL_IDLE_TIMEOUT = float(os.getenv("SMTP_POOL_IDLE_TIMEOUT", "60"))
+SMTP_POOL_ACQUIRE_TIMEOUT = float(os.getenv("SMTP_POOL_ACQUIRE_TIMEOUT", "30"))
+
+
+def smtp_configured():
+    return bool(MAIL_SENDER and MAIL_PASSWORD)
+
+
+def build_message(to_email, subject, html_body, plain_body=None):
+    msg = MIMEMultipart("alternative")
+    msg["From"] = MAIL_SENDER
+    msg["To"] = to_email
+    msg["Subject"] = subject
+    if plain_body:
+        msg.attach(MIMEText(plain_body, "plain"))
+    msg.attach(MIMEText(html_body, "html"))
+    return msg
+
+
+def _open_smtp():
+    with metrics.timed("external_call_duration_seconds", service="smtp", operation="connect"):
+        server = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=30)
+        try:
+            server.starttls()
+            server.login(MAIL_SENDER, MAIL_PASSWORD)
+        except Exception:
+            server.close()
+            raise
+    return server
+
+
+def _close_smtp(server):
+    try:
+        server.quit()
+    except Exception:
+        server.close()
+
+
+class SMTPConnectionPool:
+    """Bounded pool of authenticated SMTP connections.
+
+    Slots start empty and are filled lazily, so an idle process holds no
+    connections. ``connection()`` blocks for up to ``acquire_timeout``
+    seconds when every slot is in use.
+    """
+
+    def __init__(self, size=SMTP_POOL_SIZE, idle_timeout=SMTP_POOL_IDLE_TIMEOUT,
+                 acquire_timeout=SMTP_POOL_ACQUIRE_TIMEOUT):
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.acquire_timeout = acquire_timeout
+        # LIFO so the most recently used (least likely to be dropped)
+        # connection is handed out first.
+        self._slots = queue.LifoQueue(maxsize=size)
+        for _ in range(size):
+            self._slots.put((None, 0.0))
+        self.connects = 0
+        self.reuses = 0
+
+    @contextmanager
+    def connection(self):
+        try:
+            server, last_used = self._slots.get(timeout=self.acquire_timeout)
+        except queue.Empty:
+            raise TimeoutError("Timed out waiting for a pooled SMTP connection")
+        try:
+            if server is not None and time.monotonic() - last_used > self.idle_timeout:
+                _close_smtp(server)
+                server = None
+            if server is None:
+                server = _open_smtp()
+                self.connects += 1
+            else:
+                self.reuses += 1
+            yield server
+        except Exception:
+            # The connection state is unknown after a failure; drop it
+            if server is not None:
+                _close_smtp(server)
+            server = None
+            raise
+        finally:
+            self._slots.put((server, time.monotonic()))
+
+    def send(self, msg):
+        """Send one message, retrying once on a fresh connection if the
+        server closed the pooled one."""
+        with metrics.timed("external_call_duration_seconds", service="smtp", operation="send"):
+            try:
+                with self.connection() as server:
+                    server.send_message(msg)
+            except smtplib.SMTPServerDisconnected:
+                with self.connection() as server:
+                    server.send_message(msg)
+
+    def close(self):
+        # Take every slot before refilling: the queue is LIFO, so putting a
+        # sentinel back straight away would hand it to the next get
+        drained = []
+        for _ in range(self.size):
+            try:
+                drained.append(self._slots.get(timeout=self.acquire_timeout))
+            except queue.Empty:
+                break
+        for server, _ in drained:
+            if server is not None:
+                _close_smtp(server)
+        for _ in drained:
+            self._slots.put((None, 0.0))
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_smtp_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = SMTPConnectionPool()
+    return _pool
+
+
+def close_smtp_pool():
+    if _pool is not None:
+        _pool.close()
@@ -0,0 +1,257 @@
+"""Dashboard statistics backed by incrementally maintained daily rollups.
+
+The rollup tables are kept in sync by row triggers on ``appointments`` and
+``call_logs``, so every write path (db helpers, raw SQL in the Retell tools,
+manual fixes in psql) updates them inside the same transaction. The stats
+endpoints only ever read the small rollup tables plus a bounded live delta
+for the current day.
+"""
+import logging
+
+from psycopg2.extras import RealDictCursor
+
+from src.utils.db import _connect, get_db_connection, run_bootstrap_once
+from src.utils.metrics import instrument_module
+
+# Rollup bucket used for rows whose timestamp is NULL so they still count
+# towards the totals.
+_NULL_DAY = "1970-01-01"
+
+
+def ensure_stats_schema(cur):
+    """Create the rollup tables, bump functions and triggers (idempotent)."""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS appointment_daily_stats (
+            day DATE NOT NULL,
+            status VARCHAR(50) NOT NULL,
+            appointment_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, status)
+        )
+    """)
+
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS call_daily_stats (
+            day DATE NOT NULL,
+            direction VARCHAR(20) NOT NULL,
+            disconnection_reason VARCHAR(100) NOT NULL,
+            call_count INTEGER NOT NULL DEFAULT 0,
+            duration_count INTEGER NOT NULL DEFAULT 0,
+            duration_total BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, direction, disconnection_reason)
+        )
+    """)
+
+    # Backs the live "upcoming today" delta in get_appointment_stats
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_appointments_scheduled_start
+        ON appointments (start_time) WHERE status = 'scheduled'
+    """)
+
+    cur.execute(f"""
+        CREATE OR REPLACE FUNCTION appointment_daily_stats_bump(
+            p_start TIMESTAMP, p_status VARCHAR, p_sign INTEGER
+        ) RETURNS VOID AS $$
+            INSERT INTO appointment_daily_stats (day, status, appointment_count)
+            VALUES (COALESCE(p_start::date, DATE '{_NULL_DAY}'), COALESCE(p_status, ''), p_sign)
+            ON CONFLICT (day, status) DO UPDATE
+            SET appointment_count = appointment_daily_stats.appointment_count + EXCLUDED.appointment_count
+        $$ LANGUAGE sql
+    """)
+
+    cur.execute("""
+        CREATE OR REPLACE FUNCTION appointment_daily_stats_trigger() RETURNS TRIGGER AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                PERFORM appointment_daily_stats_bump(OLD.start_time, OLD.status, -1);
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                PERFORM appointment_daily_stats_bump(NEW.start_time, NEW.status, 1);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+
+    cur.execute(f"""
+        CREATE OR REPLACE FUNCTION call_daily_stats_bump(
+            p_created TIMESTAMP, p_direction VARCHAR, p_reason VARCHAR,
+            p_duration INTEGER, p_sign INTEGER
+        ) RETURNS VOID AS $$
+            INSERT INTO call_daily_stats
+                (day, direction, disconnection_reason, call_count, duration_count, duration_total)
+            VALUES (
+                COALESCE(p_created::date, DATE '{_NULL_DAY}'),
+                COALESCE(p_direction, ''),
+                COALESCE(p_reason, ''),
+                p_sign,
+                CASE WHEN p_duration > 0 THEN p_sign ELSE 0 END,
+                CASE WHEN p_duration > 0 THEN p_sign * p_duration ELSE 0 END
+            )
+            ON CONFLICT (day, direction, disconnection_reason) DO UPDATE SET
+                call_count = call_daily_stats.call_count + EXCLUDED.call_count,
+                duration_count = call_daily_stats.duration_count + EXCLUDED.duration_count,
+                duration_total = call_daily_stats.duration_total + EXCLUDED.duration_total
+        $$ LANGUAGE sql
+    """)
+
+    cur.execute("""
+        CREATE OR REPLACE FUNCTION call_daily_stats_trigger() RETURNS TRIGGER AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                PERFORM call_daily_stats_bump(
+                    OLD.created_at, OLD.direction, OLD.disconnection_reason,
+                    OLD.duration_seconds, -1
+                );
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                PERFORM call_daily_stats_bump(
+                    NEW.created_at, NEW.direction, NEW.disconnection_reason,
+                    NEW.duration_seconds, 1
+                );
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+
+    cur.execute("DROP TRIGGER IF EXISTS appointments_daily_stats_ins_del ON appointments")
+    cur.execute("""
+        CREATE TRIGGER appointments_daily_stats_ins_del
+        AFTER INSERT OR DELETE ON appointments
+        FOR EACH ROW EXECUTE FUNCTION appointment_daily_stats_trigger()
+    """)
+    cur.execute("DROP TRIGGER IF EXISTS appointments_daily_stats_upd ON appointments")
+    cur.execute("""
+        CREATE TRIGGER appointments_daily_stats_upd
+        AFTER UPDATE OF start_time, status ON appointments
+        FOR EACH ROW
+        WHEN (OLD.start_time IS DISTINCT FROM NEW.start_time
+              OR OLD.status IS DISTINCT FROM NEW.status)
+        EXECUTE FUNCTION appointment_daily_stats_trigger()
+    """)
+
+    cur.execute("DROP TRIGGER IF EXISTS call_logs_daily_stats_ins_del ON call_logs")
+    cur.execute("""
+        CREATE TRIGGER call_logs_daily_stats_ins_del
+        AFTER INSERT OR DELETE ON call_logs
+        FOR EACH ROW EXECUTE FUNCTION call_daily_stats_trigger()
+    """)
+    cur.execute("DROP TRIGGER IF EXISTS call_logs_daily_stats_upd ON call_logs")
+    cur.execute("""
+        CREATE TRIGGER call_logs_daily_stats_upd
+        AFTER UPDATE OF created_at, direction, disconnection_reason, duration_seconds ON call_logs
+        FOR EACH ROW
+        WHEN (OLD.created_at IS DISTINCT FROM NEW.created_at
+              OR OLD.direction IS DISTINCT FROM NEW.direction
+              OR OLD.disconnection_reason IS DISTINCT FROM NEW.disconnection_reason
+              OR OLD.duration_seconds IS DISTINCT FROM NEW.duration_seconds)
+        EXECUTE FUNCTION call_daily_stats_trigger()
+    """)
+
+
+def rebuild_stats_rollups(conn=None):
+    """Recompute both rollup tables from the base tables.
+
+    Takes SHARE locks so no writes land between the wipe and the re-insert.
+    Needed once when the triggers are first installed on a populated
+    database, or after a TRUNCATE (which does not fire row triggers).
+    """
+    conn = _connect(conn)
+    cur = conn.cursor()
+    try:
+        cur.execute("LOCK TABLE appointments, call_logs IN SHARE MODE")
+        cur.execute("DELETE FROM appointment_daily_stats")
+        cur.execute(f"""
+            INSERT INTO appointment_daily_stats (day, status, appointment_count)
+            SELECT COALESCE(start_time::date, DATE '{_NULL_DAY}'), COALESCE(status, ''), COUNT(*)
+            FROM appointments
+            GROUP BY 1, 2
+        """)
+        cur.execute("DELETE FROM call_daily_stats")
+        cur.execute(f"""
+            INSERT INTO call_daily_stats
+                (day, direction, disconnection_reason, call_count, duration_count, duration_total)
+            SELECT
+                COALESCE(created_at::date, DATE '{_NULL_DAY}'),
+                COALESCE(direction, ''),
+                COALESCE(disconnection_reason, ''),
+                COUNT(*),
+                COUNT(*) FILTER (WHERE duration_seconds > 0),
+                COALESCE(SUM(duration_seconds) FILTER (WHERE duration_seconds > 0), 0)
+            FROM call_logs
+            GROUP BY 1, 2, 3
+        """)
+        conn.commit()
+        logging.info("[STATS] Rollup tables rebuilt from base tables")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+
+def bootstrap_stats_rollups():
+    """Backfill the rollups once, the first time the triggers are installed.
+
+    Decided by a ``schema_bootstraps`` marker rather than by the rollups
+    being empty: trigger writes from other workers can land before this
+    runs, and an empty check lets two starting workers both rebuild.
+    """
+    run_bootstrap_once("stats_rollups", rebuild_stats_rollups)
+
+
+def get_appointment_stats():
+    conn = get_db_connection()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        # Future days come from the rollup; today's not-yet-started
+        # appointments are a small indexed live count.
+        cur.execute("""
+            SELECT
+                COALESCE(SUM(appointment_count), 0) as total,
+                COALESCE(SUM(appointment_count) FILTER (WHERE status = 'scheduled'), 0) as scheduled,
+                COALESCE(SUM(appointment_count) FILTER (WHERE status = 'completed'), 0) as completed,
+                COALESCE(SUM(appointment_count) FILTER (WHERE status = 'cancelled'), 0) as cancelled,
+                COALESCE(SUM(appointment_count) FILTER (WHERE status = 'no_show'), 0) as no_show,
+                COALESCE(SUM(appointment_count) FILTER (
+                    WHERE status = 'scheduled' AND day > CURRENT_DATE
+                ), 0) + (
+                    SELECT COUNT(*) FROM appointments
+                    WHERE status = 'scheduled'
+                      AND start_time > NOW()
+                      AND start_time < CURRENT_DATE + 1
+                ) as upcoming
+            FROM appointment_daily_stats
+        """)
+        return dict(cur.fetchone())
+    finally:
+        cur.close()
+        conn.close()
+
+
+def get_call_stats():
+    conn = get_db_connection()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        cur.execute("""
+            SELECT
+                COALESCE(SUM(call_count), 0) as total_calls,
+                COALESCE(SUM(call_count) FILTER (WHERE direction = 'inbound'), 0) as inbound,
+                COALESCE(SUM(call_count) FILTER (WHERE direction = 'outbound'), 0) as outbound,
+                COALESCE(SUM(call_count) FILTER (WHERE disconnection_reason = 'user_hangup'), 0) as user_hangup,
+                COALESCE(SUM(call_count) FILTER (WHERE disconnection_reason = 'agent_hangup'), 0) as agent_hangup,
+                COALESCE(SUM(call_count) FILTER (WHERE disconnection_reason LIKE 'dial_%'), 0) as failed,
+                COALESCE(SUM(duration_total)::numeric / NULLIF(SUM(duration_count), 0), 0) as avg_duration_seconds,
+                COALESCE(SUM(call_count) FILTER (WHERE day = CURRENT_DATE), 0) as today,
+                COALESCE(SUM(call_count) FILTER (WHERE day >= CURRENT_DATE - 7), 0) as last_7_days
+            FROM call_daily_stats
+        """)
+        stats = cur.fetchone()
+        return dict(stats) if stats else {}
+    finally:
+        cur.close()
+        conn.close()
+
+
+instrument_module(globals(), "db_helper_duration_seconds", "helper")
@@ -0,0 +1,195 @@
+"""Lightweight span tracing for the Retell tool endpoints.
+
+A tool call opens a root span with ``traced_tool``; code underneath opens
+child spans with ``span("phase")``. The active span lives in a context
+variable, so nothing has to be threaded through call signatures and
+``span`` is a cheap no-op outside a traced call.
+
+Finished traces go to an in-memory ring buffer (served by the admin
+traces endpoint) and are appended to a JSONL file. A call that uses more
+than ``TRACE_SLOW_FRACTION`` of its Retell timeout is flagged.
+"""
+import os
+import json
+import time
+import uuid
+import logging
+import functools
+import threading
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "500"))
+TRACE_JSONL_PATH = os.getenv("TRACE_JSONL_PATH", "logs/tool_traces.jsonl")
+TRACE_SLOW_FRACTION = float(os.getenv("TRACE_SLOW_FRACTION", "0.5"))
+
+# Tool timeouts configured for the Retell agent (retell_import_ready.json)
+TOOL_TIMEOUTS = {
+    "verify_zip": 10.0,
+    "verify_address": 20.0,
+    "check_technician_availability": 20.0,
+    "book_appointment": 20.0,
+    "cancel_appointment": 20.0,
+    "book_redo_appointment": 20.0,
+    "get_current_datetime": 5.0,
+    "simulate_manager_check": 10.0,
+}
+
+_current = ContextVar("current_span", default=None)
+_buffer = deque(maxlen=TRACE_BUFFER_SIZE)
+_buffer_lock = threading.Lock()
+_file_lock = threading.Lock()
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "parent", "attributes", "children",
+                 "started", "duration_ms", "error", "deadline")
+
+    def __init__(self, name, trace_id, parent=None, deadline=None, attributes=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.parent = parent
+        self.attributes = attributes or {}
+        self.children = []
+        self.started = time.perf_counter()
+        self.duration_ms = None
+        self.error = None
+        self.deadline = deadline
+
+    def finish(self):
+        self.duration_ms = round((time.perf_counter() - self.started) * 1000, 2)
+
+    def to_dict(self, root_started=None):
+        root_started = self.started if root_started is None else root_started
+        out = {
+            "name": self.name,
+            "offset_ms": round((self.started - root_started) * 1000, 2),
+            "duration_ms": self.duration_ms,
+        }
+        if self.attributes:
+            out["attributes"] = self.attributes
+        if self.error:
+            out["error"] = self.error
+        if self.children:
+            out["children"] = [c.to_dict(root_started) for c in self.children]
+        return out
+
+
+def current_span():
+    return _current.get()
+
+
+def set_attribute(key, value):
+    active = _current.get()
+    if active is not None:
+        active.attributes[key] = value
+
+
+def remaining_seconds():
+    """Time left before the current tool call hits its Retell timeout, or
+    None outside a traced call."""
+    active = _current.get()
+    if active is None or active.deadline is None:
+        return None
+    return active.deadline - time.perf_counter()
+
+
+@contextmanager
+def span(name, **attributes):
+    parent = _current.get()
+    if parent is None:
+        yield None
+        return
+    child = Span(name, parent.trace_id, parent, parent.deadline, attributes)
+    parent.children.append(child)
+    token = _current.set(child)
+    try:
+        yield child
+    except Exception as e:
+        child.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        child.finish()
+        _current.reset(token)
+
+
+@contextmanager
+def trace(name, timeout_seconds=None, **attributes):
+    """Open a root span and export the finished trace."""
+    root = Span(name, uuid.uuid4().hex[:16], attributes=attributes)
+    if timeout_seconds:
+        root.deadline = root.started + timeout_seconds
+    token = _current.set(root)
+    try:
+        yield root
+    except Exception as e:
+        root.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        root.finish()
+        _current.reset(token)
+        _export(root, timeout_seconds)
+
+
+def traced_tool(tool_name):
+    """Decorator for a Retell tool endpoint; budget comes from TOOL_TIMEOUTS."""
+    timeout_seconds = TOOL_TIMEOUTS.get(tool_name)
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with trace(tool_name, timeout_seconds):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+def _export(root, timeout_seconds):
+    record = {
+        "trace_id": root.trace_id,
+        "tool": root.name,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "duration_ms": root.duration_ms,
+        "timeout_ms": timeout_seconds * 1000 if timeout_seconds else None,
+        "over_budget": False,
+        **root.to_dict(),
+    }
+    del record["name"], record["offset_ms"]
+    if timeout_seconds:
+        budget_used = root.duration_ms / (timeout_seconds * 1000)
+        record["budget_used"] = round(budget_used, 3)
+        if budget_used >= TRACE_SLOW_FRACTION:
+            record["over_budget"] = True
+            logging.warning(
+                "[TRACE] %s took %.0fms (%.0f%% of %.0fs Retell timeout) trace=%s",
+                root.name, root.duration_ms, budget_used * 100, timeout_seconds, root.trace_id,
+            )
+
+    with _buffer_lock:
+        _buffer.append(record)
+    if TRACE_JSONL_PATH:
+        try:
+            line = json.dumps(record, default=str)
+            with _file_lock:
+                directory = os.path.dirname(TRACE_JSONL_PATH)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(TRACE_JSONL_PATH, "a") as f:
+                    f.write(line + "\n")
+        except Exception as e:
+            logging.error(f"[TRACE] Failed to write trace: {e}")
+
+
+def get_recent_traces(limit=20, tool=None, over_budget_only=False):
+    """Slowest traces currently in the ring buffer."""
+    with _buffer_lock:
+        records = list(_buffer)
+    if tool:
+        records = [r for r in records if r["tool"] == tool]
+    if over_budget_only:
+        records = [r for r in records if r["over_budget"]]
+    records.sort(key=lambda r: r["duration_ms"], reverse=True)
+    return records[:limit]
@@ -0,0 +1,66 @@
+"""Request-scoped database unit of work.
+
+Endpoints that call several ``db.py`` helpers take ``conn=UnitOfWork`` and
+pass ``conn=conn`` to each helper. The whole request then uses one
+connection and one transaction: it commits when the endpoint returns
+normally and rolls back if it raises.
+
+The commit happens before the response is sent, so a client never sees
+success for work that did not commit. An endpoint that catches an error
+and still returns a response must call ``conn.rollback()`` itself.
+
+Side effects that must only follow a successful commit (cache
+invalidation, worker wake-ups) are registered by helpers with
+``db.after_commit`` and run right after the commit.
+"""
+import logging
+
+from fastapi import Depends
+from psycopg2.extensions import TRANSACTION_STATUS_INERROR
+
+from src.utils.db import get_db_connection
+
+
+class UnitOfWorkFailed(Exception):
+    """The endpoint returned normally but its transaction had already failed."""
+
+
+class _UnitConnection:
+    """The request's connection plus the callbacks waiting for its commit."""
+    __slots__ = ("_conn", "post_commit")
+
+    def __init__(self, conn):
+        self._conn = conn
+        self.post_commit = []
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def unit_of_work():
+    conn = _UnitConnection(get_db_connection())
+    try:
+        yield conn
+        if conn.info.transaction_status == TRANSACTION_STATUS_INERROR:
+            # A helper's error was swallowed; committing would silently roll back
+            conn.rollback()
+            raise UnitOfWorkFailed("transaction failed during the request and was rolled back")
+        conn.commit()
+    except BaseException:
+        if not conn.closed:
+            try:
+                conn.rollback()
+            except Exception as e:
+                logging.warning(f"[DB] Unit of work rollback failed: {e}")
+        raise
+    finally:
+        conn.close()
+    for callback in conn.post_commit:
+        try:
+            callback()
+        except Exception as e:
+            logging.error(f"[DB] Post-commit callback failed: {e}")
+
+
+# scope="function" (FastAPI >= 0.121): end the transaction before the response is sent
+UnitOfWork = Depends(unit_of_work, scope="function")
@@ -0,0 +1,83 @@
+"""Short-TTL in-process cache of authenticated users.
+
+``get_current_user`` runs on every admin and tech request; caching the user
+row for a few seconds removes a DB round trip from each of them. Writers in
+db.py call ``invalidate_user`` so changes made through this process are
+visible immediately; the TTL bounds staleness for changes made by other
+processes.
+"""
+import os
+import time
+import threading
+
+from src.utils import metrics
+
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "30"))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "1000"))
+
+_entries = {}
+_lock = threading.Lock()
+# Bumped by every invalidation so a load that raced with a write is not cached
+_generation = 0
+_stats = {"hits": 0, "misses": 0}
+
+
+def get_user(user_id, loader):
+    """Return the cached user for ``user_id``, calling ``loader(user_id)`` on
+    a miss. Missing users are not cached."""
+    now = time.monotonic()
+    with _lock:
+        entry = _entries.get(user_id)
+        if entry is not None and entry[0] > now:
+            _stats["hits"] += 1
+            hit = True
+        else:
+            _stats["misses"] += 1
+            hit = False
+            generation = _generation
+    metrics.inc("cache_requests_total", cache="user", result="hit" if hit else "miss")
+    if hit:
+        return dict(entry[1])
+
+    user = loader(user_id)
+    if user is None:
+        return None
+
+    with _lock:
+        if generation == _generation:
+            if len(_entries) >= USER_CACHE_MAX_ENTRIES:
+                _evict(now)
+            _entries[user_id] = (now + USER_CACHE_TTL_SECONDS, dict(user))
+    return user
+
+
+def _evict(now):
+    for key in [k for k, (expires, _) in _entries.items() if expires <= now]:
+        del _entries[key]
+    while len(_entries) >= USER_CACHE_MAX_ENTRIES:
+        del _entries[next(iter(_entries))]
+
+
+def invalidate_user(user_id):
+    global _generation
+    with _lock:
+        _generation += 1
+        _entries.pop(user_id, None)
+
+
+def clear_user_cache():
+    global _generation
+    with _lock:
+        _generation += 1
+        _entries.clear()
+
+
+def user_cache_stats():
+    with _lock:
+        return {"size": len(_entries), **_stats}
+
+
+metrics.register_gauge(
+    "user_cache_entries", "Users currently held in the auth user cache",
+    lambda: len(_entries),
+)
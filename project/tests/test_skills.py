@@ -0,0 +1,24 @@
+import pytest
+
+from src.utils import skills
+
+
+@pytest.fixture(autouse=True)
+def catalog_services():
+    """Resolve against SERVICE_CATALOG without a database."""
+    skills._install_services([
+        (service_id, key, name, aliases, keywords)
+        for service_id, (key, (name, aliases, keywords)) in enumerate(skills.SERVICE_CATALOG.items(), 1)
+    ])
+
+
+def _service_id(key):
+    return list(skills.SERVICE_CATALOG).index(key) + 1
+
+
+def test_power_washer_resolves_to_power_washing():
+    assert skills.resolve_service_id("power washer") == _service_id("power_washing")
+
+
+def test_window_washing_is_not_power_washing():
+    assert skills.resolve_service_id("window washing") is None